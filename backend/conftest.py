@@ -1,10 +1,22 @@
 # conftest.py
+import os
+import sys
+
+# Пакет common лежит в корне репозитория; сервер получает его через PYTHONPATH=.. (см. README)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pytest
 from fastapi.testclient import TestClient
+import main
 from main import app
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 import sqlite3
 
+@pytest.fixture(autouse=True)
+def isolated_traces(tmp_path_factory, monkeypatch):
+    """Спаны тестов пишутся во временный каталог, а не в ./traces рабочего дерева"""
+    monkeypatch.setattr(main.tracer, "trace_dir", tmp_path_factory.mktemp("traces"))
+
 @pytest.fixture
 def client():
     """Фикстура для клиента FastAPI"""
@@ -31,8 +43,10 @@ def mock_db():
 
 @pytest.fixture
 def mock_vlm_service():
-    """Фикстура для мока VLM сервиса"""
+    """Фикстура для мока VLM сервиса: по умолчанию POST ставит задачу t-1 в очередь"""
     with patch('main.httpx.AsyncClient') as mock_client:
         mock_instance = Mock()
+        mock_instance.post = AsyncMock(return_value=Mock(
+            status_code=200, json=lambda: {"task_id": "t-1", "status": "queued"}))
         mock_client.return_value.__aenter__.return_value = mock_instance
         yield mock_instance
\ No newline at end of file
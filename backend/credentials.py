@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+# Параметры scrypt (work factor) — настраиваются через переменные окружения
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Сколько хэширований может выполняться одновременно (остальные ждут в очереди)
+MAX_CONCURRENT_HASHES = int(os.getenv("PASSWORD_HASH_CONCURRENCY", 4))
+
+HASH_SCHEME = "scrypt"
+
+
+class LatencyRecorder:
+    """Скользящее окно последних замеров времени с расчётом перцентилей"""
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentiles(self, points=(50, 95, 99)) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {f"p{p}": None for p in points}
+        result = {}
+        for p in points:
+            index = min(len(samples) - 1, max(0, round(p / 100 * len(samples)) - 1))
+            result[f"p{p}"] = round(samples[index] * 1000, 2)
+        return result
+
+
+class PasswordHasher:
+    """
+    Хэширование паролей через scrypt на выделенном пуле потоков,
+    чтобы медленный хэш не блокировал event loop.
+    """
+
+    def __init__(self, executor=None, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P,
+                 max_concurrent: int = MAX_CONCURRENT_HASHES):
+        self.executor = executor
+        self.n = n
+        self.r = r
+        self.p = p
+        self.max_concurrent = max_concurrent
+        self._semaphore: asyncio.Semaphore | None = None
+        self.hash_latency = LatencyRecorder()
+        self.wait_latency = LatencyRecorder()
+
+    # --- Синхронная часть (выполняется в пуле потоков) ---
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r,
+            dklen=KEY_BYTES
+        )
+
+    def hash_sync(self, password: str) -> str:
+        salt = secrets.token_bytes(SALT_BYTES)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{HASH_SCHEME}${self.n}${self.r}${self.p}${salt.hex()}${key.hex()}"
+
+    def verify_sync(self, password: str, stored: str) -> tuple[bool, bool]:
+        """
+        Проверяет пароль. Возвращает (пароль_верный, нужно_перехэшировать).
+        Строки без префикса scrypt считаются старыми паролями в открытом виде.
+        """
+        if not stored:
+            return False, False
+
+        if not is_hashed(stored):
+            ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+            return ok, ok
+
+        try:
+            _, n, r, p, salt_hex, key_hex = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = bytes.fromhex(key_hex)
+            key = self._derive(password, bytes.fromhex(salt_hex), n, r, p)
+        except ValueError:
+            return False, False
+
+        ok = hmac.compare_digest(key, expected)
+        needs_rehash = ok and (n, r, p) != (self.n, self.r, self.p)
+        return ok, needs_rehash
+
+    # --- Асинхронная обёртка ---
+    async def _run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        submitted = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            self.wait_latency.record(started - submitted)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self.executor, func, *args)
+            finally:
+                self.hash_latency.record(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, stored: str) -> tuple[bool, bool]:
+        return await self._run(self.verify_sync, password, stored)
+
+    def stats(self) -> dict:
+        return {
+            "scheme": HASH_SCHEME,
+            "work_factor": {"n": self.n, "r": self.r, "p": self.p},
+            "max_concurrent": self.max_concurrent,
+            "hash_count": self.hash_latency.count,
+            "hash_latency_ms": self.hash_latency.percentiles(),
+            "queue_wait_ms": self.wait_latency.percentiles()
+        }
+
+
+def is_hashed(stored: str) -> bool:
+    return isinstance(stored, str) and stored.startswith(f"{HASH_SCHEME}$")
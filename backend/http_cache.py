@@ -0,0 +1,286 @@
+"""
+Сжатие ответов и заголовки кэширования.
+
+- CompressionMiddleware: brotli (если установлен пакет brotli) или gzip для текстовых ответов
+  от COMPRESS_MIN_SIZE байт. SSE (text/event-stream) не сжимается — сжатый поток копит
+  данные в буфере и задерживает события; уже сжатые ответы (Content-Encoding) пропускаются.
+- PageETagMiddleware: ETag по содержимому для HTML-страниц из шаблонов. Страницы зависят от
+  пользователя, поэтому Cache-Control: private, no-cache — браузер каждый раз переспрашивает,
+  но при неизменной странице получает 304 без тела.
+- CachedStaticFiles: StaticFiles с Cache-Control и готовыми .br/.gz рядом с файлом;
+  precompress_static строит их при старте (их же отдаёт nginx через gzip_static).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+from pathlib import Path
+
+import structlog
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = structlog.get_logger()
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))
+# Качество brotli на лету: 11 — в разы медленнее при выигрыше в пару процентов; максимум — для статики
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", 3600))
+PAGE_ETAG_MAX_BYTES = 1024 * 1024
+STATIC_PRECOMPRESS = os.getenv("STATIC_PRECOMPRESS", "1") == "1"
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt")
+UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+def accepted_encodings(headers: Headers) -> set:
+    return {item.split(";")[0].strip() for item in headers.get("accept-encoding", "").split(",")}
+
+
+def choose_encoding(headers: Headers):
+    """br, если клиент принимает и brotli установлен, иначе gzip; None — без сжатия"""
+    accepted = accepted_encodings(headers)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return (content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(UNCOMPRESSIBLE_TYPES)
+            and "content-encoding" not in headers)
+
+
+class _Compressor:
+    """Потоковый компрессор: каждый кусок сбрасывается сразу, чтобы не задерживать поток"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответа. Пока тело меньше minimum_size, куски копятся (BaseHTTPMiddleware режет на куски
+    и маленькие ответы) — решение «сжимать или нет» принимается по размеру, а не по первому куску
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = choose_encoding(Headers(scope=scope)) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        pending, pending_size = [], 0
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, pending_size
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is None:
+                if compressor is not None:
+                    message = {**message, "body": compressor.compress(body, final=not more_body)}
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            if not _compressible(headers):
+                await send(start_message)
+                start_message = None
+                await send(message)
+                return
+
+            pending.append(body)
+            pending_size += len(body)
+            if more_body and pending_size < self.minimum_size:
+                return
+            body = b"".join(pending)
+            pending.clear()
+            if pending_size >= self.minimum_size:
+                compressor = _Compressor(encoding)
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # Сжатое тело отличается побайтно — ETag становится слабым
+                    headers["etag"] = "W/" + headers["etag"]
+                del headers["content-length"]
+                body = compressor.compress(body, final=not more_body)
+                if not more_body:
+                    headers["content-length"] = str(len(body))
+            await send(start_message)
+            start_message = None
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+class PageETagMiddleware:
+    """
+    ETag по содержимому и 304 для GET-ответов text/html (шаблоны страниц). Тело собирается
+    целиком — BaseHTTPMiddleware отдаёт и обычные ответы кусками; больше max_buffer — без ETag
+    """
+
+    def __init__(self, app, max_buffer: int = PAGE_ETAG_MAX_BYTES):
+        self.app = app
+        self.max_buffer = max_buffer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message = None
+        chunks, buffered = [], 0
+
+        async def flush():
+            nonlocal start_message
+            pending, start_message = start_message, None
+            await send(pending)
+            for chunk in chunks:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunks.clear()
+
+        async def etag_send(message):
+            nonlocal start_message, buffered
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (message["status"] == 200 and headers.get("content-type", "").startswith("text/html")
+                        and "etag" not in headers):
+                    start_message = message
+                    return
+            elif message["type"] == "http.response.body" and start_message is not None:
+                body = message.get("body", b"")
+                if message.get("more_body", False):
+                    chunks.append(body)
+                    buffered += len(body)
+                    if buffered > self.max_buffer:
+                        await flush()
+                    return
+                body = b"".join(chunks) + body
+                chunks.clear()
+                etag = 'W/"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+                pending, start_message = start_message, None
+                headers = MutableHeaders(raw=pending["headers"])
+                headers["etag"] = etag
+                headers.setdefault("cache-control", "private, no-cache")
+                if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+                    await send({"type": "http.response.start", "status": 304,
+                                "headers": [(k, v) for k, v in pending["headers"]
+                                            if k in (b"etag", b"cache-control", b"vary")]})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                headers["content-length"] = str(len(body))
+                await send(pending)
+                message = {"type": "http.response.body", "body": body}
+            await send(message)
+
+        await self.app(scope, receive, etag_send)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles с Cache-Control и отдачей готовых .br/.gz, если они не старее исходного файла"""
+
+    def __init__(self, *args, max_age: int = STATIC_MAX_AGE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        headers = {"cache-control": f"public, max-age={self.max_age}", "vary": "Accept-Encoding"}
+        path, stat = full_path, stat_result
+        accepted = accepted_encodings(request_headers)
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            if variant_stat.st_mtime >= stat_result.st_mtime:
+                path, stat = f"{full_path}{suffix}", variant_stat
+                headers["content-encoding"] = encoding
+                break
+
+        # Тип — по исходному имени: у styles.css.gz он остаётся text/css
+        response = FileResponse(path, status_code=status_code, stat_result=stat, method=scope["method"],
+                                headers=headers, media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain")
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def is_not_modified(self, response_headers, request_headers) -> bool:
+        # If-None-Match сравнивается слабо: после сжатия на лету ETag приходит с префиксом W/
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            etag = response_headers.get("etag", "").removeprefix("W/")
+            return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return super().is_not_modified(response_headers, request_headers)
+
+
+def _write_variant(target: Path, data: bytes, stat):
+    tmp_path = target.with_name(target.name + f".tmp{os.getpid()}")
+    tmp_path.write_bytes(data)
+    os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp_path, target)
+
+
+def precompress_static(directory, min_size: int = COMPRESS_MIN_SIZE) -> int:
+    """
+    Кладёт рядом с текстовыми файлами каталога .gz (и .br при установленном brotli) с тем же mtime.
+    Перестраиваются только варианты, которые старше исходника. Возвращает число записанных файлов
+    """
+    written = 0
+    for path in Path(directory).rglob("*"):
+        if not path.is_file() or path.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+            continue
+        stat = path.stat()
+        if stat.st_size < min_size:
+            continue
+        variants = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda data: brotli.compress(data, quality=11)))
+        data = None
+        for suffix, compress in variants:
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= stat.st_mtime:
+                continue
+            data = data if data is not None else path.read_bytes()
+            _write_variant(target, compress(data), stat)
+            written += 1
+    logger.info("static_precompressed", directory=str(directory), written=written,
+                brotli=brotli is not None)
+    return written
@@ -0,0 +1,219 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import time
+from pathlib import Path
+
+import structlog
+
+LOG_FILE = os.getenv("LOG_FILE", "./logs/app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_ROTATE_INTERVAL_SEC = int(os.getenv("LOG_ROTATE_INTERVAL_SEC", 24 * 3600))
+# Сжимать ротированные файлы (app.log.1.gz ...): сжатие идёт в потоке QueueListener, не в event loop
+LOG_COMPRESS_BACKUPS = os.getenv("LOG_COMPRESS_BACKUPS", "1") == "1"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_CONSOLE_FORMAT = os.getenv("LOG_CONSOLE_FORMAT", "console")  # console | json
+
+# Доля сохраняемых событий для самых частых сообщений (1.0 — писать всё)
+DEFAULT_SAMPLE_RATES = {
+    "request_started": 0.1,
+    "request_completed": 0.2,
+    "task_still_processing": 0.05,
+    "get_result_request": 0.1,
+}
+
+
+def parse_sample_rates(raw: str) -> dict:
+    """Разбирает строку вида "request_started=0.1,task_still_processing=0.05" """
+    rates = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        event, rate = item.split("=", 1)
+        try:
+            rates[event.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class EventSampler:
+    """
+    structlog-процессор: пропускает только долю частых событий.
+    Предупреждения, ошибки и ответы с кодом >= 400 не сэмплируются никогда.
+    """
+
+    def __init__(self, rates: dict, rng=None):
+        self.rates = dict(rates)
+        self.rng = rng or random.Random()
+        self.dropped = 0
+
+    def __call__(self, logger, method_name, event_dict):
+        if method_name in ("warning", "error", "exception", "critical"):
+            return event_dict
+        # request_completed пишется на info для любого статуса — ошибочные ответы оставляем все
+        status_code = event_dict.get("status_code")
+        if isinstance(status_code, int) and status_code >= 400:
+            return event_dict
+
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is None or rate >= 1.0:
+            return event_dict
+
+        if self.rng.random() >= rate:
+            self.dropped += 1
+            raise structlog.DropEvent
+
+        event_dict["sample_rate"] = rate
+        return event_dict
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Ротация файла и по размеру, и по времени — что наступит раньше; старые файлы сжимаются gzip"""
+
+    def __init__(self, filename, max_bytes: int, backup_count: int, interval_sec: int, encoding="utf-8",
+                 compress: bool = LOG_COMPRESS_BACKUPS):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self.interval_sec = interval_sec
+        self.rollover_at = time.time() + interval_sec
+        if compress:
+            self.namer = _gzip_namer
+            self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record):
+        if self.interval_sec and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval_sec
+
+
+class NonFormattingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в потоке приложения:
+    рендеринг (JSON/консоль) выполняется в потоке QueueListener.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Лучше потерять строку лога, чем заблокировать event loop
+            pass
+
+
+_listener: logging.handlers.QueueListener | None = None
+sampler = EventSampler(DEFAULT_SAMPLE_RATES)
+
+
+def setup_logging(log_file: str = LOG_FILE, sample_rates: dict = None):
+    """Настраивает structlog + stdlib: очередь, JSON-файл с ротацией и сэмплирование"""
+    global _listener
+
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    rates.update(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")))
+    rates.update(sample_rates or {})
+    sampler.rates = rates
+
+    shared_processors = [
+        structlog.contextvars.merge_contextvars,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+    ]
+
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            *shared_processors,
+            sampler,
+            structlog.processors.TimeStamper(fmt="iso"),
+            # exc_info нужно разрешить здесь: в потоке QueueListener его уже нет
+            structlog.processors.format_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        wrapper_class=structlog.stdlib.BoundLogger,
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+    foreign_pre_chain = [*shared_processors, structlog.processors.TimeStamper(fmt="iso")]
+
+    json_formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(ensure_ascii=False),
+        ],
+        foreign_pre_chain=foreign_pre_chain,
+    )
+    console_formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.dev.ConsoleRenderer(),
+        ],
+        foreign_pre_chain=foreign_pre_chain,
+    )
+
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    file_handler = SizedTimedRotatingFileHandler(
+        log_file,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        interval_sec=LOG_ROTATE_INTERVAL_SEC,
+    )
+    file_handler.setFormatter(json_formatter)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(json_formatter if LOG_CONSOLE_FORMAT == "json" else console_formatter)
+
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, NonFormattingQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(NonFormattingQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+    return _listener
+
+
+def shutdown_logging():
+    """Дописывает оставшиеся записи из очереди и останавливает поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
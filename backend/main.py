@@ -5,7 +5,7 @@ from fastapi import FastAPI, File, HTTPException, Body, status, Request, Form, U
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import FileResponse
-from fastapi.responses import RedirectResponse, PlainTextResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
@@ -17,16 +17,46 @@ import os
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 import uuid
+import time
 
 # В начало main.py добавьте:
 import concurrent.futures
+from collections import OrderedDict
 
 # Создаем пул потоков для параллельной обработки
 THREAD_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+
+# Хэширование паролей выполняется в пуле потоков, а не в event loop
+from credentials import PasswordHasher
+password_hasher = PasswordHasher(THREAD_POOL)
+
+# Prometheus-метрики: задержки маршрутов, время SQL-запросов, запросы к ML-серверу
+from metrics import TimedConnection, metrics_middleware, metrics_endpoint, observe_upstream, observe_upload
+
+# Сквозная трассировка задачи: backend -> ML-сервер -> очередь -> воркер
+from common.tracing import TRACEPARENT_HEADER, build_timeline
+from tracing import Tracer
+tracer = Tracer("backend")
+
+# Каталог ингредиентов: сравнение с запрещёнными продуктами по каноническим именам
+from common.ingredients import get_catalogue
+# Индекс сохранённых рецептов: подсказки без LLM и запасной ответ при лимите Mistral
+from recipe_index import RecipeIndex, word_level
+# Сжатие ответов, ETag страниц и кэширование статики
+from http_cache import (STATIC_PRECOMPRESS, CachedStaticFiles, CompressionMiddleware, PageETagMiddleware,
+                        precompress_static)
+# Загрузки фото: потоком в общий staging с лимитом размера, к ML-серверу — потоком с диска
+from common.uploads import UploadLimitMiddleware, UploadTooLarge
+from uploads import stage_upload, upload_transport
+# Шардированная раскладка local_recipes и уборщик старых файлов
+from common.storage import find_artifact, sharded_path
+from storage import LOCAL_RECIPES_DIR, STORAGE_JANITOR, Janitor, default_policies, janitor_loop
+# Формат файлов задач на диске (ARTIFACT_FORMAT), общий с ML-сервером
+from common.codec import read_artifact, write_artifact
 # Импортируем structlog
 import structlog
 def log_user_action(user_id: int, prompt_name: str, action: str, recipe_name: str = None):
-    con = sqlite3.connect("../bd/my_database.db", timeout=30, check_same_thread=False)
+    con = sqlite3.connect("../bd/my_database.db", timeout=30, check_same_thread=False, factory=TimedConnection)
     cursor = con.cursor()
     cursor.execute("PRAGMA journal_mode=WAL;")
     cursor.execute(
@@ -37,43 +67,11 @@ def log_user_action(user_id: int, prompt_name: str, action: str, recipe_name: st
     con.close()
 
 
-# Настройка structlog
-def setup_structlog():
-    """Простая и рабочая настройка structlog"""
-    structlog.configure(
-        processors=[
-            structlog.contextvars.merge_contextvars,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S"),
-            structlog.dev.ConsoleRenderer()  # Читаемый вывод в консоль
-        ],
-        wrapper_class=structlog.stdlib.BoundLogger,
-        context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        cache_logger_on_first_use=False,
-    )
-
-def setup_file_logging():
-    """Настройка записи логов в файл"""
-    import logging
-    
-    # Создаем директорию для логов
-    Path("./logs").mkdir(exist_ok=True)
-    
-    # Настраиваем базовый logging для файла
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("./logs/app.log", encoding='utf-8'),
-            logging.StreamHandler()  # Также выводим в консоль
-        ]
-    )
+# Настройка логирования: structlog -> очередь -> JSON-файл с ротацией (в отдельном потоке)
+from log_pipeline import setup_logging
 
 # Инициализация логирования
-setup_structlog()
-setup_file_logging()  # Добавьте эту строку
+setup_logging()
 logger = structlog.get_logger()
 
 # Тестовое сообщение при запуске
@@ -101,53 +99,57 @@ app.add_middleware(
 # Подключаем шаблоны
 templates = Jinja2Templates(directory="../public")
 
-# Подключаем статические файлы (CSS, JS, изображения и т.д.)
-app.mount("/static", StaticFiles(directory="../public"), name="static")
-app.mount("/uploads", StaticFiles(directory="../public/uploads"), name="uploads")
+# Подключаем статические файлы (CSS, JS, изображения и т.д.) с Cache-Control и готовыми .br/.gz
+app.mount("/static", CachedStaticFiles(directory="../public"), name="static")
+app.mount("/uploads", CachedStaticFiles(directory="../public/uploads"), name="uploads")
+
+app.middleware("http")(metrics_middleware)
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
 
 # Middleware для логирования запросов
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     request_id = str(uuid.uuid4())[:8]
+    trace_token = tracer.start_request(request.headers.get(TRACEPARENT_HEADER))
     
-    # Добавляем request_id в контекст
-    structlog.contextvars.bind_contextvars(request_id=request_id)
+    # Добавляем request_id, trace_id, метод и путь в контекст один раз — они попадут в каждую строку лога
+    structlog.contextvars.bind_contextvars(
+        request_id=request_id,
+        trace_id=tracer.current_trace_id(),
+        method=request.method,
+        path=request.url.path
+    )
     
-    # Логируем входящий запрос
+    # Логируем входящий запрос (событие сэмплируется, см. log_pipeline)
     logger.info(
         "request_started",
-        method=request.method,
-        url=str(request.url),
         client_host=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent")
     )
     
     try:
         response = await call_next(request)
-        process_time = (datetime.now() - start_time).total_seconds()
+        process_time = time.perf_counter() - start_time
         
         # Логируем успешный ответ
         logger.info(
             "request_completed",
-            method=request.method,
-            url=str(request.url),
             status_code=response.status_code,
-            process_time=process_time
+            process_time=round(process_time, 4)
         )
         
         return response
         
     except Exception as e:
-        process_time = (datetime.now() - start_time).total_seconds()
+        process_time = time.perf_counter() - start_time
         
         # Логируем ошибку
         logger.error(
             "request_failed",
-            method=request.method,
             url=str(request.url),
             error=str(e),
-            process_time=process_time,
+            process_time=round(process_time, 4),
             exc_info=True
         )
         
@@ -155,6 +157,46 @@ async def log_requests(request: Request, call_next):
     finally:
         # Очищаем контекст
         structlog.contextvars.clear_contextvars()
+        tracer.end_request(trace_token)
+
+# ETag считается по несжатому телу страницы, поэтому сжатие добавлено после (снаружи)
+app.add_middleware(PageETagMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+# Лимит тела запроса проверяется до разбора multipart (добавлен последним — самый внешний)
+app.add_middleware(UploadLimitMiddleware, paths=("/start-processing", "/start-pipeline"))
+
+janitor = Janitor(default_policies())
+janitor_task = None
+precompress_task = None
+
+
+@app.on_event("startup")
+async def start_janitor():
+    global janitor_task
+    if STORAGE_JANITOR:
+        janitor_task = asyncio.create_task(janitor_loop(janitor))
+
+
+async def precompress_public():
+    try:
+        await asyncio.to_thread(precompress_static, "../public")
+    except OSError as e:
+        logger.warning("static_precompress_failed", error=str(e))
+
+
+@app.on_event("startup")
+async def build_precompressed_static():
+    # Варианты .br/.gz строятся в потоке: до готовности статика отдаётся и сжимается на лету
+    global precompress_task
+    if STATIC_PRECOMPRESS:
+        precompress_task = asyncio.create_task(precompress_public())
+
+
+@app.on_event("shutdown")
+async def stop_janitor():
+    if janitor_task:
+        janitor_task.cancel()
 
 # авторизация
 @app.get("/", response_class=HTMLResponse)
@@ -166,7 +208,7 @@ async def get_form(request: Request, error: str = None):
 async def handle_form(request: Request, email: str = Form(...), password: str = Form(...)):
     logger.info("auth_attempt", email=email)
     
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     # Ищем пользователя по email
@@ -184,7 +226,9 @@ async def handle_form(request: Request, email: str = Form(...), password: str =
             "email": email
         })
     
-    if result[1] != password:
+    password_ok, needs_rehash = await password_hasher.verify(password, result[1])
+
+    if not password_ok:
         # Неверный пароль
         logger.warning("auth_failed", reason="invalid_password", email=email, user_id=result[0])
         return templates.TemplateResponse("auth.html", {
@@ -193,6 +237,19 @@ async def handle_form(request: Request, email: str = Form(...), password: str =
             "email": email
         })
 
+    if needs_rehash:
+        # Старый пароль в открытом виде (или устаревший work factor) — перехэшируем
+        try:
+            new_hash = await password_hasher.hash(password)
+            con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
+            cursor = con.cursor()
+            cursor.execute("UPDATE User SET password = ? WHERE id_user = ?", (new_hash, result[0]))
+            con.commit()
+            con.close()
+            logger.info("password_hash_migrated", user_id=result[0])
+        except Exception as e:
+            logger.error("password_hash_migration_failed", user_id=result[0], error=str(e))
+
     # Успешная авторизация
     logger.info("auth_successful", user_id=result[0], email=email)
     
@@ -213,9 +270,10 @@ async def get_form(request: Request):
 async def handle_form(name: str = Form(...), email: str = Form(...), password: str = Form(...)):
     logger.info("registration_attempt", name=name, email=email)
     
-    data = (email, name, password)
+    password_hash = await password_hasher.hash(password)
+    data = (email, name, password_hash)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -240,6 +298,11 @@ async def handle_form(name: str = Form(...), email: str = Form(...), password: s
     response.set_cookie(key="session", value=session_data, httponly=True, max_age=3600)
     return response
 
+@app.get("/api/auth/hashing-stats")
+async def get_hashing_stats():
+    """Перцентили задержки хэширования паролей"""
+    return password_hasher.stats()
+
 def get_current_user(request: Request):
     session_cookie = request.cookies.get("session")
     if not session_cookie:
@@ -338,7 +401,7 @@ async def get_form(request: Request):
     id_user = get_current_user(request)
     logger.info("profile_page_accessed", user_id=id_user)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -402,7 +465,7 @@ async def add_forbidden_product(request: Request, product_title: str = Form(...)
     id_user = get_current_user(request)
     logger.info("adding_forbidden_product", user_id=id_user, product_title=product_title)
     
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -440,7 +503,7 @@ async def remove_forbidden_product(request: Request, product_title: str = Form(.
     id_user = get_current_user(request)
     logger.info("removing_forbidden_product", user_id=id_user, product_title=product_title)
     
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -477,7 +540,7 @@ async def save_preferences(
                difficulty_preference=preferences_difficulty,
                calorie_preference=preferences_calorie)
     
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -512,7 +575,7 @@ async def results(request: Request, filename: str):
     forbidden_products = []
     
     if user_id:
-        con = sqlite3.connect("../bd/my_database.db")
+        con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
         cursor = con.cursor()
         cursor.execute("""
             SELECT p.title 
@@ -591,7 +654,7 @@ async def get_history(request: Request):
 
     logger.info("history_page_accessed", user_id=id_user)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -654,7 +717,7 @@ async def toggle_favorite(id_history: int, request: Request):
 
     logger.info("toggle_favorite_request", user_id=id_user, history_id=id_history)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -718,7 +781,7 @@ async def add_comment(id_history: int, request: Request, comment: str = Form("")
         # Если комментарий пустой, удаляем его
         return await delete_comment(id_history, request)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -779,7 +842,7 @@ async def delete_comment(id_history: int, request: Request):
 
     logger.info("delete_comment_request", user_id=id_user, history_id=id_history)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -824,7 +887,7 @@ async def get_favorites(request: Request):
 
     logger.info("favorites_page_accessed", user_id=id_user)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -858,7 +921,7 @@ async def remove_favorite(id_history: int, request: Request):
 
     logger.info("remove_favorite_request", user_id=id_user, history_id=id_history)
 
-    con = sqlite3.connect("../bd/my_database.db")
+    con = sqlite3.connect("../bd/my_database.db", factory=TimedConnection)
     cursor = con.cursor()
 
     try:
@@ -901,6 +964,9 @@ async def remove_favorite(id_history: int, request: Request):
 REMOTE_URL = "http://127.0.0.1:8001/test-vlm"
 TASK_RESULT_URL = "http://127.0.0.1:8001/task-result/"
 COOK_FROM_IMAGE_URL = "http://127.0.0.1:8001/cook-from-image/"
+TRACE_URL = "http://127.0.0.1:8001/trace/"
+PIPELINE_URL = "http://127.0.0.1:8001/pipeline"
+PIPELINE_EVENTS_URL = "http://127.0.0.1:8001/pipeline-events/"
 
 # Путь к базе данных
 DB_PATH = "../bd/my_database.db"
@@ -909,9 +975,23 @@ import os
 from pathlib import Path
 
 # Создаем необходимые директории
-Path("./local_recipes").mkdir(exist_ok=True)
+LOCAL_RECIPES_DIR.mkdir(exist_ok=True)
 Path("./recipes").mkdir(exist_ok=True)
 
+
+def task_recipes_path(task_id: str) -> Path:
+    """Путь для записи рецептов задачи: local_recipes/<шард>/<task_id>_recipes.json"""
+    return sharded_path(LOCAL_RECIPES_DIR, f"{task_id}_recipes.json")
+
+
+def load_task_recipes(task_id: str):
+    """Рецепты задачи из local_recipes (в том числе сжатые уборщиком или по старой раскладке); None, если нет"""
+    path = find_artifact(LOCAL_RECIPES_DIR, f"{task_id}_recipes.json")
+    if path is None:
+        return None
+    return read_artifact(path)
+
+
 def get_forbidden_products(user_id: int) -> List[str]:
     """
     Получает список запрещенных продуктов для пользователя из базы данных.
@@ -925,7 +1005,7 @@ def get_forbidden_products(user_id: int) -> List[str]:
             logger.warning("database_not_found", path=DB_PATH)
             return []
         
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
         
         cursor.execute("""
@@ -940,8 +1020,7 @@ def get_forbidden_products(user_id: int) -> List[str]:
         
         logger.debug("forbidden_products_retrieved", 
                     user_id=user_id, 
-                    count=len(forbidden_products),
-                    products=forbidden_products)
+                    count=len(forbidden_products))
         
         return forbidden_products
         
@@ -962,10 +1041,12 @@ def filter_ingredients_by_forbidden(ingredients: List[str], forbidden_products:
     filtered_ingredients = []
     removed_ingredients = []
     
+    # Сравнение через каталог: формы слова, синонимы и английские названия сводятся к одному ключу
+    catalogue = get_catalogue()
+    forbidden_keys = catalogue.forbidden_keys(forbidden_products)
+    
     for ingredient in ingredients:
-        ingredient_lower = ingredient.lower()
-        # Проверяем, содержится ли запрещенный продукт в названии ингредиента
-        is_forbidden = any(forbidden_product in ingredient_lower for forbidden_product in forbidden_products)
+        is_forbidden = catalogue.is_forbidden(ingredient, forbidden_keys)
         
         if not is_forbidden:
             filtered_ingredients.append(ingredient)
@@ -974,11 +1055,105 @@ def filter_ingredients_by_forbidden(ingredients: List[str], forbidden_products:
     
     if removed_ingredients:
         logger.debug("ingredients_filtered", 
-                    removed_count=len(removed_ingredients),
-                    removed_ingredients=removed_ingredients)
+                    removed_count=len(removed_ingredients))
     
     return filtered_ingredients
 
+RECIPE_INDEX_TTL = float(os.getenv("RECIPE_INDEX_TTL", 600))
+_recipe_index = None
+# Фоновая пересборка индекса (asyncio.Task), чтобы не запускать несколько сразу
+_recipe_index_refresh = None
+# Ингредиенты распознанных задач (из /get-result) для быстрых подсказок
+TASK_INGREDIENTS_MAX = 1000
+task_ingredients = OrderedDict()
+
+def load_recipe_index() -> RecipeIndex:
+    """Строит индекс по таблице Recipes; ингредиенты — из ProductsInRecipes, иначе из текста рецепта"""
+    index = RecipeIndex()
+    if not os.path.exists(DB_PATH):
+        logger.warning("database_not_found_recipe_index", path=DB_PATH)
+        return index
+    
+    con = sqlite3.connect(DB_PATH, factory=TimedConnection)
+    try:
+        cursor = con.cursor()
+        cursor.execute("""
+            SELECT pir.id_recipe, p.title
+            FROM ProductsInRecipes pir
+            JOIN Product p ON pir.id_product = p.id_product
+        """)
+        products = {}
+        for id_recipe, title in cursor.fetchall():
+            products.setdefault(id_recipe, []).append(title)
+        
+        cursor.execute("SELECT id_recipes, title, description, cooking_time, difficulty, calorie_level FROM Recipes")
+        for id_recipes, title, description, cooking_time, difficulty, calorie_level in cursor.fetchall():
+            index.add(id_recipes, title, description, cooking_time, difficulty, calorie_level,
+                      ingredients=products.get(id_recipes))
+    finally:
+        con.close()
+    
+    logger.info("recipe_index_built", recipes_count=len(index))
+    return index
+
+def refresh_recipe_index() -> RecipeIndex:
+    """Строит индекс заново и подменяет им текущий; при ошибке БД остаётся прежний"""
+    global _recipe_index
+    try:
+        _recipe_index = load_recipe_index()
+    except sqlite3.Error as e:
+        logger.error("recipe_index_build_failed", error=str(e))
+        return _recipe_index or RecipeIndex()
+    return _recipe_index
+
+async def get_recipe_index() -> RecipeIndex:
+    """
+    Индекс строится при первом обращении и перестраивается раз в RECIPE_INDEX_TTL секунд.
+    Сборка идёт в потоке, а не в цикле событий; пока устаревший индекс перестраивается,
+    запросы обслуживает он же. Ждут сборки только запросы до появления первого индекса
+    """
+    global _recipe_index_refresh
+    if _recipe_index is None or time.monotonic() - _recipe_index.built_at > RECIPE_INDEX_TTL:
+        if _recipe_index_refresh is None or _recipe_index_refresh.done():
+            _recipe_index_refresh = asyncio.create_task(asyncio.to_thread(refresh_recipe_index))
+        if _recipe_index is None:
+            return await asyncio.shield(_recipe_index_refresh)
+    return _recipe_index
+
+def link_recipe_products(cursor, id_recipe: int, ingredient_names: List[str]) -> List[str]:
+    """Связывает рецепт с продуктами (канонические имена) через ProductsInRecipes"""
+    names = get_catalogue().canonicalize(ingredient_names)
+    for name in names:
+        cursor.execute("SELECT id_product FROM Product WHERE lower(title) = ?", (name,))
+        row = cursor.fetchone()
+        if row:
+            id_product = row[0]
+        else:
+            cursor.execute("INSERT INTO Product (title) VALUES (?)", (name,))
+            id_product = cursor.lastrowid
+        cursor.execute("INSERT INTO ProductsInRecipes (id_product, id_recipe) VALUES (?, ?)", (id_product, id_recipe))
+    return names
+
+def remember_task_ingredients(task_id: str, ingredients: List[str]):
+    task_ingredients[task_id] = list(ingredients)
+    task_ingredients.move_to_end(task_id)
+    while len(task_ingredients) > TASK_INGREDIENTS_MAX:
+        task_ingredients.popitem(last=False)
+
+def preference_levels(cooking_time: str = None, difficulty: str = None, calorie_level: str = None) -> dict:
+    """Пожелания из формы («Быстро», «Легко», «нет», ...) -> уровни 1..3 индекса рецептов"""
+    return {
+        "time": word_level("time", cooking_time),
+        "difficulty": word_level("difficulty", difficulty),
+        "calorie": word_level("calorie", calorie_level),
+    }
+
+async def suggest_saved_recipes(ingredients: List[str], forbidden_products: List[str], preferences: dict = None,
+                                limit: int = None) -> List[dict]:
+    kwargs = {"limit": limit} if limit else {}
+    index = await get_recipe_index()
+    return index.suggest(ingredients, forbidden_products, preferences, **kwargs)
+
 def get_cooking_times():
     """Получает варианты времени приготовления из базы данных"""
     try:
@@ -986,7 +1161,7 @@ def get_cooking_times():
             logger.warning("database_not_found_cooking_times", path=DB_PATH)
             return []
         
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
         cursor.execute("SELECT id_cooking_time, title FROM CookingTime")
         cooking_times = cursor.fetchall()
@@ -1009,7 +1184,7 @@ def get_difficulties():
             logger.warning("database_not_found_difficulties", path=DB_PATH)
             return []
         
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
         cursor.execute("SELECT id_difficulty, title FROM Difficulty")
         difficulties = cursor.fetchall()
@@ -1032,7 +1207,7 @@ def get_calorie_contents():
             logger.warning("database_not_found_calorie_contents", path=DB_PATH)
             return []
         
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
         cursor.execute("SELECT id_calorie_content, title FROM CalorieContent")
         calorie_contents = cursor.fetchall()
@@ -1056,6 +1231,32 @@ def get_recipe_preferences():
         "calorie_contents": get_calorie_contents()
     }
 
+# Спекулятивная генерация рецептов на ML-сервере сразу после распознавания (бюджет — на стороне ML)
+SPECULATIVE_RECIPES = os.getenv("SPECULATIVE_RECIPES", "0") == "1"
+
+def build_generation_feedback(user_feedback: str, forbidden_products: List[str]) -> str:
+    """Добавляет запрещенные продукты в feedback для учета при генерации"""
+    if not forbidden_products:
+        return user_feedback
+    if user_feedback and user_feedback != "нет":
+        return user_feedback + f". Исключить: {', '.join(forbidden_products)}"
+    return f"Исключить: {', '.join(forbidden_products)}"
+
+def speculative_generation_params(user_id) -> dict:
+    """
+    Параметры /cook-from-image такими, какими их отправит форма генерации без изменений:
+    предпочтения из профиля, запрещенные продукты в feedback, остальное — «нет»
+    """
+    preferences = get_user_preferences(user_id)
+    return {
+        "dietary": "нет",
+        "user_feedback": build_generation_feedback("нет", get_forbidden_products(user_id)),
+        "preferred_calorie_level": preferences.get("preferred_calorie_level") or "нет",
+        "preferred_cooking_time": preferences.get("preferred_cooking_time") or "нет",
+        "preferred_difficulty": preferences.get("preferred_difficulty") or "нет",
+        "existing_recipes": "нет",
+    }
+
 def get_user_preferences(user_id):
     """Получает предпочтения конкретного пользователя из базы данных"""
     if not user_id:
@@ -1066,7 +1267,7 @@ def get_user_preferences(user_id):
             logger.warning("database_not_found_user_preferences", path=DB_PATH)
             return {}
         
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
         
         # Получаем предпочтения пользователя с JOIN к связанным таблицам
@@ -1138,8 +1339,22 @@ async def get_upload_form(request: Request):
         "error_message": error_message
     })
 
+async def receive_upload(file: UploadFile, route: str):
+    """Фото из формы — в staging кусками; 413, если файл больше UPLOAD_MAX_BYTES"""
+    if not file.filename.lower().endswith((".jpg", ".jpeg", ".png")):
+        logger.warning("invalid_file_type_upload", filename=file.filename)
+        raise HTTPException(status_code=400, detail="Файл должен быть изображением (jpg/jpeg/png)")
+    try:
+        upload = await stage_upload(file)
+    except UploadTooLarge as e:
+        logger.warning("upload_rejected_too_large", filename=file.filename, limit=e.limit)
+        raise HTTPException(status_code=413, detail=str(e))
+    observe_upload(route, upload.size, upload.peak_memory)
+    return upload
+
 # Первый запрос - отправка файла и получение task_id
 @app.post("/start-processing")
+@tracer.traced("backend.start_processing")
 async def start_processing(request: Request, file: UploadFile = File(...)):
     user_id = get_current_user(request)
     logger.info("start_processing_request", 
@@ -1147,16 +1362,19 @@ async def start_processing(request: Request, file: UploadFile = File(...)):
                filename=file.filename,
                content_type=file.content_type)
     
-    # Проверка типа файла
-    if not file.filename.lower().endswith((".jpg", ".jpeg", ".png")):
-        logger.warning("invalid_file_type_upload", filename=file.filename)
-        raise HTTPException(status_code=400, detail="Файл должен быть изображением (jpg/jpeg/png)")
-    
-    contents = await file.read()
+    upload = await receive_upload(file, "start-processing")
     try:
-        async with httpx.AsyncClient() as client:
-            files = {'file': (file.filename, contents, file.content_type)}
-            response = await client.post(REMOTE_URL, files=files)
+        # Файл уходит с диска кусками (или только его имя в общем staging), а не из памяти целиком
+        with upload_transport(upload) as (files, staged):
+            async with httpx.AsyncClient() as client:
+                # Пользователь и полоса нужны воркеру для справедливой очереди: загрузки из UI — интерактивные
+                data = {'user_id': str(user_id or "anonymous"), 'lane': "interactive", **staged}
+                if SPECULATIVE_RECIPES and user_id:
+                    # Рецепты начнут генерироваться сразу после распознавания, с сохранёнными предпочтениями
+                    data['speculate'] = json.dumps(speculative_generation_params(user_id), ensure_ascii=False)
+                upstream_start = time.perf_counter()
+                response = await client.post(REMOTE_URL, files=files, data=data, headers=tracer.headers())
+                observe_upstream("test-vlm", str(response.status_code), time.perf_counter() - upstream_start)
 
         if response.status_code == 200:
             task_data = response.json()
@@ -1194,8 +1412,135 @@ async def start_processing(request: Request, file: UploadFile = File(...)):
         logger.error("processing_start_failed", user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Ошибка запроса: {str(e)}")
 
+# Режим конвейера: распознавание и генерация рецептов одной задачей воркера,
+# ход задачи приходит потоком событий вместо опроса /get-result
+@app.post("/start-pipeline")
+@tracer.traced("backend.start_pipeline")
+async def start_pipeline(
+    request: Request,
+    file: UploadFile = File(...),
+    dietary: str = Form("нет"),
+    user_feedback: str = Form("нет"),
+    preferred_calorie_level: str = Form("нет"),
+    preferred_cooking_time: str = Form("нет"),
+    preferred_difficulty: str = Form("нет"),
+    existing_recipes: str = Form("нет")
+):
+    user_id = get_current_user(request)
+    logger.info("start_pipeline_request",
+               user_id=user_id,
+               filename=file.filename,
+               content_type=file.content_type)
+    
+    upload = await receive_upload(file, "start-pipeline")
+    forbidden_products = get_forbidden_products(user_id)
+    data = {
+        "user_id": str(user_id or "anonymous"),
+        "lane": "interactive",
+        "dietary": dietary,
+        "user_feedback": build_generation_feedback(user_feedback, forbidden_products),
+        "preferred_calorie_level": preferred_calorie_level,
+        "preferred_cooking_time": preferred_cooking_time,
+        "preferred_difficulty": preferred_difficulty,
+        "existing_recipes": existing_recipes,
+        # Воркер убирает запрещенные продукты из распознанных до генерации
+        "forbidden_products": json.dumps(forbidden_products, ensure_ascii=False),
+    }
+    try:
+        with upload_transport(upload) as (files, staged):
+            async with httpx.AsyncClient() as client:
+                upstream_start = time.perf_counter()
+                response = await client.post(
+                    PIPELINE_URL,
+                    files=files,
+                    data={**data, **staged},
+                    headers=tracer.headers()
+                )
+                observe_upstream("pipeline", str(response.status_code), time.perf_counter() - upstream_start)
+    except httpx.HTTPError as e:
+        logger.error("pipeline_start_failed", user_id=user_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Ошибка запроса: {str(e)}")
+    
+    if response.status_code != 200:
+        error_detail = "Ошибка удаленного сервера"
+        try:
+            error_detail = response.json().get("detail", error_detail)
+        except Exception:
+            pass
+        logger.error("remote_server_error", status_code=response.status_code, error_detail=error_detail)
+        raise HTTPException(status_code=response.status_code, detail=error_detail)
+    
+    task_id = response.json().get("task_id")
+    if not task_id:
+        raise HTTPException(status_code=500, detail="Не получен task_id")
+    logger.info("pipeline_started", user_id=user_id, task_id=task_id)
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "events_url": f"/pipeline-events/{task_id}",
+        "forbidden_products_considered": forbidden_products,
+    }
+
+# Служебные поля события, которые не относятся к файлу рецептов
+PIPELINE_EVENT_FIELDS = ("stage", "time", "elapsed_sec", "saved_to")
+
+def handle_pipeline_event(task_id: str, event: dict):
+    """
+    Побочные эффекты событий конвейера: ингредиенты — для быстрых подсказок, рецепты — в
+    local_recipes (если воркер на другом хосте и не записал файл сам), чтобы работал /complete-recipe
+    """
+    stage = event.get("stage")
+    if stage == "vlm_done":
+        remember_task_ingredients(task_id, event.get("ingredients") or [])
+    elif stage == "done":
+        local_recipes_path = task_recipes_path(task_id)
+        if find_artifact(LOCAL_RECIPES_DIR, local_recipes_path.name) is None:
+            result_data = {k: v for k, v in event.items() if k not in PIPELINE_EVENT_FIELDS}
+            write_artifact(local_recipes_path, result_data)
+            logger.info("recipes_saved_locally", task_id=task_id, save_path=str(local_recipes_path))
+        logger.info("pipeline_done", task_id=task_id, recipes_count=len(event.get("recipes") or []),
+                    elapsed_sec=event.get("elapsed_sec"))
+    elif stage == "error":
+        logger.warning("pipeline_failed", task_id=task_id, error=event.get("error"))
+
+def pipeline_error_event(error: str) -> str:
+    payload = json.dumps({"stage": "error", "error": error}, ensure_ascii=False)
+    return f"event: error\ndata: {payload}\n\n"
+
+@app.get("/pipeline-events/{task_id}")
+@tracer.traced("backend.pipeline_events")
+async def pipeline_events(request: Request, task_id: str):
+    user_id = get_current_user(request)
+    logger.info("pipeline_events_request", user_id=user_id, task_id=task_id)
+    # Заголовки трассы берём сейчас: поток читается уже после выхода из обработчика
+    headers = tracer.headers()
+    
+    async def relay():
+        data = None
+        try:
+            # Без таймаута чтения: между событиями ML-сервер шлет лишь keep-alive
+            async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, read=None)) as client:
+                async with client.stream("GET", f"{PIPELINE_EVENTS_URL}{task_id}", headers=headers) as response:
+                    if response.status_code != 200:
+                        yield pipeline_error_event(f"Ошибка удаленного сервера: {response.status_code}")
+                        return
+                    async for line in response.aiter_lines():
+                        yield line + "\n"
+                        if line.startswith("data: "):
+                            data = line[len("data: "):]
+                        elif not line and data:
+                            handle_pipeline_event(task_id, json.loads(data))
+                            data = None
+        except httpx.HTTPError as e:
+            logger.error("pipeline_events_failed", task_id=task_id, error=str(e))
+            yield pipeline_error_event(f"Ошибка запроса: {str(e)}")
+    
+    return StreamingResponse(relay(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Второй запрос - получение результата по task_id
 @app.get("/get-result/{task_id}")
+@tracer.traced("backend.get_result")
 async def get_result(request: Request, task_id: str):
     user_id = get_current_user(request)
     logger.info("get_result_request", user_id=user_id, task_id=task_id)
@@ -1207,7 +1552,9 @@ async def get_result(request: Request, task_id: str):
         async with httpx.AsyncClient() as client:
             url = f"{TASK_RESULT_URL}{task_id}"
             
-            result_response = await client.get(url)
+            upstream_start = time.perf_counter()
+            result_response = await client.get(url, headers=tracer.headers())
+            observe_upstream("task-result", str(result_response.status_code), time.perf_counter() - upstream_start)
             
             if result_response.status_code == 200:
                 result_data = result_response.json()
@@ -1240,7 +1587,9 @@ async def get_result(request: Request, task_id: str):
                                        task_id=task_id,
                                        original_count=original_count,
                                        filtered_count=filtered_count,
-                                       removed_products=forbidden_products)
+                                       forbidden_products_count=len(forbidden_products))
+                    
+                    remember_task_ingredients(task_id, ingredients)
                     
                     logger.info("result_retrieved_successfully", 
                                task_id=task_id,
@@ -1303,6 +1652,7 @@ async def get_result(request: Request, task_id: str):
 
 # Третий запрос - генерация рецептов с расширенными параметрами
 @app.post("/generate-recipes/{task_id}")
+@tracer.traced("backend.generate_recipes")
 async def generate_recipes(
     request: Request,
     task_id: str,
@@ -1333,11 +1683,7 @@ async def generate_recipes(
         logger.info("considering_forbidden_products", 
                    user_id=user_id,
                    forbidden_products_count=len(forbidden_products))
-        # Добавляем запрещенные продукты в feedback для учета при генерации
-        if user_feedback and user_feedback != "нет":
-            user_feedback += f". Исключить: {', '.join(forbidden_products)}"
-        else:
-            user_feedback = f"Исключить: {', '.join(forbidden_products)}"
+        user_feedback = build_generation_feedback(user_feedback, forbidden_products)
     
     max_retries = 5
     base_retry_delay = 10
@@ -1356,14 +1702,16 @@ async def generate_recipes(
                 
                 logger.debug("generate_recipes_attempt", 
                            attempt=attempt + 1,
-                           max_attempts=max_retries,
-                           data=data)
+                           max_attempts=max_retries)
                 
+                upstream_start = time.perf_counter()
                 response = await client.post(
                     f"{COOK_FROM_IMAGE_URL}{task_id}",
                     data=data,
+                    headers=tracer.headers(),
                     timeout=60.0
                 )
+                observe_upstream("cook-from-image", str(response.status_code), time.perf_counter() - upstream_start)
                 
                 if response.status_code == 200:
                     result_data = response.json()
@@ -1383,11 +1731,7 @@ async def generate_recipes(
                         ingredients = []
                     
                     # Сохраняем рецепты локально для последующего использования
-                    local_recipes_path = Path(f"./local_recipes/{task_id}_recipes.json")
-                    local_recipes_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    with open(local_recipes_path, "w", encoding="utf-8") as f:
-                        json.dump(result_data, f, ensure_ascii=False, indent=2)
+                    local_recipes_path = write_artifact(task_recipes_path(task_id), result_data)
                     
                     logger.info("recipes_saved_locally", 
                                task_id=task_id,
@@ -1413,6 +1757,18 @@ async def generate_recipes(
                                  attempt=attempt + 1,
                                  wait_time=wait_time)
                     
+                    # Вместо ожидания — сохранённые рецепты из индекса, если они подходят
+                    fallback_recipes = await suggest_saved_recipes(
+                        task_ingredients.get(task_id, []),
+                        forbidden_products,
+                        preference_levels(preferred_cooking_time, preferred_difficulty, preferred_calorie_level),
+                    )
+                    if fallback_recipes:
+                        logger.info("rate_limit_fallback_to_recipe_index",
+                                   task_id=task_id,
+                                   recipes_count=len(fallback_recipes))
+                        return save_index_recipes(task_id, fallback_recipes, forbidden_products, overwrite=True)
+                    
                     if attempt < max_retries - 1:
                         await asyncio.sleep(wait_time)
                         continue
@@ -1462,6 +1818,74 @@ async def generate_recipes(
     raise HTTPException(status_code=500, detail="Не удалось выполнить запрос после нескольких попыток")
 
 
+def save_index_recipes(task_id: str, recipes: List[dict], forbidden_products: List[str], overwrite: bool = False) -> dict:
+    """
+    Ответ в формате /generate-recipes для рецептов из индекса. Файл рецептов задачи пишется,
+    чтобы /complete-recipe работал и с ними; рецепты LLM (если уже есть) не затираются без overwrite
+    """
+    ingredients = task_ingredients.get(task_id, [])
+    result_data = {
+        "ingredients": ingredients,
+        "recipes": recipes,
+        "prompt_version": "recipe_index",
+    }
+    local_recipes_path = task_recipes_path(task_id)
+    if overwrite or find_artifact(LOCAL_RECIPES_DIR, local_recipes_path.name) is None:
+        write_artifact(local_recipes_path, result_data)
+    
+    return {
+        "ingredients": ingredients,
+        "recipes": recipes,
+        "source": "recipe_index",
+        "saved_to": str(local_recipes_path),
+        "forbidden_products_considered": forbidden_products if forbidden_products else [],
+        "task_id": task_id
+    }
+
+# Быстрые подсказки из сохранённых рецептов — за миллисекунды, пока LLM генерирует новые
+@app.get("/quick-recipes/{task_id}")
+@tracer.traced("backend.quick_recipes")
+async def quick_recipes(
+    request: Request,
+    task_id: str,
+    ingredients: str = None,
+    preferred_calorie_level: str = "нет",
+    preferred_cooking_time: str = "нет",
+    preferred_difficulty: str = "нет",
+    limit: int = 5
+):
+    user_id = get_current_user(request)
+    start = time.perf_counter()
+    
+    # Ингредиенты можно передать явно (через запятую), иначе берутся распознанные для задачи
+    if ingredients:
+        ingredient_list = [i.strip() for i in ingredients.split(",") if i.strip()]
+    else:
+        ingredient_list = task_ingredients.get(task_id, [])
+    forbidden_products = get_forbidden_products(user_id)
+    
+    recipes = await suggest_saved_recipes(
+        ingredient_list,
+        forbidden_products,
+        preference_levels(preferred_cooking_time, preferred_difficulty, preferred_calorie_level),
+        limit=max(1, min(limit, 20)),
+    )
+    if recipes:
+        remember_task_ingredients(task_id, ingredient_list)
+        response = save_index_recipes(task_id, recipes, forbidden_products)
+    else:
+        response = {"ingredients": ingredient_list, "recipes": [], "source": "recipe_index", "task_id": task_id}
+    
+    response["index_size"] = len(await get_recipe_index())
+    response["took_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    logger.info("quick_recipes_served",
+               user_id=user_id,
+               task_id=task_id,
+               ingredients_count=len(ingredient_list),
+               recipes_count=len(recipes),
+               took_ms=response["took_ms"])
+    return response
+
 # Дополнительный endpoint для получения информации о запрещенных продуктах
 @app.get("/user/forbidden-products")
 async def get_user_forbidden_products(request: Request):
@@ -1485,6 +1909,26 @@ async def get_user_forbidden_products(request: Request):
         "count": len(forbidden_products)
     }
 
+# Временная шкала задачи: где уходит время от загрузки фото до сохранения рецепта
+@app.get("/api/timeline/{task_id}")
+async def get_task_timeline(task_id: str):
+    spans = tracer.load(task_id)
+
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{TRACE_URL}{task_id}", headers=tracer.headers(), timeout=5.0)
+        if response.status_code == 200:
+            spans.extend(response.json().get("spans", []))
+    except Exception as e:
+        logger.warning("ml_trace_fetch_failed", task_id=task_id, error=str(e))
+
+    if not spans:
+        raise HTTPException(status_code=404, detail="Трасса задачи не найдена")
+
+    timeline = build_timeline(spans)
+    timeline["task_id"] = task_id
+    return timeline
+
 # API endpoint для получения предпочтений
 @app.get("/api/preferences")
 async def get_preferences_api(request: Request):
@@ -1527,17 +1971,14 @@ async def complete_recipe(task_id: str, request: Request):
             )
 
         # Загружаем данные о рецептах
-        local_recipes_path = Path(f"./local_recipes/{task_id}_recipes.json")
-        if not local_recipes_path.exists():
-            logger.error("recipes_file_not_found", task_id=task_id, path=str(local_recipes_path))
+        recipes_data = load_task_recipes(task_id)
+        if recipes_data is None:
+            logger.error("recipes_file_not_found", task_id=task_id, path=str(task_recipes_path(task_id)))
             return JSONResponse(
                 status_code=404,
                 content={"success": False, "detail": f"Файл с рецептами не найден"}
             )
 
-        with open(local_recipes_path, "r", encoding="utf-8") as f:
-            recipes_data = json.load(f)
-
         recipes = recipes_data.get("recipes", [])
         prompt_version = recipes_data.get("prompt_version", "unknown")
 
@@ -1571,8 +2012,9 @@ async def complete_recipe(task_id: str, request: Request):
 
         # Сохраняем в таблицу History
         if completed_recipe_indexes:
-            con = sqlite3.connect(DB_PATH)
+            con = sqlite3.connect(DB_PATH, factory=TimedConnection)
             cursor = con.cursor()
+            new_recipes = []
 
             for i in completed_recipe_indexes:
                 recipe = recipes[i]
@@ -1594,6 +2036,12 @@ async def complete_recipe(task_id: str, request: Request):
                         (recipe_name, steps_text, cooking_time, difficulty, calorie_level)
                     )
                     id_recipes = cursor.lastrowid
+                    ingredient_names = [
+                        ingredient.get("name", "") for ingredient in recipe.get("ingredients", [])
+                        if isinstance(ingredient, dict)
+                    ]
+                    linked = link_recipe_products(cursor, id_recipes, ingredient_names)
+                    new_recipes.append((id_recipes, recipe_name, steps_text, cooking_time, difficulty, calorie_level, linked))
 
                 cursor.execute(
                     "SELECT id_history FROM History WHERE id_user=? AND id_recipes=?",
@@ -1611,6 +2059,11 @@ async def complete_recipe(task_id: str, request: Request):
             con.commit()
             con.close()
 
+            # Новые рецепты сразу доступны быстрым подсказкам (без ожидания перестройки индекса)
+            if _recipe_index is not None:
+                for new_recipe in new_recipes:
+                    _recipe_index.add(*new_recipe[:6], ingredients=new_recipe[6])
+
             # ✅ Логируем общее действие: сохранение всех рецептов
             try:
                 log_user_action(
@@ -1649,6 +2102,7 @@ async def complete_recipe(task_id: str, request: Request):
         )
 '''
 @app.post("/complete-recipe/{task_id}")
+@tracer.traced("backend.complete_recipe")
 async def complete_recipe(task_id: str, request: Request):
     """
     Сохраняет завершенные рецепты в историю пользователя
@@ -1668,17 +2122,14 @@ async def complete_recipe(task_id: str, request: Request):
             )
 
         # Загружаем данные о рецептах
-        local_recipes_path = Path(f"./local_recipes/{task_id}_recipes.json")
-        if not local_recipes_path.exists():
-            logger.error("recipes_file_not_found", task_id=task_id, path=str(local_recipes_path))
+        recipes_data = load_task_recipes(task_id)
+        if recipes_data is None:
+            logger.error("recipes_file_not_found", task_id=task_id, path=str(task_recipes_path(task_id)))
             return JSONResponse(
                 status_code=404,
                 content={"success": False, "detail": f"Файл с рецептами не найден"}
             )
 
-        with open(local_recipes_path, "r", encoding="utf-8") as f:
-            recipes_data = json.load(f)
-
         recipes = recipes_data.get("recipes", [])
         prompt_version = recipes_data.get("prompt_version", "unknown")
 
@@ -1712,7 +2163,7 @@ async def complete_recipe(task_id: str, request: Request):
 
         # Сохраняем в таблицу History
         if completed_recipe_indexes:
-            con = sqlite3.connect(DB_PATH)
+            con = sqlite3.connect(DB_PATH, factory=TimedConnection)
             cursor = con.cursor()
             
             # Получаем текущую дату в формате YYYY-MM-DD
@@ -1932,7 +2383,7 @@ async def generate_test_recipes(
     filtered_recipes = test_recipes
     if forbidden_products:
         logger.info("filtering_test_recipes", 
-                   forbidden_products=forbidden_products)
+                   forbidden_products_count=len(forbidden_products))
         filtered_recipes = []
         for recipe in test_recipes:
             # Проверяем, нет ли запрещенных продуктов в ингредиентах
@@ -1948,8 +2399,7 @@ async def generate_test_recipes(
                            reason="contains_forbidden_products")
 
     # Сохраняем рецепты локально
-    local_recipes_path = Path(f"./local_recipes/{task_id}_recipes.json")
-    local_recipes_path.parent.mkdir(parents=True, exist_ok=True)
+    local_recipes_path = task_recipes_path(task_id)
     
     save_data = {
         "ingredients": {"ingredients": [{"name": "брокколи"}, {"name": "курица"}, {"name": "сыр"}]},
@@ -1961,8 +2411,7 @@ async def generate_test_recipes(
         "excluded_recipes": existing_recipes
     }
     
-    with open(local_recipes_path, "w", encoding="utf-8") as f:
-        json.dump(save_data, f, ensure_ascii=False, indent=2)
+    write_artifact(local_recipes_path, save_data)
     
     logger.info("test_recipes_saved", 
                task_id=task_id,
@@ -1999,7 +2448,7 @@ async def show_saved_recipes(request: Request, task_id: str):
             return RedirectResponse(url="/", status_code=303)
 
         # Получаем данные о сохраненных рецептах из базы данных
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
 
         # Ищем рецепты, сохраненные для этой задачи
@@ -2018,12 +2467,9 @@ async def show_saved_recipes(request: Request, task_id: str):
         # Если у нас есть task_id, можем попробовать получить более точные данные
         # из локального файла с рецептами
         specific_saved_recipes = []
-        local_recipes_path = Path(f"./local_recipes/{task_id}_recipes.json")
+        recipes_data = load_task_recipes(task_id)
         
-        if local_recipes_path.exists():
-            with open(local_recipes_path, "r", encoding="utf-8") as f:
-                recipes_data = json.load(f)
-            
+        if recipes_data is not None:
             # Получаем названия рецептов из файла
             all_recipes = recipes_data.get("recipes", [])
             recipe_names = [recipe.get("name", f"Рецепт {i+1}") for i, recipe in enumerate(all_recipes)]
@@ -2070,7 +2516,7 @@ async def show_all_saved_recipes(request: Request):
             return RedirectResponse(url="/", status_code=303)
 
         # Получаем все сохраненные рецепты пользователя
-        con = sqlite3.connect(DB_PATH)
+        con = sqlite3.connect(DB_PATH, factory=TimedConnection)
         cursor = con.cursor()
 
         cursor.execute("""
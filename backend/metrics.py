@@ -0,0 +1,122 @@
+import sqlite3
+import time
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from common.routes import route_label
+
+# Бакеты под реальные задержки: от миллисекунд (страницы, БД) до минуты (генерация рецептов)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "backend_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "backend_http_requests_in_progress",
+    "Количество запросов в обработке",
+)
+DB_QUERY_SECONDS = Histogram(
+    "backend_db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    ["operation"],
+    buckets=DB_BUCKETS,
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "backend_upstream_request_duration_seconds",
+    "Время запроса к ML-серверу",
+    ["endpoint", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Размер загрузки и пик памяти при её приёме: от десятков килобайт до лимита (10 МБ по умолчанию)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 20 * 1024 ** 2)
+UPLOAD_BYTES = Histogram(
+    "backend_upload_size_bytes",
+    "Размер загруженного фото",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+UPLOAD_PEAK_MEMORY = Histogram(
+    "backend_upload_peak_memory_bytes",
+    "Пик памяти при приёме одной загрузки",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+STORAGE_BYTES = Gauge(
+    "backend_storage_bytes",
+    "Объём файлов категории хранилища на диске",
+    ["category"],
+)
+STORAGE_FILES = Gauge(
+    "backend_storage_files",
+    "Число файлов категории хранилища",
+    ["category"],
+)
+STORAGE_JANITOR_ACTIONS = Counter(
+    "backend_storage_janitor_actions_total",
+    "Действия уборщика хранилища: deleted, compressed, migrated",
+    ["category", "action"],
+)
+
+async def metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status = "500"
+    HTTP_REQUESTS_IN_PROGRESS.inc()
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        HTTP_REQUESTS_IN_PROGRESS.dec()
+        HTTP_REQUEST_SECONDS.labels(request.method, route_label(request), status).observe(
+            time.perf_counter() - start
+        )
+
+
+async def metrics_endpoint():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _operation(sql: str) -> str:
+    words = sql.lstrip().split(None, 1)
+    operation = words[0].lower() if words else "other"
+    return operation if operation in ("select", "insert", "update", "delete", "pragma") else "other"
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Курсор, который замеряет время каждого execute"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.labels(_operation(sql)).observe(time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            DB_QUERY_SECONDS.labels(_operation(sql)).observe(time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Соединение SQLite, курсоры которого пишут метрики времени запросов"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+
+def observe_upstream(endpoint: str, outcome: str, seconds: float):
+    UPSTREAM_REQUEST_SECONDS.labels(endpoint, outcome).observe(seconds)
+
+
+def observe_upload(route: str, size: int, peak_memory: int):
+    UPLOAD_BYTES.labels(route).observe(size)
+    UPLOAD_PEAK_MEMORY.labels(route).observe(peak_memory)
@@ -0,0 +1,209 @@
+"""
+Индекс сохранённых рецептов (таблица Recipes) для мгновенных подсказок без обращения к LLM.
+
+Каждый ингредиент каталога получает номер бита, рецепт — маску своих ингредиентов, а
+ингредиент — маску рецептов, в которых он встречается (обратный индекс). Кандидаты для
+набора продуктов пользователя — объединение масок его ингредиентов, покрытие рецепта —
+число бит в пересечении масок. Время, сложность и калорийность разобраны заранее.
+"""
+import os
+import re
+import threading
+import time
+
+from common.ingredients import IngredientCatalogue, get_catalogue
+
+QUICK_RECIPES_LIMIT = int(os.getenv("QUICK_RECIPES_LIMIT", 5))
+# Доля ингредиентов рецепта, которые должны быть у пользователя
+QUICK_RECIPES_MIN_COVERAGE = float(os.getenv("QUICK_RECIPES_MIN_COVERAGE", 0.5))
+# Продукты, которые считаются всегда доступными и не влияют на покрытие
+STAPLES = {"вода", "соль", "перец", "черный перец", "сахар", "растительное масло"}
+
+# Уровни 1..3 — как в таблицах CookingTime, Difficulty и CalorieContent
+_LEVEL_WORDS = {
+    "time": ("быстр", "средн", "долг"),
+    "difficulty": ("легк", "средн", "сложн"),
+    "calorie": ("низк", "средн", "высок"),
+}
+_MINUTES = re.compile(r"(\d+)\s*(ч|мин)?")
+
+
+def cooking_minutes(text) -> int | None:
+    """Минуты из «47 минут», «1 час 20 минут» или просто «35»"""
+    total = None
+    for number, unit in _MINUTES.findall(str(text or "").lower()):
+        total = (total or 0) + int(number) * (60 if unit == "ч" else 1)
+    return total
+
+
+def time_level(minutes: int | None) -> int | None:
+    # Пороги — как в промпте генерации: быстро ≤ 20 минут, средне 21–40, долго > 40
+    if minutes is None:
+        return None
+    return 1 if minutes <= 20 else 2 if minutes <= 40 else 3
+
+
+def word_level(kind: str, text) -> int | None:
+    """Уровень по слову («Легко», «среднекалорийное», ...); None, если не распознан или «нет»"""
+    text = str(text or "").lower()
+    for level, prefix in enumerate(_LEVEL_WORDS[kind], start=1):
+        if text.startswith(prefix):
+            return level
+    return None
+
+
+class IndexedRecipe:
+    __slots__ = ("id", "title", "description", "cooking_time", "difficulty", "calorie_level",
+                 "ingredients", "mask", "size", "levels")
+
+    def __init__(self, recipe_id, title, description, cooking_time, difficulty, calorie_level, ingredients, mask):
+        self.id = recipe_id
+        self.title = title
+        self.description = description or ""
+        self.cooking_time = cooking_time
+        self.difficulty = difficulty
+        self.calorie_level = calorie_level
+        self.ingredients = ingredients
+        self.mask = mask
+        self.size = mask.bit_count()
+        self.levels = {
+            "time": time_level(cooking_minutes(cooking_time)),
+            "difficulty": word_level("difficulty", difficulty),
+            "calorie": word_level("calorie", calorie_level),
+        }
+
+    def to_recipe(self, matched: list, missing: list, coverage: float) -> dict:
+        """Рецепт в формате ответа LLM (name, ingredients, steps), чтобы фронтенд показывал его так же"""
+        steps = [line.strip() for line in self.description.splitlines() if line.strip()]
+        return {
+            "id": self.id,
+            "name": self.title,
+            "ingredients": [{"name": name} for name in self.ingredients],
+            "steps": [{"order": i, "instruction": step} for i, step in enumerate(steps, start=1)],
+            "cooking_time": self.cooking_time,
+            "difficulty": self.difficulty,
+            "calorie_level": self.calorie_level,
+            "coverage": round(coverage, 3),
+            "matched_ingredients": matched,
+            "missing_ingredients": missing,
+            "source": "recipe_index",
+        }
+
+
+class RecipeIndex:
+    """Обратный индекс «ингредиент -> рецепты» на битовых масках"""
+
+    def __init__(self, catalogue: IngredientCatalogue = None):
+        self.catalogue = catalogue or get_catalogue()
+        self.recipes = []
+        self.built_at = time.monotonic()
+        self._bits = {}       # ключ ингредиента -> номер бита
+        self._names = []      # номер бита -> имя ингредиента
+        self._postings = []   # номер бита -> маска рецептов
+        self._ids = set()
+        self._forbidden_masks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def add(self, recipe_id, title, description="", cooking_time=None, difficulty=None, calorie_level=None,
+            ingredients=None) -> bool:
+        """
+        Рецепт в индекс; ingredients — названия продуктов (ProductsInRecipes), без них ингредиенты
+        ищутся в названии и описании. False, если рецепт уже есть
+        """
+        with self._lock:
+            if recipe_id in self._ids:
+                return False
+            if ingredients:
+                names = self.catalogue.canonicalize(ingredients)
+            else:
+                names = self.catalogue.mentions(f"{title}\n{description or ''}")
+            names = [n for n in names if n not in STAPLES]
+
+            position = len(self.recipes)
+            mask = 0
+            for name in names:
+                bit = self._bit(name)
+                mask |= 1 << bit
+                self._postings[bit] |= 1 << position
+            self.recipes.append(IndexedRecipe(recipe_id, title, description, cooking_time, difficulty,
+                                              calorie_level, names, mask))
+            self._ids.add(recipe_id)
+            self._forbidden_masks.clear()
+            return True
+
+    def _bit(self, name: str) -> int:
+        key = self.catalogue.key(name)
+        bit = self._bits.get(key)
+        if bit is None:
+            bit = self._bits[key] = len(self._names)
+            self._names.append(name)
+            self._postings.append(0)
+        return bit
+
+    def mask_of(self, names) -> int:
+        mask = 0
+        for name in names:
+            bit = self._bits.get(self.catalogue.key(name))
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def _forbidden_mask(self, forbidden_products) -> int:
+        """Биты ингредиентов индекса, попадающих под запрет (кэш по набору запретов)"""
+        cache_key = frozenset(forbidden_products or ())
+        if not cache_key:
+            return 0
+        mask = self._forbidden_masks.get(cache_key)
+        if mask is None:
+            keys = self.catalogue.forbidden_keys(cache_key)
+            mask = 0
+            for bit, name in enumerate(self._names):
+                if self.catalogue.is_forbidden(name, keys):
+                    mask |= 1 << bit
+            self._forbidden_masks[cache_key] = mask
+        return mask
+
+    def suggest(self, ingredients, forbidden_products=(), preferences: dict = None,
+                limit: int = QUICK_RECIPES_LIMIT, min_coverage: float = QUICK_RECIPES_MIN_COVERAGE) -> list:
+        """
+        Лучшие рецепты по покрытию (доля ингредиентов рецепта, которые есть у пользователя).
+        Рецепты с запрещёнными продуктами пропускаются; совпадение с preferences
+        ({"time"|"difficulty"|"calorie": уровень 1..3}) поднимает рецепт при равном покрытии
+        """
+        # Укроп у пользователя подходит и рецепту с «зеленью» (категория), но не наоборот
+        ingredients = list(ingredients)
+        user_mask = self.mask_of([*ingredients, *filter(None, map(self.catalogue.category, ingredients))])
+        forbidden_mask = self._forbidden_mask(forbidden_products)
+        preferences = {k: v for k, v in (preferences or {}).items() if v}
+
+        candidates = 0
+        bits = user_mask
+        while bits:
+            low = bits & -bits
+            candidates |= self._postings[low.bit_length() - 1]
+            bits ^= low
+
+        scored = []
+        while candidates:
+            low = candidates & -candidates
+            candidates ^= low
+            recipe = self.recipes[low.bit_length() - 1]
+            if recipe.mask & forbidden_mask:
+                continue
+            have = (recipe.mask & user_mask).bit_count()
+            coverage = have / recipe.size
+            if coverage < min_coverage:
+                continue
+            preferred = sum(recipe.levels.get(k) == v for k, v in preferences.items())
+            scored.append((coverage, preferred, have, recipe))
+
+        scored.sort(key=lambda item: item[:3], reverse=True)
+        result = []
+        for coverage, _, _, recipe in scored[:limit]:
+            matched = [n for n in recipe.ingredients if self.mask_of([n]) & user_mask]
+            missing = [n for n in recipe.ingredients if n not in matched]
+            result.append(recipe.to_recipe(matched, missing, coverage))
+        return result
@@ -0,0 +1,53 @@
+"""
+Жизненный цикл файлов бэкенда: рецепты задач (local_recipes), фото в staging и public/uploads.
+
+Раскладка по шардам и уборщик — общие с ML-сервером (common/storage.py): файл задачи лежит
+в подкаталоге-шарде по хэшу ключа — local_recipes/3f/<task_id>_recipes.json. Здесь — политики
+хранения бэкенда, его метрики и периодический запуск уборщика.
+"""
+import asyncio
+from pathlib import Path
+
+import structlog
+
+from common.storage import STORAGE_JANITOR, STORAGE_SWEEP_INTERVAL, Retention
+from common.storage import Janitor as BaseJanitor
+from metrics import STORAGE_BYTES, STORAGE_FILES, STORAGE_JANITOR_ACTIONS
+
+logger = structlog.get_logger()
+
+LOCAL_RECIPES_DIR = Path("./local_recipes")
+PUBLIC_UPLOADS_DIR = Path("../public/uploads")
+
+
+class Janitor(BaseJanitor):
+    """Уборщик с метриками backend_storage_*"""
+
+    bytes_gauge = STORAGE_BYTES
+    files_gauge = STORAGE_FILES
+    actions_counter = STORAGE_JANITOR_ACTIONS
+
+
+def default_policies() -> list:
+    from uploads import STAGING_DIR
+
+    return [
+        # Рецепты задачи нужны для /complete-recipe и /task-saved-recipes — пока пользователь к ней возвращается
+        Retention("local_recipes", LOCAL_RECIPES_DIR, compress_after=7, delete_after=90),
+        # Общий с ML-сервером staging: в режиме shared фото остаются здесь после передачи
+        Retention("staging", STAGING_DIR, delete_after=3, max_bytes=5 * 1024 ** 3),
+        # Фото /test-vlm отдаются по ссылке /uploads/<имя> — без удаления и сжатия, только объём в метриках
+        # (включается через STORAGE_PUBLIC_UPLOADS_DELETE_DAYS)
+        Retention("public_uploads", PUBLIC_UPLOADS_DIR, sharded=False),
+    ]
+
+
+async def janitor_loop(janitor: Janitor, interval: float = STORAGE_SWEEP_INTERVAL):
+    """Периодическая уборка в отдельном потоке, чтобы обход каталогов не блокировал event loop"""
+    while True:
+        try:
+            stats = await asyncio.to_thread(janitor.sweep)
+            logger.info("storage_swept", **stats)
+        except Exception as e:
+            logger.error("storage_sweep_error", error=str(e))
+        await asyncio.sleep(interval)
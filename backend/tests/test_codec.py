@@ -0,0 +1,31 @@
+import gzip
+import json
+
+import pytest
+
+from common import codec
+
+PAYLOAD = {"ingredients": {"ingredients": [{"name": "яйца"}]}, "recipes": [{"name": "Омлет", "time": 10}]}
+
+
+@pytest.mark.parametrize("spec", ["plain", "json", "json+gzip"])
+def test_artifact_round_trip(tmp_path, spec):
+    """Файл любого формата читается обратно без знания настройки, с которой был записан"""
+    path = codec.write_artifact(tmp_path / "ab" / "task-1_recipes.json", PAYLOAD, spec)
+    assert codec.read_artifact(path) == PAYLOAD
+    assert path.read_bytes().startswith(codec.MAGIC) == (spec != "plain")
+    assert codec.is_compressed(path) == spec.endswith("+gzip")
+    assert [p.name for p in path.parent.iterdir()] == ["task-1_recipes.json"]
+
+
+def test_reads_legacy_and_janitor_compressed_json(tmp_path):
+    """Старые файлы json.dump без заголовка читаются как есть, в том числе сжатые уборщиком"""
+    legacy = tmp_path / "task-1_recipes.json"
+    legacy.write_text(json.dumps(PAYLOAD, ensure_ascii=False, indent=2), encoding="utf-8")
+    gzipped = tmp_path / "task-2_recipes.json.gz"
+    gzipped.write_bytes(gzip.compress(codec.dumps(PAYLOAD, "json")))
+
+    assert codec.read_artifact(legacy) == PAYLOAD
+    assert codec.read_artifact(gzipped) == PAYLOAD
+    with pytest.raises(ValueError):
+        codec.dumps(PAYLOAD, "yaml")
@@ -0,0 +1,58 @@
+import asyncio
+import concurrent.futures
+
+from credentials import PasswordHasher, is_hashed
+
+
+def make_hasher(**kwargs):
+    # Небольшой work factor, чтобы тесты выполнялись быстро
+    params = {"n": 2 ** 10, "r": 8, "p": 1}
+    params.update(kwargs)
+    return PasswordHasher(**params)
+
+
+class TestPasswordHasher:
+    """Тесты хэширования паролей"""
+
+    def test_hash_and_verify(self):
+        """Хэш проверяется исходным паролем и не проверяется чужим"""
+        hasher = make_hasher()
+        stored = hasher.hash_sync("secret")
+
+        assert is_hashed(stored)
+        assert "secret" not in stored
+        assert hasher.verify_sync("secret", stored) == (True, False)
+        assert hasher.verify_sync("wrong", stored) == (False, False)
+
+    def test_legacy_plaintext_needs_rehash(self):
+        """Пароль в открытом виде принимается и помечается для миграции"""
+        hasher = make_hasher()
+
+        assert hasher.verify_sync("secret", "secret") == (True, True)
+        assert hasher.verify_sync("wrong", "secret") == (False, False)
+        assert hasher.verify_sync("secret", None) == (False, False)
+
+    def test_work_factor_change_needs_rehash(self):
+        """После смены work factor старые хэши перехэшируются"""
+        old_hasher = make_hasher(n=2 ** 9)
+        new_hasher = make_hasher(n=2 ** 10)
+        stored = old_hasher.hash_sync("secret")
+
+        assert new_hasher.verify_sync("secret", stored) == (True, True)
+
+    def test_async_hashing_on_pool_records_latency(self):
+        """Асинхронное хэширование идёт через пул и пишет перцентили"""
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        hasher = make_hasher(executor=pool, max_concurrent=2)
+
+        async def burst():
+            hashes = await asyncio.gather(*(hasher.hash(f"pw{i}") for i in range(6)))
+            return await asyncio.gather(*(hasher.verify(f"pw{i}", h) for i, h in enumerate(hashes)))
+
+        results = asyncio.run(burst())
+        pool.shutdown()
+
+        assert all(ok for ok, _ in results)
+        stats = hasher.stats()
+        assert stats["hash_count"] == 12
+        assert stats["hash_latency_ms"]["p50"] <= stats["hash_latency_ms"]["p99"]
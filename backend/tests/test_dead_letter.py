@@ -0,0 +1,135 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+aio_pika = pytest.importorskip("aio_pika")
+
+from ml.api import dead_letter
+from ml.api.dead_letter import AttemptLedger, retry_delay, retry_later
+
+
+def make_message(body, message_id="t-1", headers=None):
+    raw = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    return SimpleNamespace(body=raw, message_id=message_id, content_type="application/json",
+                           headers=headers or {}, ack=AsyncMock(), nack=AsyncMock())
+
+
+class FakeChannel:
+    """Канал aio_pika: объявленные очереди и опубликованные сообщения"""
+
+    def __init__(self, messages=()):
+        self.declared = {}
+        self.published = []
+        self.default_exchange = SimpleNamespace(publish=AsyncMock(side_effect=self._publish))
+        self._messages = list(messages)
+
+    async def _publish(self, message, routing_key):
+        self.published.append((routing_key, message))
+
+    async def declare_queue(self, name, durable=False, arguments=None):
+        self.declared[name] = arguments
+        return SimpleNamespace(get=AsyncMock(side_effect=lambda **kwargs: self._messages.pop(0) if self._messages else None))
+
+
+def test_attempt_ledger_counts_and_clears(tmp_path):
+    ledger = AttemptLedger(tmp_path / ".attempts")
+
+    assert [ledger.begin("t-1") for _ in range(3)] == [1, 2, 3]
+    assert ledger.begin("t-2") == 1
+    ledger.clear("t-1")
+    ledger.clear("missing")
+
+    assert ledger.begin("t-1") == 1
+    assert ledger.begin("t-2") == 2
+
+
+def test_retry_delay_doubles_up_to_max(monkeypatch):
+    monkeypatch.setattr(dead_letter, "RETRY_BASE_DELAY", 5)
+    monkeypatch.setattr(dead_letter, "RETRY_MAX_DELAY", 30)
+
+    assert [retry_delay(attempt) for attempt in (0, 1, 2, 3, 4, 10)] == [5, 5, 10, 20, 30, 30]
+
+
+def test_retry_later_parks_copy_in_expiring_ttl_queue(monkeypatch):
+    monkeypatch.setattr(dead_letter, "RETRY_BASE_DELAY", 5)
+    channel = FakeChannel()
+    message = make_message({"task_id": "t-1"}, headers={"traceparent": "00-abc"})
+
+    delay = asyncio.run(retry_later(channel, message, attempt=2))
+
+    assert delay == 10
+    arguments = channel.declared["ingredient_queue.retry.10000"]
+    assert arguments["x-message-ttl"] == 10000
+    assert arguments["x-dead-letter-routing-key"] == dead_letter.QUEUE_NAME
+    # Очередь живёт дольше сообщения в ней, но не вечно
+    assert arguments["x-expires"] > arguments["x-message-ttl"]
+    routing_key, copy = channel.published[0]
+    assert routing_key == "ingredient_queue.retry.10000"
+    assert copy.body == message.body
+    assert copy.headers == {"traceparent": "00-abc"}
+
+
+def test_replay_skips_unparsable_messages(monkeypatch, tmp_path):
+    """Сообщение invalid_message остаётся в DLQ, остальные возвращаются в рабочую очередь"""
+    monkeypatch.setattr(dead_letter, "RESULTS_DIR", tmp_path)
+    broken = make_message(b"not json", message_id="m-1", headers={"x-dead-reason": "invalid_message: ..."})
+    not_a_dict = make_message([1, 2], message_id="m-2")
+    good = make_message({"task_id": "t-1", "image_path": "a.jpg"}, headers={"x-dead-reason": "exception: boom",
+                                                                            "traceparent": "00-abc"})
+    channel = FakeChannel([broken, not_a_dict, good])
+    connection = Mock(__aenter__=AsyncMock(), __aexit__=AsyncMock(return_value=False),
+                      channel=AsyncMock(return_value=channel))
+    monkeypatch.setattr(dead_letter.aio_pika, "connect_robust", AsyncMock(return_value=connection))
+
+    replayed = asyncio.run(dead_letter.replay())
+
+    assert replayed == 1
+    broken.nack.assert_awaited_once_with(requeue=True)
+    not_a_dict.nack.assert_awaited_once_with(requeue=True)
+    good.ack.assert_awaited_once()
+    routing_key, message = channel.published[0]
+    assert routing_key == dead_letter.QUEUE_NAME
+    assert json.loads(message.body)["task_id"] == "t-1"
+    assert message.headers == {"traceparent": "00-abc"}
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    worker = pytest.importorskip("ml.api.worker")
+    monkeypatch.setattr(dead_letter, "RESULTS_DIR", tmp_path)
+    monkeypatch.setattr(worker, "ledger", AttemptLedger(tmp_path / ".attempts"))
+    monkeypatch.setattr(worker, "dead_letter_exchange", SimpleNamespace(publish=AsyncMock()))
+    monkeypatch.setattr(worker, "process_task", AsyncMock(side_effect=AssertionError("задача не должна выполняться")))
+    return worker
+
+
+def test_worker_skips_task_with_done_result(worker):
+    dead_letter.write_result("t-1", {"status": "done", "ingredients": {}})
+    worker.ledger.begin("t-1")
+    message = make_message({"task_id": "t-1", "image_path": "a.jpg"})
+
+    asyncio.run(worker.handle_message(message))
+
+    message.ack.assert_awaited_once()
+    worker.process_task.assert_not_called()
+    assert worker.ledger.begin("t-1") == 1
+
+
+def test_worker_dead_letters_after_max_deliveries(worker, monkeypatch):
+    monkeypatch.setattr(worker, "MAX_DELIVERIES", 2)
+    for _ in range(2):
+        worker.ledger.begin("t-1")
+    message = make_message({"task_id": "t-1", "image_path": "a.jpg"})
+
+    asyncio.run(worker.handle_message(message))
+
+    worker.process_task.assert_not_called()
+    worker.dead_letter_exchange.publish.assert_awaited_once()
+    published = worker.dead_letter_exchange.publish.call_args.args[0]
+    assert published.headers["x-dead-reason"] == "max_deliveries_exceeded"
+    assert published.headers["x-dead-attempts"] == 2
+    message.ack.assert_awaited_once()
+    assert dead_letter.load_result("t-1") == {"status": "error", "error": "max_deliveries_exceeded"}
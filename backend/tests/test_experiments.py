@@ -0,0 +1,122 @@
+import json
+import math
+import random
+import statistics
+
+import pytest
+
+from ml.experiments.assignment import assign_variant, bucket
+from ml.experiments.sequential import (ABAggregator, Metric, RunningStats, SequentialTest,
+                                       aggregate_file, msprt_likelihood_ratio)
+
+
+def stats_of(values) -> RunningStats:
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+    return stats
+
+
+def test_assignment_is_sticky_and_independent_of_call_order():
+    users = [f"user-{i}" for i in range(200)]
+    first = {u: assign_variant("prompt_v2", u, ["a", "b"]) for u in users}
+    again = {u: assign_variant("prompt_v2", u, ["a", "b"]) for u in reversed(users)}
+
+    assert first == again
+    assert 0 <= bucket("prompt_v2", "user-1") < 1
+    # Соль эксперимента: в другом эксперименте те же пользователи перемешаны заново
+    other = {u: assign_variant("llm_v3", u, ["a", "b"]) for u in users}
+    assert other != first
+
+
+def test_assignment_follows_weights():
+    counts = {"a": 0, "b": 0}
+    for i in range(4000):
+        counts[assign_variant("exp", i, ["a", "b"], weights=[3, 1])] += 1
+
+    assert counts["a"] / 4000 == pytest.approx(0.75, abs=0.03)
+    assert assign_variant("exp", "u", ["only"]) == "only"
+    assert assign_variant("exp", "u", ["a", "b"], weights=[0, 1]) == "b"
+
+
+def test_welford_matches_direct_computation():
+    rng = random.Random(7)
+    values = [rng.gauss(10, 3) for _ in range(500)]
+
+    stats = stats_of(values)
+
+    assert stats.n == 500
+    assert stats.mean == pytest.approx(statistics.fmean(values))
+    assert stats.variance == pytest.approx(statistics.variance(values))
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+
+def test_merged_parts_equal_single_pass():
+    rng = random.Random(11)
+    values = [rng.expovariate(0.5) for _ in range(301)]
+    merged = RunningStats()
+    for start in range(0, len(values), 97):
+        merged.merge(stats_of(values[start:start + 97]))
+    merged.merge(RunningStats())
+
+    whole = stats_of(values)
+    assert merged.n == whole.n
+    assert merged.mean == pytest.approx(whole.mean)
+    assert merged.variance == pytest.approx(whole.variance)
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+
+
+def test_msprt_ratio_matches_closed_form():
+    rng = random.Random(3)
+    xs = [rng.gauss(0, 1) for _ in range(80)]
+    ys = [rng.gauss(0.3, 1.5) for _ in range(120)]
+    tau = 0.25
+
+    var_x, var_y = statistics.variance(xs), statistics.variance(ys)
+    v = var_x / len(xs) + var_y / len(ys)
+    tau2 = tau ** 2 * (var_x + var_y) / 2
+    delta = statistics.fmean(ys) - statistics.fmean(xs)
+    expected = math.sqrt(v / (v + tau2)) * math.exp(tau2 * delta ** 2 / (2 * v * (v + tau2)))
+
+    assert msprt_likelihood_ratio(stats_of(xs), stats_of(ys), tau) == pytest.approx(expected)
+
+
+def test_sequential_test_stops_on_real_effect_and_not_on_noise():
+    rng = random.Random(5)
+    effect, noise = SequentialTest(min_samples=30), SequentialTest(min_samples=30)
+    a, b, same_a, same_b = RunningStats(), RunningStats(), RunningStats(), RunningStats()
+    p_values = []
+    for _ in range(400):
+        a.update(rng.gauss(0, 1))
+        b.update(rng.gauss(1, 1))
+        same_a.update(rng.gauss(0, 1))
+        same_b.update(rng.gauss(0, 1))
+        effect.check(a, b)
+        noise.check(same_a, same_b)
+        p_values.append(effect.p_value)
+
+    assert effect.stopped_at is not None and effect.stopped_at < 200
+    assert p_values == sorted(p_values, reverse=True)
+    assert noise.p_value > noise.alpha
+    # До min_samples в каждом варианте проверок нет
+    assert effect.looks == 400 - 29
+
+
+def test_aggregate_file_reports_winner_by_direction(tmp_path):
+    rng = random.Random(9)
+    path = tmp_path / "results.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(200):
+            variant = "a" if i % 2 else "b"
+            f.write(json.dumps({"variant": variant, "latency": rng.gauss(2 if variant == "a" else 1, 0.3),
+                                "f1": None}) + "\n")
+    metrics = [Metric("latency", "variant", higher_is_better=False), Metric("f1", "variant")]
+
+    summary = aggregate_file(str(path), ABAggregator(metrics, check_every=10)).summary()
+
+    latency = summary["latency"]
+    assert latency["variants"]["a"]["n"] == latency["variants"]["b"]["n"] == 100
+    assert latency["significant"] and latency["winner"] == "b"
+    assert latency["diff"] < 0
+    # Строки без значения метрики не учитываются
+    assert summary["f1"] == {"variants": {}}
@@ -0,0 +1,122 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from ml.tracing import exporter
+from ml.tracing.exporter import BackgroundBatcher, BufferedJsonlWriter, LangfuseEventExporter
+
+
+def test_full_queue_drops_and_counts_without_blocking():
+    entered, release = threading.Event(), threading.Event()
+    exported = []
+
+    def handler(batch):
+        entered.set()
+        release.wait(5)
+        exported.extend(batch)
+
+    batcher = BackgroundBatcher(handler, max_queue=2, batch_size=1, flush_interval=60)
+    assert batcher.submit(1)
+    # Поток занят первой пачкой — очередь вмещает ещё две записи
+    assert entered.wait(5)
+    assert batcher.submit(2) and batcher.submit(3)
+    assert batcher.submit(4) is False
+    assert batcher.stats()["dropped"] == 1
+
+    release.set()
+    batcher.close()
+    assert exported == [1, 2, 3]
+    assert batcher.stats() == {"submitted": 3, "exported": 3, "dropped": 1, "failed_batches": 0, "pending": 0}
+
+
+def test_unreachable_collector_backs_off(monkeypatch):
+    monkeypatch.setattr(exporter, "EXPORT_MAX_FAILURES", 2)
+    monkeypatch.setattr(exporter, "EXPORT_BACKOFF", 60)
+    calls = []
+
+    def handler(batch):
+        calls.append(batch)
+        raise ConnectionError("collector down")
+
+    batcher = BackgroundBatcher(handler, batch_size=1, flush_interval=60)
+    for item in range(4):
+        batcher.submit(item)
+        assert batcher.flush(5)
+
+    # После двух неудач подряд коллектор больше не дёргается, записи сразу отбрасываются
+    assert calls == [[0], [1]]
+    stats = batcher.stats()
+    assert stats["failed_batches"] == 2
+    assert stats["dropped"] == 4
+    assert stats["exported"] == 0
+    batcher.close()
+
+
+def test_success_resets_failure_streak(monkeypatch):
+    monkeypatch.setattr(exporter, "EXPORT_MAX_FAILURES", 2)
+    outcomes = iter([ConnectionError("down"), None, ConnectionError("down"), None])
+
+    def handler(batch):
+        error = next(outcomes)
+        if error:
+            raise error
+
+    batcher = BackgroundBatcher(handler, batch_size=1, flush_interval=60)
+    for item in range(4):
+        batcher.submit(item)
+        batcher.flush(5)
+
+    assert batcher.stats()["exported"] == 2
+    assert batcher.stats()["failed_batches"] == 2
+    batcher.close()
+
+
+def test_close_flushes_pending_batch_and_rejects_new_items():
+    batches = []
+    batcher = BackgroundBatcher(batches.append, batch_size=100, flush_interval=60)
+    for item in range(3):
+        batcher.submit(item)
+
+    batcher.close()
+
+    assert batches == [[0, 1, 2]]
+    assert batcher.submit(3) is False
+    assert batcher.stats()["dropped"] == 1
+    # Повторный close (atexit) ничего не делает
+    batcher.close()
+
+
+def test_langfuse_events_that_failed_go_to_debug_jsonl(tmp_path):
+    sent = []
+
+    def log_event(name, **fields):
+        if name == "bad":
+            raise ValueError("rejected")
+        sent.append((name, fields))
+
+    client = SimpleNamespace(log_event=log_event, flush=lambda: None)
+    debug_path = tmp_path / "events.jsonl"
+    events = LangfuseEventExporter(lambda: client, debug_path=str(debug_path), flush_interval=60)
+
+    events.log_event("ok", metrics={"f1": 0.5})
+    events.log_event("bad", metadata={"variant": "b"})
+    assert events.flush(5)
+
+    assert sent == [("ok", {"metrics": {"f1": 0.5}})]
+    [line] = debug_path.read_text(encoding="utf-8").splitlines()
+    record = json.loads(line)
+    assert record["name"] == "bad"
+    assert record["metadata"] == {"variant": "b"}
+    assert "rejected" in record["error"]
+    events.debug.close()
+
+
+def test_jsonl_writer_appends_batches(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    writer = BufferedJsonlWriter(str(path), flush_interval=60)
+    writer.write({"step": 1, "text": "яйца"})
+    writer.write({"step": 2})
+    writer.close()
+
+    assert [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()] == [
+        {"step": 1, "text": "яйца"}, {"step": 2}]
@@ -0,0 +1,134 @@
+import json
+import random
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ml.fakes import fake_mistral, fake_ollama
+from ml.fakes.common import FakeBehavior, LatencyModel
+
+CONFIG_KEYS = ("latency", "tokens_per_sec", "error_rate", "rate_limit_rate", "max_concurrency", "retry_after")
+
+
+def serve(module):
+    """Фейковый сервер без задержек; настройки возвращаются после теста"""
+    saved = module.behavior.to_dict()
+    module.behavior.update({"latency": 0, "tokens_per_sec": 0, "error_rate": 0, "rate_limit_rate": 0,
+                            "max_concurrency": 0, "seed": 42})
+    yield module, TestClient(module.app)
+    module.behavior.update({key: saved[key] for key in CONFIG_KEYS})
+
+
+@pytest.fixture(params=[fake_ollama, fake_mistral], ids=["ollama", "mistral"])
+def fake(request):
+    yield from serve(request.param)
+
+
+@pytest.fixture
+def ollama():
+    yield from serve(fake_ollama)
+
+
+@pytest.fixture
+def mistral():
+    yield from serve(fake_mistral)
+
+
+def call(module, client, payload=None):
+    if module is fake_ollama:
+        return client.post("/api/generate", json=payload or {"model": "m", "prompt": "p", "images": ["aGVsbG8="]})
+    return client.post("/v1/chat/completions",
+                       json=payload or {"model": "mistral-small", "messages": [{"role": "user", "content": "яйца"}]})
+
+
+def test_latency_model_parses_specs():
+    assert LatencyModel.parse("2.5").sample(random.Random(1)) == 2.5
+    assert LatencyModel.parse("fixed:0.3").describe() == "fixed:value=0.3"
+    uniform = LatencyModel.parse("uniform:low=1,high=3")
+    assert all(1 <= uniform.sample(random.Random(seed)) <= 3 for seed in range(20))
+    lognormal = LatencyModel.parse("lognormal:median=40,sigma=0")
+    assert lognormal.sample(random.Random(1)) == pytest.approx(40)
+    # Отрицательная задержка из нормального распределения обрезается до нуля
+    assert LatencyModel.parse("normal:mean=-5,std=0").sample(random.Random(1)) == 0
+    with pytest.raises(ValueError):
+        LatencyModel.parse("pareto:alpha=1")
+
+
+def test_behavior_injects_faults_by_rate_and_concurrency():
+    behavior = FakeBehavior("FAKE_TEST", latency="0")
+    assert behavior.fault() is None
+
+    behavior.update({"error_rate": 1})
+    assert behavior.fault() == "error"
+    behavior.update({"error_rate": 0, "rate_limit_rate": 1})
+    assert behavior.fault() == "rate_limit"
+    behavior.update({"rate_limit_rate": 0, "max_concurrency": 2})
+    behavior.stats["in_flight"] = 2
+    assert behavior.fault() == "rate_limit"
+    assert behavior.stats == {"requests": 4, "in_flight": 2, "errors": 1, "rate_limited": 2}
+
+
+def test_ollama_stub_streams_generate_response_shape(ollama):
+    module, client = ollama
+    assert client.get("/api/tags").json() == {"models": [{"name": fake_ollama.FAKE_MODEL}]}
+
+    with client.stream("POST", "/api/generate", json={"model": "m", "prompt": "p" * 40, "images": ["aGVsbG8="]}) as resp:
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.iter_lines() if line]
+
+    assert all(line["model"] == "m" for line in lines)
+    assert [line["done"] for line in lines] == [False] * (len(lines) - 1) + [True]
+    final = lines[-1]
+    assert final["eval_count"] == len(lines) - 1
+    assert final["prompt_eval_count"] == 10
+    assert json.loads("".join(line["response"] for line in lines))["ingredients"]
+
+
+def test_mistral_stub_returns_chat_completion_shape(mistral):
+    module, client = mistral
+    data = call(module, client).json()
+
+    assert data["object"] == "chat.completion"
+    assert data["model"] == "mistral-small"
+    message = data["choices"][0]["message"]
+    assert message["role"] == "assistant"
+    assert json.loads(message["content"])["recipes"]
+    usage = data["usage"]
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+
+
+def test_same_request_gets_same_answer(fake):
+    module, client = fake
+    first, second = call(module, client), call(module, client)
+    assert first.status_code == second.status_code == 200
+    if module is fake_mistral:
+        assert first.json()["choices"] == second.json()["choices"]
+    else:
+        # Длительности в финальной строке разные, сам ответ — один и тот же
+        def answer(resp):
+            return "".join(json.loads(line)["response"] for line in resp.text.splitlines() if line)
+        assert answer(first) == answer(second)
+
+
+def test_injected_error_and_rate_limit(fake):
+    module, client = fake
+    client.post("/_config", json={"error_rate": 1})
+    response = call(module, client)
+    assert response.status_code == 500
+    assert "injected failure" in response.text
+
+    client.post("/_config", json={"error_rate": 0, "rate_limit_rate": 1, "retry_after": 2.5})
+    response = call(module, client)
+    assert response.status_code == (503 if module is fake_ollama else 429)
+    assert response.headers["Retry-After"] == "2.5"
+    assert client.get("/_config").json()["stats"]["rate_limited"] >= 1
+
+
+def test_configured_latency_delays_response(fake):
+    module, client = fake
+    client.post("/_config", json={"latency": "fixed:0.2"})
+
+    start = time.perf_counter()
+    assert call(module, client).status_code == 200
+    assert time.perf_counter() - start >= 0.2
@@ -0,0 +1,57 @@
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+
+import http_cache
+
+
+def test_pages_are_compressed_and_revalidated_by_etag(client):
+    """HTML-страница сжимается, а повторный запрос с её ETag получает 304 без тела"""
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert "<html" in response.text.lower()
+
+    again = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_static_serves_precompressed_variant_with_cache_headers(tmp_path):
+    """Статика отдаётся готовым .gz с Cache-Control; при совпадении ETag — 304"""
+    css = "body { color: black; }\n" * 200
+    (tmp_path / "styles.css").write_text(css, encoding="utf-8")
+    (tmp_path / "tiny.css").write_text("a{}", encoding="utf-8")
+    assert http_cache.precompress_static(tmp_path) == (2 if http_cache.brotli else 1)
+    assert http_cache.precompress_static(tmp_path) == 0
+    assert gzip.decompress((tmp_path / "styles.css.gz").read_bytes()).decode("utf-8") == css
+
+    app = Starlette(routes=[Mount("/static", http_cache.CachedStaticFiles(directory=tmp_path, max_age=600))])
+    client = TestClient(app)
+    response = client.get("/static/styles.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["cache-control"] == "public, max-age=600"
+    assert response.text == css
+
+    again = client.get("/static/styles.css", headers={"Accept-Encoding": "gzip",
+                                                      "If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+    assert "content-encoding" not in client.get("/static/styles.css", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_event_streams_and_small_responses_are_not_compressed():
+    """SSE отдаётся без сжатия (события не копятся в буфере компрессора), мелкие ответы — тоже"""
+    async def events(request):
+        return StreamingResponse(iter(["data: 1\n\n", "data: 2\n\n"]), media_type="text/event-stream")
+
+    app = Starlette(routes=[Route("/events", events), Route("/small", lambda request: PlainTextResponse("ok"))])
+    app.add_middleware(http_cache.CompressionMiddleware)
+    client = TestClient(app)
+
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
@@ -0,0 +1,69 @@
+from common.ingredients import IngredientCatalogue, get_catalogue, name_key
+from main import filter_ingredients_by_forbidden
+
+
+def test_name_key_ignores_word_forms_and_order():
+    """Формы слова, ё и порядок слов не влияют на ключ"""
+    assert name_key("Яйцо") == name_key("яйца")
+    assert name_key("филе куриное") == name_key("Куриное филе")
+    assert name_key("Свёкла (варёная)") == name_key("свекла")
+
+
+def test_catalogue_resolves_aliases_and_typos():
+    """Синонимы и английские названия сводятся к каноническому имени, опечатки — через триграммы"""
+    catalogue = IngredientCatalogue([
+        {"name": "курица", "aliases": ["куриное филе", "chicken"]},
+        {"name": "брокколи", "aliases": ["broccoli"]},
+    ])
+    assert catalogue.lookup("Chicken") == "курица"
+    assert catalogue.lookup("филе куриное") == "курица"
+    assert catalogue.lookup("брокколли") == "брокколи"
+    assert catalogue.lookup("тыква") is None
+    assert catalogue.canonicalize(["chicken", "курица", "тыква"]) == ["курица", "тыква"]
+
+
+def test_filter_uses_canonical_names():
+    """Запрет на продукт из таблицы Product убирает его формы и синонимы"""
+    assert len(get_catalogue()) > 0
+    ingredients = ["Огурец", "сыр пармезан", "Грецкие орехи", "морковь"]
+    forbidden = ["cucumber", "сыр", "орехи"]
+    assert filter_ingredients_by_forbidden(ingredients, forbidden) == ["морковь"]
+
+
+def test_filter_removes_words_derived_from_forbidden_stem():
+    """Слово, начинающееся с основы запрещённого продукта, тоже убирается: прилагательные от него"""
+    ingredients = ["арахисовое масло", "сырный соус", "сливочное масло", "картофель"]
+    forbidden = ["арахис", "сыр"]
+    assert filter_ingredients_by_forbidden(ingredients, forbidden) == ["сливочное масло", "картофель"]
+
+
+def test_worker_filter_drops_forbidden_vlm_items():
+    """Фильтр воркера в режиме конвейера: ингредиенты ответа VLM — словари с name"""
+    items = [{"name": "арахисовое масло", "confidence": 0.9}, {"name": "Cucumber"}, {"name": "морковь"}, {}]
+    kept = get_catalogue().drop_forbidden(items, ["арахис", "огурцы"])
+    assert kept == [{"name": "морковь"}, {}]
+    assert get_catalogue().drop_forbidden(items, None) == items
+
+
+def test_different_products_are_not_merged():
+    """Петрушка и укроп, болгарский и чёрный перец, сосиски и сардельки — разные продукты каталога"""
+    catalogue = get_catalogue()
+    assert catalogue.canonicalize(["петрушка", "укроп", "parsley"]) == ["петрушка", "укроп"]
+    assert catalogue.drop_forbidden(["петрушка", "укроп", "картофель"], ["укроп"]) == ["петрушка", "картофель"]
+    assert catalogue.drop_forbidden(["черный перец", "болгарский перец"], ["болгарский перец"]) == ["черный перец"]
+    assert catalogue.drop_forbidden(["сосиски", "сардельки"], ["hot dogs"]) == ["сардельки"]
+
+
+def test_category_is_not_a_synonym():
+    """Категория «зелень» группирует продукты, но запрет на один из них не трогает остальные"""
+    catalogue = get_catalogue()
+    assert catalogue.category("Укроп") == catalogue.category("parsley") == "зелень"
+    assert catalogue.lookup("укроп") == "укроп"
+    assert catalogue.drop_forbidden(["зелень", "укроп"], ["петрушка"]) == ["зелень", "укроп"]
+
+
+def test_similar_words_are_not_derived_from_forbidden():
+    """«Виноград» не от «вина», «маслины» не от «масла»: запасное правило — только прилагательные"""
+    assert filter_ingredients_by_forbidden(["виноград", "вино", "винный уксус"], ["вино"]) == ["виноград"]
+    assert filter_ingredients_by_forbidden(["маслины", "сливочное масло", "арахисовое масло"], ["масло"]) == [
+        "маслины"]
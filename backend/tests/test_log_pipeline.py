@@ -0,0 +1,94 @@
+import gzip
+import logging
+import random
+
+import pytest
+import structlog
+
+from log_pipeline import EventSampler, SizedTimedRotatingFileHandler, parse_sample_rates
+
+
+class TestEventSampler:
+    """Тесты сэмплирования частых событий"""
+
+    def test_parse_sample_rates(self):
+        """Разбор строки с долями событий"""
+        rates = parse_sample_rates("request_started=0.1, task_still_processing=2,broken,bad=x")
+        assert rates == {"request_started": 0.1, "task_still_processing": 1.0}
+
+    def test_sampled_event_is_dropped_or_marked(self):
+        """Частое событие сохраняется примерно с заданной долей"""
+        sampler = EventSampler({"request_started": 0.25}, rng=random.Random(42))
+        kept = 0
+        for _ in range(1000):
+            try:
+                event = sampler(None, "info", {"event": "request_started"})
+                assert event["sample_rate"] == 0.25
+                kept += 1
+            except structlog.DropEvent:
+                pass
+
+        assert 180 < kept < 320
+        assert sampler.dropped == 1000 - kept
+
+    def test_warnings_and_unknown_events_are_never_dropped(self):
+        """Ошибки и несэмплируемые события проходят всегда"""
+        sampler = EventSampler({"request_started": 0.0})
+
+        assert sampler(None, "warning", {"event": "request_started"})["event"] == "request_started"
+        assert sampler(None, "info", {"event": "auth_successful"})["event"] == "auth_successful"
+        with pytest.raises(structlog.DropEvent):
+            sampler(None, "info", {"event": "request_started"})
+
+    def test_error_responses_are_never_dropped(self):
+        """request_completed с кодом >= 400 проходит всегда, успешные — по доле"""
+        sampler = EventSampler({"request_completed": 0.0})
+
+        for status_code in (404, 500, 503):
+            event = sampler(None, "info", {"event": "request_completed", "status_code": status_code})
+            assert "sample_rate" not in event
+        with pytest.raises(structlog.DropEvent):
+            sampler(None, "info", {"event": "request_completed", "status_code": 200})
+
+
+class TestSizedTimedRotatingFileHandler:
+    """Тесты ротации лог-файла"""
+
+    def _record(self, msg):
+        return logging.LogRecord("test", logging.INFO, __file__, 1, msg, None, None)
+
+    def test_rotates_by_size(self, tmp_path):
+        """Файл ротируется при превышении размера"""
+        handler = SizedTimedRotatingFileHandler(tmp_path / "app.log", max_bytes=100, backup_count=2, interval_sec=3600,
+                                                compress=False)
+        for _ in range(10):
+            handler.emit(self._record("x" * 40))
+        handler.close()
+
+        assert (tmp_path / "app.log.1").exists()
+        assert not (tmp_path / "app.log.3").exists()
+
+    def test_rotates_by_time(self, tmp_path):
+        """Файл ротируется по истечении интервала"""
+        handler = SizedTimedRotatingFileHandler(tmp_path / "app.log", max_bytes=0, backup_count=2, interval_sec=3600,
+                                                compress=False)
+        handler.emit(self._record("first"))
+        handler.rollover_at = 0
+        handler.emit(self._record("second"))
+        handler.close()
+
+        assert (tmp_path / "app.log.1").read_text(encoding="utf-8").strip() == "first"
+        assert (tmp_path / "app.log").read_text(encoding="utf-8").strip() == "second"
+
+    def test_compresses_backups(self, tmp_path):
+        """Ротированные файлы сжимаются gzip, число копий ограничено backup_count"""
+        handler = SizedTimedRotatingFileHandler(tmp_path / "app.log", max_bytes=0, backup_count=2, interval_sec=3600,
+                                                compress=True)
+        for msg in ("first", "second", "third", "fourth"):
+            handler.emit(self._record(msg))
+            handler.rollover_at = 0
+        handler.close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["app.log", "app.log.1.gz", "app.log.2.gz"]
+        with gzip.open(tmp_path / "app.log.1.gz", "rt", encoding="utf-8") as f:
+            assert f.read().strip() == "third"
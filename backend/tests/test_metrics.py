@@ -0,0 +1,55 @@
+import sqlite3
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from common.routes import route_label
+from metrics import TimedConnection
+
+
+def test_metrics_endpoint_reports_route_templates(client):
+    """Метрики доступны и группируются по шаблону маршрута, а не по URL"""
+    client.get("/registration")
+    client.post("/history/favorite/42")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "backend_http_request_duration_seconds_bucket" in response.text
+    assert 'route="/registration"' in response.text
+    assert 'route="/history/favorite/{id_history}"' in response.text
+    assert "/history/favorite/42" not in response.text
+
+
+def test_route_label_scans_routes_once_per_endpoint():
+    """Шаблон маршрута кэшируется: таблица маршрутов не перебирается на каждом запросе"""
+    def endpoint():
+        pass
+
+    routes = [SimpleNamespace(endpoint=endpoint, path="/items/{item_id}")]
+    request = SimpleNamespace(scope={"endpoint": endpoint}, app=SimpleNamespace(router=SimpleNamespace(routes=routes)))
+
+    assert route_label(request) == "/items/{item_id}"
+    routes.clear()
+    assert route_label(request) == "/items/{item_id}"
+    assert route_label(SimpleNamespace(scope={})) == "unmatched"
+
+
+def test_timed_connection_records_query_time():
+    """Каждый SQL-запрос попадает в гистограмму по типу операции"""
+    def count(operation):
+        return REGISTRY.get_sample_value(
+            "backend_db_query_duration_seconds_count", {"operation": operation}
+        ) or 0
+
+    before_select, before_insert = count("select"), count("insert")
+
+    con = sqlite3.connect(":memory:", factory=TimedConnection)
+    cursor = con.cursor()
+    cursor.execute("CREATE TABLE Product (id_product INTEGER PRIMARY KEY, title TEXT)")
+    cursor.executemany("INSERT INTO Product (title) VALUES (?)", [("сыр",), ("молоко",)])
+    cursor.execute("SELECT title FROM Product WHERE id_product = ?", (1,))
+    assert cursor.fetchone() == ("сыр",)
+    con.close()
+
+    assert count("select") == before_select + 1
+    assert count("insert") == before_insert + 1
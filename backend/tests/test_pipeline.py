@@ -0,0 +1,35 @@
+import json
+
+import main
+
+
+def test_start_pipeline_forwards_generation_params(client, monkeypatch, mock_vlm_service):
+    """Загрузка в режиме конвейера передаёт ML-серверу параметры генерации и запрещенные продукты"""
+    monkeypatch.setattr(main, "get_current_user", lambda request: 7)
+    monkeypatch.setattr(main, "get_forbidden_products", lambda user_id: ["сыр"])
+
+    response = client.post("/start-pipeline", files={"file": ("food.jpg", b"jpeg", "image/jpeg")},
+                           data={"preferred_cooking_time": "Быстро"})
+
+    assert response.status_code == 200
+    assert response.json()["events_url"] == "/pipeline-events/t-1"
+    assert mock_vlm_service.post.call_args.args[0] == main.PIPELINE_URL
+    sent = mock_vlm_service.post.call_args.kwargs["data"]
+    assert sent["user_feedback"] == "Исключить: сыр"
+    assert sent["preferred_cooking_time"] == "Быстро"
+    assert json.loads(sent["forbidden_products"]) == ["сыр"]
+
+
+def test_pipeline_events_save_recipes_and_ingredients(monkeypatch, tmp_path):
+    """События конвейера: ингредиенты запоминаются для подсказок, рецепты пишутся в local_recipes"""
+    monkeypatch.chdir(tmp_path)
+    main.handle_pipeline_event("task-2", {"stage": "vlm_done", "ingredients": ["яйца", "молоко"]})
+    assert main.task_ingredients["task-2"] == ["яйца", "молоко"]
+
+    main.handle_pipeline_event("task-2", {
+        "stage": "done", "time": 1.0, "elapsed_sec": 12.5, "saved_to": ["./recipes/task-2_recipes.json"],
+        "ingredients": {"ingredients": [{"name": "яйца"}]}, "recipes": [{"name": "Омлет"}],
+    })
+    assert main.task_recipes_path("task-2").exists()
+    saved = main.load_task_recipes("task-2")
+    assert saved == {"ingredients": {"ingredients": [{"name": "яйца"}]}, "recipes": [{"name": "Омлет"}]}
@@ -0,0 +1,106 @@
+
+import asyncio
+import threading
+
+import main
+from recipe_index import RecipeIndex, cooking_minutes, time_level
+
+
+def build_index():
+    index = RecipeIndex()
+    index.add(1, "Жареная курица с картофелем", "Нарезать курицу.\nОбжарить картофель.", "35 минут", "средне",
+              "высококалорийное")
+    index.add(2, "Омлет с молоком", "Взбить яйца с молоком.", "15", "легко", "низкокалорийное")
+    index.add(3, "Рагу", "", "50 минут", "сложно", "среднекалорийное",
+              ingredients=["кабачки", "морковка", "лук", "соль"])
+    return index
+
+
+def test_attributes_are_precomputed():
+    """Время готовки разбирается из текста, уровни — по порогам промпта генерации"""
+    assert cooking_minutes("1 час 20 минут") == 80
+    assert cooking_minutes("35") == 35
+    assert time_level(cooking_minutes("15 минут")) == 1
+    recipe = build_index().recipes[2]
+    assert recipe.ingredients == ["кабачок", "морковь", "лук"]
+    assert recipe.levels == {"time": 3, "difficulty": 3, "calorie": 2}
+
+
+def test_suggest_ranks_by_coverage_and_skips_forbidden():
+    """Рецепты ранжируются по доле имеющихся ингредиентов, рецепты с запретами не предлагаются"""
+    index = build_index()
+    recipes = index.suggest(["яйцо", "молоко", "курица", "картошка"])
+    assert [r["name"] for r in recipes] == ["Жареная курица с картофелем", "Омлет с молоком"]
+    assert recipes[0]["coverage"] == 1.0
+    assert recipes[0]["steps"][1] == {"order": 2, "instruction": "Обжарить картофель."}
+
+    recipes = index.suggest(["яйцо", "молоко", "курица", "картошка"], forbidden_products=["chicken"])
+    assert [r["name"] for r in recipes] == ["Омлет с молоком"]
+    assert index.suggest(["морковь"]) == []
+
+
+def test_quick_recipes_endpoint(client, monkeypatch, tmp_path):
+    """Быстрые подсказки отдаются из индекса и сохраняются как рецепты задачи"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "_recipe_index", build_index())
+    monkeypatch.setattr(main, "get_forbidden_products", lambda user_id: [])
+
+    response = client.get("/quick-recipes/task-1", params={"ingredients": "яйца, молоко"})
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["name"] for r in data["recipes"]] == ["Омлет с молоком"]
+    assert data["index_size"] == 3
+
+    saved = main.load_task_recipes("task-1")
+    assert saved["prompt_version"] == "recipe_index"
+    assert main.task_ingredients["task-1"] == ["яйца", "молоко"]
+
+
+def test_category_in_recipe_matches_member_from_fridge():
+    """Рецепту с «зеленью» подходит укроп пользователя, рецепту с петрушкой — нет"""
+    index = RecipeIndex()
+    index.add(1, "Картофель с зеленью", "", ingredients=["картофель", "зелень"])
+    index.add(2, "Картофель с петрушкой", "", ingredients=["картофель", "петрушка"])
+
+    recipes = index.suggest(["картошка", "укроп"], min_coverage=1.0)
+    assert [r["name"] for r in recipes] == ["Картофель с зеленью"]
+    assert recipes[0]["missing_ingredients"] == []
+
+
+def test_stale_index_is_served_while_rebuilt_in_thread(monkeypatch):
+    """Устаревший индекс перестраивается в потоке один раз, а до конца сборки отдаётся прежний"""
+    old, fresh = build_index(), RecipeIndex()
+    old.built_at -= main.RECIPE_INDEX_TTL + 1
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load_recipe_index():
+        loads.append(threading.current_thread())
+        started.set()
+        release.wait(5)
+        return fresh
+
+    monkeypatch.setattr(main, "_recipe_index", old)
+    monkeypatch.setattr(main, "_recipe_index_refresh", None)
+    monkeypatch.setattr(main, "load_recipe_index", load_recipe_index)
+
+    async def scenario():
+        served = [await main.get_recipe_index() for _ in range(3)]
+        assert await asyncio.to_thread(started.wait, 5)
+        release.set()
+        await main._recipe_index_refresh
+        return served, await main.get_recipe_index()
+
+    served, after = asyncio.run(scenario())
+    assert all(index is old for index in served)
+    assert after is fresh
+    assert len(loads) == 1 and loads[0] is not threading.main_thread()
+
+
+def test_first_index_is_awaited(monkeypatch):
+    fresh = build_index()
+    monkeypatch.setattr(main, "_recipe_index", None)
+    monkeypatch.setattr(main, "_recipe_index_refresh", None)
+    monkeypatch.setattr(main, "load_recipe_index", lambda: fresh)
+
+    assert asyncio.run(main.get_recipe_index()) is fresh
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from ml.api.scheduler import FairScheduler
+
+
+async def _drain(scheduler, count):
+    """Забирает count задач, сразу освобождая слот пользователя"""
+    order = []
+    for _ in range(count):
+        item, user_id, lane = await scheduler.get()
+        order.append(item)
+        await scheduler.done(user_id)
+    return order
+
+
+def test_users_are_served_round_robin():
+    """Пачка задач одного пользователя не задерживает другого"""
+    async def scenario():
+        scheduler = FairScheduler(per_user_limit=10)
+        for item in ("a1", "a2", "a3"):
+            await scheduler.put(item, "a")
+        for item in ("b1", "b2"):
+            await scheduler.put(item, "b")
+        return await _drain(scheduler, 5)
+
+    assert asyncio.run(scenario()) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_per_user_limit_holds_back_until_done():
+    async def scenario():
+        scheduler = FairScheduler(per_user_limit=1)
+        await scheduler.put("a1", "a")
+        await scheduler.put("a2", "a")
+        await scheduler.put("b1", "b")
+
+        first = await scheduler.get()
+        second = await scheduler.get()
+        # У обоих пользователей занят слот — следующая задача ждёт
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.get(), timeout=0.05)
+        assert scheduler.running("a") == 1 and scheduler.pending() == 1
+
+        waiter = asyncio.create_task(scheduler.get())
+        await asyncio.sleep(0)
+        await scheduler.done("a")
+        third = await asyncio.wait_for(waiter, timeout=1)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == ("a1", "a", "batch")
+    assert second == ("b1", "b", "batch")
+    assert third == ("a2", "a", "batch")
+
+
+def test_interactive_lane_goes_first_but_cannot_starve_batch():
+    async def scenario():
+        scheduler = FairScheduler(per_user_limit=10, max_interactive_streak=2)
+        await scheduler.put("b1", "eval", lane="batch")
+        for item in ("i1", "i2", "i3", "i4"):
+            await scheduler.put(item, "u", lane="interactive")
+        return await _drain(scheduler, 5)
+
+    assert asyncio.run(scenario()) == ["i1", "i2", "b1", "i3", "i4"]
+
+
+def test_unknown_lane_falls_back_to_batch():
+    async def scenario():
+        scheduler = FairScheduler()
+        await scheduler.put("x", "u", lane="urgent")
+        return scheduler.stats()["pending"]
+
+    assert asyncio.run(scenario()) == {"interactive": 0, "batch": 1}
+
+
+def test_close_drains_pending_and_wakes_waiters():
+    """close() возвращает не начатые задачи, ожидающие get() получают None, новые put отклоняются"""
+    async def scenario():
+        scheduler = FairScheduler(per_user_limit=1)
+        await scheduler.put("a1", "a")
+        await scheduler.put("a2", "a")
+        await scheduler.put("i1", "b", lane="interactive")
+        assert (await scheduler.get())[0] == "i1"
+        assert (await scheduler.get())[0] == "a1"
+
+        waiter = asyncio.create_task(scheduler.get())
+        await asyncio.sleep(0)
+        drained = await scheduler.close()
+        woken = await asyncio.wait_for(waiter, timeout=1)
+        accepted = await scheduler.put("a3", "a")
+        return drained, woken, accepted, scheduler.pending()
+
+    drained, woken, accepted, pending = asyncio.run(scenario())
+    assert drained == ["a2"]
+    assert woken is None
+    assert accepted is False
+    assert pending == 0
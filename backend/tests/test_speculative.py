@@ -0,0 +1,37 @@
+import json
+
+import main
+
+
+def test_speculative_params_match_default_generation_form(monkeypatch):
+    """Параметры спекуляции совпадают с тем, что отправит форма генерации без изменений"""
+    monkeypatch.setattr(main, "get_user_preferences", lambda user_id: {
+        "preferred_cooking_time": "Быстро", "preferred_difficulty": None, "preferred_calorie_level": "Средне",
+    })
+    monkeypatch.setattr(main, "get_forbidden_products", lambda user_id: ["орехи", "сыр"])
+
+    params = main.speculative_generation_params(1)
+    assert params == {
+        "dietary": "нет",
+        "user_feedback": main.build_generation_feedback("нет", ["орехи", "сыр"]),
+        "preferred_calorie_level": "Средне",
+        "preferred_cooking_time": "Быстро",
+        "preferred_difficulty": "нет",
+        "existing_recipes": "нет",
+    }
+    assert params["user_feedback"] == "Исключить: орехи, сыр"
+    assert main.build_generation_feedback("без лука", ["сыр"]) == "без лука. Исключить: сыр"
+
+
+def test_start_processing_sends_speculative_params(client, monkeypatch, mock_vlm_service):
+    """С SPECULATIVE_RECIPES=1 загрузка передаёт ML-серверу параметры спекулятивной генерации"""
+    monkeypatch.setattr(main, "SPECULATIVE_RECIPES", True)
+    monkeypatch.setattr(main, "get_current_user", lambda request: 7)
+    monkeypatch.setattr(main, "speculative_generation_params", lambda user_id: {"dietary": "нет"})
+
+    response = client.post("/start-processing", files={"file": ("food.jpg", b"jpeg", "image/jpeg")})
+
+    assert response.status_code == 200
+    sent = mock_vlm_service.post.call_args.kwargs["data"]
+    assert json.loads(sent["speculate"]) == {"dietary": "нет"}
+    assert sent["user_id"] == "7"
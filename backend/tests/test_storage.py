@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+import storage
+from common.storage import DAY, find_artifact, open_artifact, sharded_path
+
+
+def _write(path, body, age_days, now):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(body, encoding="utf-8")
+    mtime = now - age_days * DAY
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_janitor_migrates_compresses_and_deletes(tmp_path):
+    """Старая плоская раскладка переносится в шарды, старые файлы сжимаются, очень старые удаляются"""
+    now = time.time()
+    _write(tmp_path / "fresh_recipes.json", json.dumps({"recipes": [1]}), 1, now)
+    _write(tmp_path / "old_recipes.json", json.dumps({"recipes": [2]}), 10, now)
+    _write(sharded_path(tmp_path, "expired_recipes.json"), "{}", 100, now)
+    _write(sharded_path(tmp_path, "broken_recipes.json.tmp123"), "{", 1, now)
+
+    janitor = storage.Janitor([storage.Retention("local_recipes", tmp_path, compress_after=7, delete_after=90)])
+    stats = janitor.sweep(now)["local_recipes"]
+
+    assert (stats["deleted"], stats["compressed"], stats["migrated"], stats["files"]) == (2, 1, 2, 2)
+    assert find_artifact(tmp_path, "fresh_recipes.json") == sharded_path(tmp_path, "fresh_recipes.json")
+    old = find_artifact(tmp_path, "old_recipes.json")
+    assert old.name == "old_recipes.json.gz"
+    with open_artifact(old) as f:
+        assert json.load(f) == {"recipes": [2]}
+    assert find_artifact(tmp_path, "expired_recipes.json") is None
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == []
+
+
+def test_janitor_keeps_category_under_max_bytes(tmp_path):
+    """Сверх предела объёма удаляются самые старые файлы"""
+    now = time.time()
+    for age, upload_id in enumerate(("a1", "b2", "c3")):
+        _write(sharded_path(tmp_path, f"{upload_id}.jpg"), "x" * 100, age, now)
+
+    janitor = storage.Janitor([storage.Retention("staging", tmp_path, max_bytes=250)])
+    stats = janitor.sweep(now)["staging"]
+
+    assert (stats["deleted"], stats["bytes"]) == (1, 200)
+    assert find_artifact(tmp_path, "c3.jpg") is None
+    assert find_artifact(tmp_path, "a1.jpg") is not None
+
+
+def test_public_uploads_are_only_measured(tmp_path, monkeypatch):
+    """Фото по ссылкам /uploads/<имя> не удаляются и не переносятся в шарды — только учитываются"""
+    monkeypatch.setattr(storage, "PUBLIC_UPLOADS_DIR", tmp_path)
+    now = time.time()
+    _write(tmp_path / "photo.jpg", "x" * 100, 400, now)
+
+    policy = next(p for p in storage.default_policies() if p.name == "public_uploads")
+    stats = storage.Janitor([policy]).sweep(now)["public_uploads"]
+
+    assert (stats["deleted"], stats["migrated"], stats["files"], stats["bytes"]) == (0, 0, 1, 100)
+    assert (tmp_path / "photo.jpg").exists()
@@ -0,0 +1,184 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from prometheus_client import CollectorRegistry, Gauge, generate_latest
+
+pytest.importorskip("aio_pika")
+
+from ml.api import supervisor
+from ml.api.scheduler import LANES, FairScheduler
+from ml.api.supervisor import Supervisor, WorkerSlot, desired_workers, held_by_worker
+
+
+def worker_metrics(scheduler: FairScheduler) -> str:
+    """Экспорт метрик воркера, как его видит супервизор"""
+    registry = CollectorRegistry()
+    pending = Gauge("ml_worker_scheduler_pending", "", ["lane"], registry=registry)
+    in_progress = Gauge("ml_worker_tasks_in_progress", "", registry=registry)
+    for lane in LANES:
+        pending.labels(lane).set(scheduler.pending(lane))
+    in_progress.set(scheduler.running())
+    return generate_latest(registry).decode("utf-8")
+
+
+def test_supervised_worker_keeps_its_prefetch(monkeypatch):
+    monkeypatch.setenv("WORKER_PREFETCH", "64")
+    started = {}
+
+    async def create_subprocess_exec(*args, env=None):
+        started["env"] = env
+        return SimpleNamespace(pid=1, returncode=None)
+
+    monkeypatch.setattr(supervisor.asyncio, "create_subprocess_exec", create_subprocess_exec)
+    asyncio.run(WorkerSlot(2).start())
+
+    assert started["env"]["WORKER_PREFETCH"] == "64"
+    assert started["env"]["WORKER_METRICS_PORT"] == str(supervisor.WORKER_METRICS_PORT + 2)
+
+
+def test_pool_scales_on_messages_held_by_fair_scheduler():
+    """
+    Воркер забрал всю очередь в планировщик: выдаёт задачи по кругу пользователей, а супервизор
+    по его метрикам видит, что работы на несколько воркеров, хотя готовых сообщений в очереди нет
+    """
+    async def prefetch():
+        scheduler = FairScheduler(per_user_limit=1)
+        for i in range(8):
+            await scheduler.put(f"a{i}", "a")
+        for i in range(4):
+            await scheduler.put(f"b{i}", "b", lane="interactive")
+        started = [(await scheduler.get())[1] for _ in range(2)]
+        return scheduler, started
+
+    scheduler, started = asyncio.run(prefetch())
+    # Пачка пользователя a не задерживает b
+    assert started == ["b", "a"]
+
+    held = held_by_worker(worker_metrics(scheduler))
+    assert held == 12
+
+    pool = Supervisor(min_workers=1, max_workers=4, tasks_per_worker=4)
+    pool.queue_depth = AsyncMock(return_value=0)
+    pool.held_messages = AsyncMock(return_value=held)
+    asyncio.run(pool.rescale())
+    assert pool.target == 3
+
+
+@pytest.fixture
+def fake_processes(monkeypatch):
+    """Слоты без настоящих процессов: start/stop только меняют состояние, время — управляемое"""
+    clock = SimpleNamespace(now=1000.0, started=[], stopped=[])
+
+    async def start(slot):
+        slot.process = SimpleNamespace(pid=slot.index, returncode=None)
+        slot.started_at = clock.now
+        slot.stopping = False
+        clock.started.append(slot.index)
+
+    async def stop(slot, timeout=None):
+        slot.process.returncode = 0
+        clock.stopped.append(slot.index)
+
+    monkeypatch.setattr(WorkerSlot, "start", start)
+    monkeypatch.setattr(WorkerSlot, "stop", stop)
+    monkeypatch.setattr(supervisor.time, "monotonic", lambda: clock.now)
+    return clock
+
+
+@pytest.mark.parametrize("depth, expected", [(0, 1), (4, 1), (5, 2), (8, 2), (9, 3), (1000, 4)])
+def test_desired_workers_thresholds_and_bounds(depth, expected):
+    assert desired_workers(depth, min_workers=1, max_workers=4, tasks_per_worker=4) == expected
+
+
+def test_desired_workers_keeps_minimum_and_zero_tasks_per_worker():
+    assert desired_workers(0, min_workers=2, max_workers=4) == 2
+    assert desired_workers(3, min_workers=0, max_workers=10, tasks_per_worker=0) == 3
+
+
+def test_scale_down_waits_for_cooldown(fake_processes, monkeypatch):
+    monkeypatch.setattr(supervisor, "SCALE_DOWN_COOLDOWN", 120)
+    pool = Supervisor(min_workers=1, max_workers=4, tasks_per_worker=4)
+    pool.held_messages = AsyncMock(return_value=0)
+    pool.queue_depth = AsyncMock(return_value=16)
+    asyncio.run(pool.rescale())
+    assert pool.target == 4
+
+    pool.queue_depth = AsyncMock(return_value=0)
+    pool.last_scale_down = fake_processes.now - 10
+    asyncio.run(pool.rescale())
+    assert pool.target == 4
+
+    fake_processes.now += 200
+    asyncio.run(pool.rescale())
+    assert pool.target == 1
+    assert pool.last_scale_down == fake_processes.now
+
+
+def test_rescale_keeps_target_when_queue_is_unreachable(fake_processes):
+    pool = Supervisor(min_workers=1, max_workers=4)
+    pool.target = 3
+    pool.queue_depth = AsyncMock(return_value=None)
+    pool.held_messages = AsyncMock(return_value=100)
+
+    asyncio.run(pool.rescale())
+    assert pool.target == 3
+
+
+def test_reconcile_starts_and_stops_slots_to_target(fake_processes):
+    async def scenario():
+        pool = Supervisor(min_workers=1, max_workers=4)
+        pool.target = 3
+        await pool.reconcile()
+        started = list(fake_processes.started)
+
+        pool.target = 1
+        await pool.reconcile()
+        await asyncio.gather(*pool.draining.values())
+        return pool, started
+
+    pool, started = asyncio.run(scenario())
+    assert started == [0, 1, 2]
+    assert [slot.index for slot in pool.slots] == [0]
+    # Лишние снимаются с конца
+    assert fake_processes.stopped == [2, 1]
+
+
+def test_crashed_worker_restarts_with_growing_delay(fake_processes):
+    async def scenario():
+        pool = Supervisor(min_workers=1, max_workers=1)
+        await pool.reconcile()
+        slot = pool.slots[0]
+        delays = []
+        for _ in range(4):
+            slot.process.returncode = 1
+            await pool.reconcile()
+            delays.append(slot.restart_at - fake_processes.now)
+            # До конца паузы воркер не перезапускается
+            await pool.reconcile()
+            assert not slot.alive
+            fake_processes.now = slot.restart_at
+            await pool.reconcile()
+            assert slot.alive
+        return slot, delays
+
+    slot, delays = asyncio.run(scenario())
+    assert delays == [1, 2, 4, 8]
+    assert slot.crashes == 4
+    assert fake_processes.started == [0, 0, 0, 0, 0]
+
+
+def test_restart_delay_is_capped(fake_processes, monkeypatch):
+    monkeypatch.setattr(supervisor, "MAX_RESTART_DELAY", 5)
+
+    async def scenario():
+        pool = Supervisor(min_workers=1, max_workers=1)
+        await pool.reconcile()
+        slot = pool.slots[0]
+        slot.crashes = 10
+        slot.process.returncode = 1
+        await pool.reconcile()
+        return slot.restart_at - fake_processes.now
+
+    assert asyncio.run(scenario()) == 5
@@ -0,0 +1,100 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from ml.tracing import tokens
+from ml.tracing.tokens import approx_token_count, usage_and_cost
+
+
+@pytest.fixture
+def tokenizer_mode(monkeypatch):
+    """Режим токенайзера на время теста; кеш загрузки сбрасывается до и после"""
+    def set_mode(mode):
+        monkeypatch.setattr(tokens, "TOKENIZER_MODE", mode)
+        tokens.get_tokenizer.cache_clear()
+    yield set_mode
+    tokens.get_tokenizer.cache_clear()
+
+
+@pytest.fixture
+def fake_transformers(monkeypatch):
+    """transformers с токенайзером «одно слово — один токен»; загрузки записываются"""
+    loads = []
+
+    def from_pretrained(name, local_files_only):
+        loads.append((name, local_files_only))
+        return lambda texts: {"input_ids": [text.split() for text in texts]}
+
+    monkeypatch.setitem(sys.modules, "transformers",
+                        SimpleNamespace(AutoTokenizer=SimpleNamespace(from_pretrained=from_pretrained)))
+    return loads
+
+
+def test_api_usage_is_taken_as_is(tokenizer_mode, monkeypatch):
+    tokenizer_mode("approx")
+    monkeypatch.setattr(tokens, "count_tokens_batch", lambda texts: pytest.fail("токенайзер не нужен"))
+    calls = [{"prompt": "p", "output": "o", "usage": {"prompt_tokens": 100, "completion_tokens": 20}}]
+
+    [(usage, cost)] = usage_and_cost(calls, price_per_input=0.01, price_per_output=0.1)
+
+    assert usage == {"input_tokens": 100, "output_tokens": 20, "total_tokens": 120, "tokenizer": "api"}
+    assert cost == pytest.approx(100 * 0.01 + 20 * 0.1)
+
+
+def test_calls_without_usage_are_counted_in_one_batch(tokenizer_mode, monkeypatch):
+    tokenizer_mode("approx")
+    batches = []
+    count = tokens.count_tokens_batch
+    monkeypatch.setattr(tokens, "count_tokens_batch", lambda texts: batches.append(texts) or count(texts))
+    calls = [{"prompt": "яйца и мука", "output": "омлет", "usage": None},
+             {"prompt": "p", "output": "o", "usage": {"prompt_tokens": 7, "completion_tokens": 3}},
+             {"prompt": "молоко", "output": ""}]
+
+    results = usage_and_cost(calls, price_per_input=1, price_per_output=2)
+
+    assert batches == [["яйца и мука", "омлет", "молоко", ""]]
+    (first, first_cost), (second, _), (third, _) = results
+    assert first["input_tokens"] == approx_token_count("яйца и мука")
+    assert first["output_tokens"] == approx_token_count("омлет")
+    assert first["tokenizer"] == "approx"
+    assert first_cost == first["input_tokens"] + 2 * first["output_tokens"]
+    assert second["tokenizer"] == "api"
+    # Пустой ответ — ноль токенов, а не BOS
+    assert third["output_tokens"] == 0
+
+
+def test_approx_count_splits_digits_and_scripts():
+    assert approx_token_count("") == 1
+    assert approx_token_count("2024") == 5
+    assert approx_token_count("abcdefgh") == 3
+    assert approx_token_count("картошка") == 1 + 4
+
+
+def test_tokenizer_loads_lazily_from_local_cache_once(tokenizer_mode, fake_transformers):
+    tokenizer_mode("auto")
+    assert fake_transformers == []
+
+    assert tokens.count_tokens_batch(["a b c", ""]) == [3, 0]
+    assert tokens.count_tokens("x y") == 2
+    assert tokens.tokenizer_kind() == "hf"
+    assert fake_transformers == [(tokens.TOKENIZER_NAME, True)]
+
+
+def test_auto_mode_falls_back_to_approx_without_transformers(tokenizer_mode, monkeypatch):
+    tokenizer_mode("auto")
+    monkeypatch.setitem(sys.modules, "transformers", None)
+
+    assert tokens.tokenizer_kind() == "approx"
+    assert tokens.count_tokens("яйца") == approx_token_count("яйца")
+
+
+def test_hf_mode_raises_and_approx_mode_skips_import(tokenizer_mode, monkeypatch, fake_transformers):
+    tokenizer_mode("approx")
+    assert tokens.get_tokenizer() is None
+    assert fake_transformers == []
+
+    tokenizer_mode("hf")
+    monkeypatch.setitem(sys.modules, "transformers", None)
+    with pytest.raises(ImportError):
+        tokens.get_tokenizer()
@@ -0,0 +1,68 @@
+import asyncio
+
+from common.tracing import build_timeline, format_traceparent, parse_traceparent
+from tracing import Tracer
+
+
+class TestTracing:
+    """Тесты сквозной трассировки задачи"""
+
+    def test_traceparent_roundtrip(self):
+        """Заголовок traceparent разбирается обратно в (trace_id, span_id)"""
+        header = format_traceparent("a" * 32, "b" * 16)
+        assert parse_traceparent(header) == ("a" * 32, "b" * 16)
+        assert parse_traceparent("garbage") is None
+        assert parse_traceparent(None) is None
+
+    def test_span_continues_incoming_trace(self, tmp_path):
+        """Спан продолжает трассу из входящего заголовка и пишется в файл задачи"""
+        tracer = Tracer("backend", trace_dir=tmp_path)
+        token = tracer.start_request(format_traceparent("c" * 32, "d" * 16))
+        try:
+            with tracer.span("stage", task_id="task-1") as span:
+                assert tracer.headers()["traceparent"] == format_traceparent("c" * 32, span["span_id"])
+        finally:
+            tracer.end_request(token)
+
+        spans = tracer.load("task-1")
+        assert len(spans) == 1
+        assert spans[0]["trace_id"] == "c" * 32
+        assert spans[0]["parent_id"] == "d" * 16
+
+    def test_later_requests_join_task_trace(self, tmp_path):
+        """Опрос результата в новом запросе попадает в трассу загрузки"""
+        tracer = Tracer("backend", trace_dir=tmp_path)
+
+        @tracer.traced("upload")
+        async def upload():
+            return {"task_id": "task-2"}
+
+        @tracer.traced("poll")
+        async def poll(task_id: str):
+            return {"status": "processing"}
+
+        asyncio.run(upload())
+        token = tracer.start_request(None)
+        try:
+            asyncio.run(poll(task_id="task-2"))
+        finally:
+            tracer.end_request(token)
+
+        spans = tracer.load("task-2")
+        assert [s["name"] for s in spans] == ["upload", "poll"]
+        assert spans[0]["trace_id"] == spans[1]["trace_id"]
+
+    def test_build_timeline(self):
+        """Шкала считает смещения и долю этапов от общего времени"""
+        spans = [
+            {"trace_id": "t", "name": "vlm", "service": "worker", "start": 101.0, "end": 109.0, "duration_ms": 8000.0},
+            {"trace_id": "t", "name": "upload", "service": "backend", "start": 100.0, "end": 100.5, "duration_ms": 500.0},
+            {"trace_id": "t", "name": "queue_wait", "service": "worker", "start": 100.5, "end": 101.0, "duration_ms": 500.0},
+        ]
+        timeline = build_timeline(spans)
+
+        assert timeline["wall_clock_ms"] == 9000.0
+        assert [s["name"] for s in timeline["stages"]] == ["upload", "queue_wait", "vlm"]
+        assert timeline["stages"][2]["first_offset_ms"] == 1000.0
+        assert timeline["stages"][2]["share_of_wall_clock"] == round(8000 / 9000, 4)
+        assert build_timeline([])["wall_clock_ms"] == 0
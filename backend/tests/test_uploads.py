@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import io
+from unittest.mock import Mock
+
+import pytest
+from starlette.datastructures import UploadFile
+
+import main
+import uploads
+from common.uploads import MULTIPART_OVERHEAD, UPLOAD_MAX_BYTES, UploadTooLarge, staging_path
+
+
+def test_stage_upload_streams_in_chunks_and_enforces_limit(tmp_path):
+    """Файл пишется в staging кусками; при превышении лимита чтение прерывается, остатков нет"""
+    data = b"x" * 1000
+    upload = asyncio.run(uploads.stage_upload(UploadFile(io.BytesIO(data), filename="Food.JPG"),
+                                              max_bytes=1000, directory=tmp_path, chunk_size=256))
+    assert upload.path == staging_path(upload.upload_id, "food.jpg", tmp_path)
+    assert upload.path.read_bytes() == data
+    assert upload.size == 1000
+    assert upload.peak_memory == 256
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(uploads.stage_upload(UploadFile(io.BytesIO(data), filename="food.jpg"),
+                                         max_bytes=999, directory=tmp_path, chunk_size=256))
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [upload.path.name]
+
+
+def test_start_processing_forwards_file_from_staging(client, monkeypatch, tmp_path, mock_vlm_service):
+    """Фото уходит ML-серверу файлом из staging, после передачи копия удаляется"""
+    monkeypatch.setattr(uploads, "STAGING_DIR", tmp_path)
+    monkeypatch.setattr(main, "get_current_user", lambda request: 7)
+    sent = {}
+
+    async def post(url, files, data, headers):
+        name, handle, content_type = files["file"]
+        sent.update(name=name, body=handle.read(), content_type=content_type)
+        return Mock(status_code=200, json=lambda: {"task_id": "t-1", "status": "queued"})
+
+    mock_vlm_service.post.side_effect = post
+    response = client.post("/start-processing", files={"file": ("food.jpg", b"jpeg-bytes", "image/jpeg")})
+
+    assert response.status_code == 200
+    assert sent == {"name": "food.jpg", "body": b"jpeg-bytes", "content_type": "image/jpeg"}
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def test_oversized_upload_is_rejected_before_parsing(client, monkeypatch, mock_vlm_service):
+    """Тело больше лимита отклоняется с 413 до разбора формы и обращения к ML-серверу"""
+    monkeypatch.setattr(main, "get_current_user", lambda request: 7)
+    limit = UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD
+    response = client.post("/start-processing", files={"file": ("food.jpg", b"x" * (limit + 1), "image/jpeg")})
+
+    assert response.status_code == 413
+    mock_vlm_service.post.assert_not_called()
+
+
+def test_shared_transport_passes_only_content_addressed_name(client, monkeypatch, tmp_path, mock_vlm_service):
+    """В режиме shared ML-сервер получает имя файла по sha256, тело фото не передаётся"""
+    monkeypatch.setattr(uploads, "STAGING_DIR", tmp_path)
+    monkeypatch.setattr(uploads, "UPLOAD_TRANSPORT", "shared")
+    monkeypatch.setattr(main, "get_current_user", lambda request: 7)
+
+    for _ in range(2):
+        response = client.post("/start-processing", files={"file": ("food.JPEG", b"jpeg-bytes", "image/jpeg")})
+        assert response.status_code == 200
+
+    name = f"{hashlib.sha256(b'jpeg-bytes').hexdigest()}.jpeg"
+    assert mock_vlm_service.post.call_args.kwargs["files"] is None
+    assert mock_vlm_service.post.call_args.kwargs["data"]["staged"] == name
+    # Одинаковые фото — один файл, он остаётся ML-серверу
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [name]
@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+from ml.metrics import vlm_metrics
+from ml.metrics.vlm_metrics import (Vocabulary, bootstrap_ci, bootstrap_means, compute_excess, compute_f1,
+                                    normalize_ingredient, score_by_group, score_cases, summarize_scores)
+
+# Написания одного ингредиента и пустые имена — как в ответах VLM
+POOL = ["яйца", "Яйцо", " молоко ", "мука", "сыр", "помидор", "помидоры", "лук", "чеснок", "курица",
+        "куриное филе", "рис", "сливочное масло", "", {"name": "морковь"}, {"name": "Лук"}]
+
+
+def random_cases(seed: int, count: int = 300):
+    rng = random.Random(seed)
+    return [[rng.choice(POOL) for _ in range(rng.randint(0, 6))] for _ in range(count)]
+
+
+@pytest.mark.parametrize("canonical", [True, False])
+def test_vectorized_scores_match_scalar_metrics(monkeypatch, canonical):
+    monkeypatch.setattr(vlm_metrics, "MATCH_CANONICAL", canonical)
+    predicted, reference = random_cases(1), random_cases(2)
+
+    scores = score_cases(predicted, reference)
+
+    assert scores["f1"] == pytest.approx([compute_f1(p, r) for p, r in zip(predicted, reference)])
+    assert scores["excess"] == pytest.approx([compute_excess(p, r) for p, r in zip(predicted, reference)])
+    assert np.all(scores["tp"] <= np.minimum(scores["n_pred"], scores["n_ref"]))
+
+
+def test_exact_vocabulary_and_length_mismatch():
+    vocab = Vocabulary(normalize_ingredient)
+    scores = score_cases([["Яйца", "мука"], []], [["яйца "], ["мука"]], vocab)
+
+    assert list(scores["tp"]) == [1, 0]
+    assert list(scores["f1"]) == pytest.approx([2 / 3, 0.0])
+    assert list(scores["excess"]) == [0.5, 0.0]
+    with pytest.raises(ValueError):
+        score_cases([["яйца"]], [])
+
+
+def test_bootstrap_means_match_naive_resampling():
+    values = np.random.default_rng(0).random((2, 50))
+
+    means = bootstrap_means(values, n_boot=200, seed=7)
+
+    draws = np.random.default_rng(7).integers(0, 50, size=(200, 50))
+    expected = np.stack([values[k][draws].mean(axis=1) for k in range(2)], axis=1)
+    assert means == pytest.approx(expected)
+
+
+def test_bootstrap_ci_is_reproducible_with_seed():
+    values = np.random.default_rng(1).random(80)
+
+    first = bootstrap_ci(values, n_boot=500, seed=42)
+    assert bootstrap_ci(values, n_boot=500, seed=42) == first
+    assert bootstrap_ci(values, n_boot=500, seed=43) != first
+    low, high = first
+    assert low < values.mean() < high
+    assert bootstrap_ci([], seed=42) == (None, None)
+
+
+def test_summary_per_group_is_reproducible():
+    predicted, reference = random_cases(3, 100), random_cases(4, 100)
+    groups = ["a" if i % 3 else "b" for i in range(100)]
+
+    first = score_by_group(groups, predicted, reference, n_boot=300, seed=5)
+    second = score_by_group(groups, predicted, reference, n_boot=300, seed=5)
+
+    assert first == second
+    assert first["a"]["cases"] + first["b"]["cases"] == 100
+    f1 = first["a"]["f1"]
+    assert f1["ci_low"] <= f1["mean"] <= f1["ci_high"]
+    assert summarize_scores(score_cases([], []))["f1"] == {"mean": None, "ci_low": None, "ci_high": None}
@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ml.fakes import fake_ollama
+from ml.service import vlm_router
+from ml.service.vlm_router import OllamaBackend, OllamaPool, StreamError, model_tag, read_generate_stream
+
+
+@pytest.fixture
+def fake_ollama_client():
+    """Фейковый Ollama в процессе, без задержек"""
+    fake_ollama.behavior.update({"latency": 0, "tokens_per_sec": 0, "error_rate": 0, "rate_limit_rate": 0})
+    return TestClient(fake_ollama.app)
+
+
+def make_pool(*weights):
+    return OllamaPool([OllamaBackend(f"http://ollama-{i}:11434", w) for i, w in enumerate(weights)],
+                      health_interval=0)
+
+
+def fail(pool, exclude=()):
+    with pytest.raises(RuntimeError):
+        with pool.acquire(exclude=exclude):
+            raise RuntimeError("ollama down")
+
+
+def test_requests_follow_backend_weight():
+    """Запросы в работе распределяются пропорционально весу инстанса"""
+    pool = make_pool(2, 1)
+    heavy, light = pool.backends
+    picked = []
+    for _ in range(6):
+        with pool._lock:
+            backend = pool._pick()
+            backend.outstanding += 1
+        picked.append(backend)
+
+    assert picked.count(heavy) == 4
+    assert picked.count(light) == 2
+
+
+def test_backend_is_ejected_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(vlm_router, "EJECT_AFTER_FAILURES", 2)
+    pool = make_pool(1, 1)
+    broken, healthy = pool.backends
+
+    fail(pool, exclude=[healthy])
+    assert broken.ejected_until == 0
+    fail(pool, exclude=[healthy])
+
+    assert broken.ejections == 1
+    with pool.acquire() as backend:
+        assert backend is healthy
+    # Успешный запрос к живому инстансу не возвращает исключённый
+    assert not broken.available(vlm_router.time.time())
+
+
+def test_success_resets_failure_count(monkeypatch):
+    monkeypatch.setattr(vlm_router, "EJECT_AFTER_FAILURES", 2)
+    pool = make_pool(1)
+    backend, = pool.backends
+
+    fail(pool)
+    with pool.acquire():
+        pass
+    fail(pool)
+
+    assert backend.ejections == 0
+    assert backend.failures == 1
+
+
+def test_ejection_backoff_doubles_up_to_max(monkeypatch):
+    monkeypatch.setattr(vlm_router, "EJECT_AFTER_FAILURES", 1)
+    monkeypatch.setattr(vlm_router, "EJECT_BASE_SEC", 10)
+    monkeypatch.setattr(vlm_router, "EJECT_MAX_SEC", 35)
+    pool = make_pool(1)
+    backend, = pool.backends
+
+    pauses = []
+    for _ in range(4):
+        fail(pool)
+        pauses.append(backend.ejected_until - vlm_router.time.time())
+
+    assert pauses == pytest.approx([10, 20, 35, 35], abs=1)
+
+
+def test_stream_error_counts_as_backend_failure(monkeypatch):
+    """200 с {"error": ...} в потоке — ошибка инстанса, а не успех"""
+    monkeypatch.setattr(vlm_router, "EJECT_AFTER_FAILURES", 1)
+    pool = make_pool(1, 1)
+    lines = [json.dumps({"response": "{\"ingr", "done": False}).encode(),
+             json.dumps({"error": "model runner has unexpectedly stopped"}).encode()]
+
+    with pytest.raises(StreamError, match="unexpectedly stopped"):
+        with pool.acquire() as backend:
+            read_generate_stream(lines)
+
+    assert backend.ejections == 1
+    with pool.acquire() as other:
+        assert other is not backend
+
+
+def test_generate_stream_from_fake_ollama(fake_ollama_client):
+    with fake_ollama_client.stream("POST", "/api/generate", json={"model": "m", "prompt": "p"}) as resp:
+        text = read_generate_stream(resp.iter_lines())
+
+    assert json.loads(text)["ingredients"]
+
+
+def test_health_check_requires_model_on_backend(fake_ollama_client, monkeypatch):
+    monkeypatch.setattr(vlm_router.requests, "get",
+                        lambda url, timeout: fake_ollama_client.get(urlsplit(url).path))
+    pool = OllamaPool([OllamaBackend("http://a:11434", model=fake_ollama.FAKE_MODEL),
+                       OllamaBackend("http://b:11434", model="llava:missing")], health_interval=0)
+
+    pool.check_health()
+
+    assert [b.healthy for b in pool.backends] == [True, False]
+    with pool.acquire() as backend:
+        assert backend.model == fake_ollama.FAKE_MODEL
+
+
+def test_health_check_matches_model_without_tag(monkeypatch):
+    """Модель «llava» в настройках — это «llava:latest» в /api/tags"""
+    tags = {"models": [{"name": "llava:latest"}, {"name": "registry.local:5000/team/qwen2.5vl:3b"}]}
+    monkeypatch.setattr(vlm_router.requests, "get",
+                        lambda url, timeout: SimpleNamespace(status_code=200, json=lambda: tags))
+    pool = OllamaPool([OllamaBackend("http://a:11434", model="llava"),
+                       OllamaBackend("http://b:11434", model="registry.local:5000/team/qwen2.5vl:3b"),
+                       OllamaBackend("http://c:11434", model="llava:13b")], health_interval=0)
+
+    pool.check_health()
+
+    assert [b.healthy for b in pool.backends] == [True, True, False]
+    assert model_tag("registry.local:5000/team/llava") == "registry.local:5000/team/llava:latest"
@@ -0,0 +1,28 @@
+"""
+Трассировка бэкенда: общий Tracer (common/tracing.py) и декоратор обработчиков FastAPI,
+который привязывает trace_id к логам structlog.
+"""
+import functools
+
+import structlog
+
+from common.tracing import Tracer as BaseTracer
+
+
+class Tracer(BaseTracer):
+    def traced(self, name: str):
+        """
+        Декоратор обработчика FastAPI: весь обработчик — один спан.
+        task_id берётся из параметров пути или из ответа (для /start-processing).
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(name, task_id=kwargs.get("task_id")) as span:
+                    structlog.contextvars.bind_contextvars(trace_id=span["trace_id"])
+                    result = await func(*args, **kwargs)
+                    if not span["task_id"] and isinstance(result, dict) and result.get("task_id"):
+                        span["task_id"] = result["task_id"]
+                    return result
+            return wrapper
+        return decorator
@@ -0,0 +1,90 @@
+"""
+Загрузка фото бэкендом: приём кусками в общий staging (common/uploads.py) и передача ML-серверу.
+
+Файл передаётся ML-серверу потоком с диска, а в памяти держится один кусок. Если бэкенд и
+ML-сервер на одном хосте (UPLOAD_TRANSPORT=shared), файл не передаётся вовсе: он
+переименовывается в staging в имя по содержимому, и ML-сервер получает только это имя.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import structlog
+
+from common.storage import sharded_path
+from common.uploads import STAGING_DIR, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES, staging_path, write_staged
+
+logger = structlog.get_logger()
+
+# http — фото уходит ML-серверу телом запроса; shared — общий staging на одном хосте, уходит только имя
+UPLOAD_TRANSPORT = os.getenv("UPLOAD_TRANSPORT", "http")
+
+
+class StagedUpload:
+    """Загрузка в staging: id, путь, размер, sha256 и пиковая память при приёме"""
+
+    __slots__ = ("upload_id", "path", "filename", "content_type", "size", "sha256", "peak_memory", "seconds")
+
+    def __init__(self, upload_id, path, filename, content_type, size, sha256, peak_memory, seconds):
+        self.upload_id = upload_id
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.peak_memory = peak_memory
+        self.seconds = seconds
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+async def stage_upload(file, max_bytes: int = UPLOAD_MAX_BYTES, directory: Path = None,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE) -> StagedUpload:
+    """
+    Кусками переписывает UploadFile в staging под новым id. UploadTooLarge — как только
+    прочитано больше max_bytes; недописанный файл удаляется
+    """
+    upload_id = uuid.uuid4().hex
+    path = staging_path(upload_id, file.filename, directory or STAGING_DIR)
+    staged = await write_staged(file, path, max_bytes, chunk_size)
+    upload = StagedUpload(upload_id, path, file.filename, file.content_type, **staged)
+    logger.info("upload_staged", upload_id=upload_id, size=upload.size, peak_memory=upload.peak_memory,
+                duration_ms=round(upload.seconds * 1000, 2))
+    return upload
+
+
+def share_upload(upload: StagedUpload) -> str:
+    """
+    Атомарно переименовывает загрузку в имя по содержимому (sha256 + расширение): одинаковые фото
+    лежат одним файлом, а ML-сервер не увидит недописанный. Возвращает имя файла в staging
+    """
+    # Шард считается уже по новому имени — корень staging на уровень выше шарда загрузки
+    target = sharded_path(upload.path.parents[1], f"{upload.sha256}{upload.path.suffix}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(upload.path, target)
+    upload.path = target
+    return target.name
+
+
+@contextmanager
+def upload_transport(upload: StagedUpload, transport: str = None):
+    """
+    Поля запроса к ML-серверу (files, data). В режиме shared — только имя файла в общем staging
+    (файл остаётся ML-серверу), иначе — сам файл потоком с диска, после передачи копия удаляется
+    """
+    if (transport or UPLOAD_TRANSPORT) == "shared":
+        yield None, {"staged": share_upload(upload)}
+        return
+    try:
+        with upload.open() as upload_file:
+            yield {"file": (upload.filename, upload_file, upload.content_type)}, {}
+    finally:
+        upload.remove()
@@ -0,0 +1,8 @@
+"""
+Код, общий для бэкенда и ML-сервиса. Обе стороны пишут и читают одни и те же файлы (staging,
+local_recipes, трассы задач), поэтому раскладка по шардам, формат файлов, спаны и каталог
+ингредиентов живут в одном месте, а не в копиях, которые приходится сверять вручную.
+
+ML-сервис запускается из корня репозитория и импортирует пакет как есть; бэкенд запускается
+из backend/ с корнем репозитория в PYTHONPATH: cd backend && PYTHONPATH=.. uvicorn main:app
+"""
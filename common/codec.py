@@ -0,0 +1,154 @@
+"""
+Формат файлов задач на диске: результаты VLM, рецепты (local_recipes бэкенда и recipes
+ML-сервиса), спекулятивный кэш. Бэкенд и воркер читают файлы друг друга.
+
+Формат задаётся ARTIFACT_FORMAT: кодировка и, через «+», сжатие.
+
+    plain          — JSON с отступами без заголовка (как раньше; читается любым инструментом)
+    json           — компактный JSON (orjson, если установлен)
+    msgpack        — MessagePack (пакет msgpack)
+    json+zstd, msgpack+zstd, json+gzip ...  — то же со сжатием (zstd — пакет zstandard)
+
+Все форматы, кроме plain, начинаются с заголовка MAGIC + версия + id кодировки + id сжатия,
+поэтому читатель не зависит от настройки записи: старые JSON-файлы (без заголовка), сжатые
+уборщиком .gz и файлы любого формата читаются одним read_artifact. Менять ARTIFACT_FORMAT
+стоит, когда новый код стоит и у бэкенда, и у ML-сервера.
+
+    python -m tests.bench.run --suite codec   # время кодирования/декодирования и размер
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 0xFF не бывает первым байтом UTF-8 JSON — файл с заголовком не спутать со старым
+MAGIC = b"\xffTA"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+ENCODINGS = {"json": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zstd": 1, "gzip": 2}
+ZSTD_LEVEL = int(os.getenv("ARTIFACT_ZSTD_LEVEL", 3))
+ARTIFACT_FORMAT = os.getenv("ARTIFACT_FORMAT", "plain")
+FORMATS = ("plain", "json", "json+gzip", "json+zstd", "msgpack", "msgpack+gzip", "msgpack+zstd")
+
+
+def _require(module: str):
+    try:
+        return __import__(module)
+    except ImportError:
+        raise RuntimeError(f"Для формата файлов задач нужен пакет {module}") from None
+
+
+def parse_format(spec: str) -> tuple:
+    """«msgpack+zstd» -> ("msgpack", "zstd"); ValueError для неизвестного формата"""
+    encoding, _, compression = (spec or "plain").partition("+")
+    compression = compression or "none"
+    if encoding != "plain" and encoding not in ENCODINGS or compression not in COMPRESSIONS:
+        raise ValueError(f"Неизвестный формат файлов задач: {spec!r}")
+    if encoding == "plain" and compression != "none":
+        raise ValueError("Формат plain не сжимается — используйте json+<сжатие>")
+    return encoding, compression
+
+
+def available_formats() -> list:
+    """Форматы, для которых установлены пакеты"""
+    result = []
+    for spec in FORMATS:
+        encoding, compression = parse_format(spec)
+        try:
+            if encoding == "msgpack":
+                _require("msgpack")
+            if compression == "zstd":
+                _require("zstandard")
+        except RuntimeError:
+            continue
+        result.append(spec)
+    return result
+
+
+def _encode(data, encoding: str) -> bytes:
+    if encoding == "msgpack":
+        return _require("msgpack").packb(data, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(body: bytes):
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass  # NaN/Infinity из старых файлов json.dump — orjson их не принимает
+    return json.loads(body.decode("utf-8"))
+
+
+def _decode(body: bytes, encoding: int):
+    if encoding == ENCODINGS["msgpack"]:
+        return _require("msgpack").unpackb(body, raw=False, strict_map_key=False)
+    if encoding == ENCODINGS["json"]:
+        return _json_loads(body)
+    raise ValueError(f"Неизвестная кодировка в заголовке файла: {encoding}")
+
+
+def dumps(data, spec: str = None) -> bytes:
+    encoding, compression = parse_format(spec or ARTIFACT_FORMAT)
+    if encoding == "plain":
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    body = _encode(data, encoding)
+    if compression == "zstd":
+        body = _require("zstandard").ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    elif compression == "gzip":
+        body = gzip.compress(body, mtime=0)
+    return MAGIC + bytes((VERSION, ENCODINGS[encoding], COMPRESSIONS[compression])) + body
+
+
+def loads(raw: bytes):
+    """Данные из файла любого формата: с заголовком или старый JSON без него"""
+    if not raw.startswith(MAGIC):
+        return _json_loads(raw)
+    version, encoding, compression = raw[len(MAGIC):HEADER_SIZE]
+    if version != VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата файла: {version}")
+    body = raw[HEADER_SIZE:]
+    if compression == COMPRESSIONS["zstd"]:
+        body = _require("zstandard").ZstdDecompressor().decompress(body)
+    elif compression == COMPRESSIONS["gzip"]:
+        body = gzip.decompress(body)
+    elif compression != COMPRESSIONS["none"]:
+        raise ValueError(f"Неизвестное сжатие в заголовке файла: {compression}")
+    return _decode(body, encoding)
+
+
+def is_compressed(path: Path) -> bool:
+    """Файл уже сжат форматом (уборщику незачем сжимать его ещё раз gzip)"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_SIZE)
+    except OSError:
+        return False
+    return head.startswith(MAGIC) and len(head) == HEADER_SIZE and head[-1] != COMPRESSIONS["none"]
+
+
+def read_artifact(path: Path):
+    """Читает файл задачи, в том числе сжатый уборщиком (.gz)"""
+    path = Path(path)
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_artifact(path: Path, data, spec: str = None) -> Path:
+    """Атомарная запись: при падении посреди записи не останется обрезанного файла"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+    with open(tmp_path, "wb") as f:
+        f.write(dumps(data, spec))
+    os.replace(tmp_path, path)
+    return path
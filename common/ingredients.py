@@ -0,0 +1,262 @@
+"""
+Каталог ингредиентов: каноническое имя и его варианты (формы слова, синонимы, английские
+названия), а также категория — общее название группы разных продуктов («зелень» для укропа
+и петрушки). Категория вариантом не считается и в фильтре запрещённых продуктов не участвует.
+Общий для бэкенда и ML-сервиса: нормализация ответа VLM, фильтр запрещённых продуктов, индекс
+рецептов и метрики.
+
+Поиск по имени: точное совпадение ключа (нижний регистр, ё -> е, отброшенные окончания,
+слова по алфавиту), затем нечёткое — по индексу триграмм ключей с мерой Дайса. Результаты
+кэшируются, так что список из десятка ингредиентов разбирается за доли миллисекунды.
+
+Каталог bd/ingredient_catalogue.json собирается командой python -m ml.service.ingredients.
+"""
+import functools
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+CATALOGUE_PATH = os.getenv("INGREDIENT_CATALOGUE", str(ROOT / "bd" / "ingredient_catalogue.json"))
+# Минимальная мера Дайса по триграммам для нечёткого совпадения и минимальная длина ключа для него
+FUZZY_THRESHOLD = float(os.getenv("INGREDIENT_FUZZY_THRESHOLD", 0.6))
+FUZZY_MIN_LENGTH = 4
+CACHE_SIZE = 4096
+
+# Суффиксы прилагательных от названия продукта: «арахис» -> «арахисов(ое)», «сыр» -> «сыр-н(ый)»
+_DERIVED_SUFFIXES = ("ов", "ев", "н", "енн", "ян", "ск")
+# Окончания, которые отбрасываются (длинные раньше коротких); основа не короче трёх букв
+_RU_ENDINGS = sorted(
+    "ями ами ого его ому ему ыми ими ой ый ий ая яя ое ее ые ие ов ев ей ам ям ах ях ом ем ью "
+    "а я ы и о е ь у ю й".split(),
+    key=len, reverse=True,
+)
+_PARENS = re.compile(r"\([^)]*\)")
+_NON_WORD = re.compile(r"[^a-zа-я]+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(name) -> str:
+    """Нижний регистр, ё -> е, без скобок, цифр и знаков; принимает и {"name": ...}"""
+    if isinstance(name, dict):
+        name = name.get("name", "")
+    text = _PARENS.sub(" ", str(name or "").lower().replace("ё", "е"))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def stem(word: str) -> str:
+    if word.isascii():
+        if len(word) > 4 and word.endswith("ies"):
+            return word[:-3] + "y"
+        if len(word) > 4 and word.endswith("oes"):
+            return word[:-2]
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            return word[:-1]
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def name_key(name) -> str:
+    """Ключ сравнения: основы слов по алфавиту («филе куриное» == «куриное филе»)"""
+    return " ".join(sorted(stem(w) for w in normalize(name).split()))
+
+
+def _derived_from(word_stem: str, part: str) -> bool:
+    """Основа слова — основа part плюс суффикс прилагательного"""
+    return word_stem.startswith(part) and word_stem[len(part):] in _DERIVED_SUFFIXES
+
+
+def _trigrams(key: str) -> set:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientCatalogue:
+    """Канонические ингредиенты с индексом вариантов: точный словарь ключей + триграммы"""
+
+    def __init__(self, entries=()):
+        self.names = []      # канонические имена
+        self.aliases = []    # варианты для каждого имени (как в источнике)
+        self.categories = [] # категория каждого имени или None
+        self._exact = {}     # ключ варианта -> номер имени
+        self._keys = []      # ключи вариантов для нечёткого поиска
+        self._key_owner = []
+        self._key_grams = []
+        self._grams = {}     # триграмма -> номера ключей
+        self._cache = {}     # исходная строка -> (номер имени, ключ)
+        for entry in entries:
+            self.add(entry["name"], entry.get("aliases", ()), entry.get("category"))
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name: str, aliases=(), category: str = None) -> int:
+        """Новое имя или новые варианты (и категория) существующего, если имя уже есть; номер имени"""
+        name = normalize(name)
+        index = self._exact.get(name_key(name))
+        if index is None:
+            index = len(self.names)
+            self.names.append(name)
+            self.aliases.append([])
+            self.categories.append(None)
+        if category:
+            self.categories[index] = normalize(category)
+        for alias in (name, *aliases):
+            self._add_alias(index, alias)
+        self._cache.clear()
+        return index
+
+    def _add_alias(self, index: int, alias: str):
+        key = name_key(alias)
+        if not key or key in self._exact:
+            return
+        if normalize(alias) != self.names[index]:
+            self.aliases[index].append(alias)
+        self._exact[key] = index
+        grams = _trigrams(key)
+        key_id = len(self._keys)
+        self._keys.append(key)
+        self._key_owner.append(index)
+        self._key_grams.append(len(grams))
+        for gram in grams:
+            self._grams.setdefault(gram, []).append(key_id)
+
+    def _resolve(self, name):
+        """(номер канонического имени или None, ключ имени); результат кэшируется по исходной строке"""
+        raw = name if isinstance(name, str) else None
+        cached = self._cache.get(raw)
+        if cached is not None:
+            return cached
+        key = name_key(name)
+        index = self._exact.get(key)
+        if index is None and len(key) >= FUZZY_MIN_LENGTH:
+            index = self._fuzzy(key)
+        if raw is not None:
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[raw] = (index, key)
+        return index, key
+
+    def _fuzzy(self, key: str):
+        grams = _trigrams(key)
+        shared = {}
+        for gram in grams:
+            for key_id in self._grams.get(gram, ()):
+                shared[key_id] = shared.get(key_id, 0) + 1
+        best, best_score = None, FUZZY_THRESHOLD
+        for key_id, count in shared.items():
+            score = 2 * count / (len(grams) + self._key_grams[key_id])
+            if score >= best_score:
+                best, best_score = key_id, score
+        return self._key_owner[best] if best is not None else None
+
+    def lookup(self, name):
+        """Каноническое имя или None, если ингредиента нет в каталоге"""
+        index, _ = self._resolve(name)
+        return self.names[index] if index is not None else None
+
+    def key(self, name) -> str:
+        """Ключ для сравнения: ключ канонического имени, а вне каталога — ключ самого имени"""
+        index, key = self._resolve(name)
+        return name_key(self.names[index]) if index is not None else key
+
+    def category(self, name):
+        """Категория ингредиента («зелень» для укропа) или None"""
+        index, _ = self._resolve(name)
+        return self.categories[index] if index is not None else None
+
+    def canonicalize(self, names) -> list:
+        """Имена списка заменены каноническими, повторы убраны (порядок сохраняется)"""
+        result, seen = [], set()
+        for name in names:
+            canonical = self.lookup(name) or normalize(name)
+            if canonical and canonical not in seen:
+                seen.add(canonical)
+                result.append(canonical)
+        return result
+
+    def mentions(self, text) -> list:
+        """Ингредиенты каталога, упомянутые в тексте (пары слов и отдельные слова, только точные совпадения)"""
+        words = normalize(text).split()
+        found, seen = [], set()
+        i = 0
+        while i < len(words):
+            index = self._exact.get(name_key(" ".join(words[i:i + 2]))) if i + 1 < len(words) else None
+            step = 2 if index is not None else 1
+            if index is None:
+                index = self._exact.get(name_key(words[i]))
+            if index is not None and index not in seen:
+                seen.add(index)
+                found.append(self.names[index])
+            i += step
+        return found
+
+    def terms(self, name) -> set:
+        """Ключ всего имени и ключи отдельных слов (только точные совпадения по словам)"""
+        words = normalize(name).split()
+        terms = {self.key(name)}
+        if len(words) > 1:
+            for word in words:
+                index = self._exact.get(name_key(word))
+                terms.add(name_key(self.names[index]) if index is not None else stem(word))
+        return terms
+
+    def is_forbidden(self, ingredient, forbidden_keys) -> bool:
+        """
+        Ингредиент запрещён, если совпадает с запрещённым продуктом целиком или содержит его
+        отдельным словом («грецкие орехи» при запрете «орехи»). Запасной вариант — слово
+        ингредиента образовано от запрещённого суффиксом прилагательного: «арахисовое масло» при
+        «арахис», «сырный соус» при «сыр». Слово, которое само есть в каталоге как другой продукт,
+        и просто похожие слова («виноград» при «вино», «маслины» при «масло») не считаются
+        """
+        terms = self.terms(ingredient)
+        if not terms.isdisjoint(forbidden_keys):
+            return True
+        words = set(self.key(ingredient).split()) | {t for t in terms if " " not in t}
+        if any(" " in key and set(key.split()) <= words for key in forbidden_keys):
+            return True
+        derived = [stem(word) for word in normalize(ingredient).split()
+                   if self._exact.get(name_key(word)) is None]
+        return any(all(any(_derived_from(word, part) for word in derived) for part in key.split())
+                   for key in forbidden_keys)
+
+    def forbidden_keys(self, forbidden_products) -> set:
+        return {self.key(p) for p in forbidden_products if normalize(p)}
+
+    def drop_forbidden(self, items, forbidden_products) -> list:
+        """Элементы без запрещённых продуктов; элемент — имя или {"name": ...} (ингредиент ответа VLM)"""
+        forbidden_keys = self.forbidden_keys(forbidden_products or [])
+        if not forbidden_keys:
+            return list(items)
+        return [item for item in items
+                if not self.is_forbidden(item.get("name", "") if isinstance(item, dict) else item, forbidden_keys)]
+
+    def to_entries(self) -> list:
+        entries = []
+        for name, aliases, category in zip(self.names, self.aliases, self.categories):
+            entry = {"name": name, "aliases": aliases}
+            if category:
+                entry["category"] = category
+            entries.append(entry)
+        return entries
+
+
+def load_catalogue(path: str = CATALOGUE_PATH) -> IngredientCatalogue:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return IngredientCatalogue(json.load(f))
+    except (OSError, ValueError) as e:
+        logger.warning("Каталог ингредиентов не загружен (%s): %s", path, e)
+        return IngredientCatalogue()
+
+
+@functools.lru_cache(maxsize=None)
+def get_catalogue() -> IngredientCatalogue:
+    """Каталог по умолчанию (INGREDIENT_CATALOGUE), загружается один раз на процесс"""
+    return load_catalogue()
@@ -0,0 +1,23 @@
+"""
+Метка маршрута для HTTP-метрик бэкенда и ML-сервера: шаблон пути (/history/favorite/{id_history}),
+а не сырой URL, чтобы не плодить метки. Шаблон ищется по таблице маршрутов один раз на endpoint.
+"""
+from starlette.requests import Request
+
+_route_paths = {}
+
+
+def route_label(request: Request) -> str:
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+
+    path = _route_paths.get(endpoint)
+    if path is None:
+        for route in request.app.router.routes:
+            if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint:
+                path = route.path
+                break
+        path = path or "unmatched"
+        _route_paths[endpoint] = path
+    return path
@@ -0,0 +1,221 @@
+"""
+Раскладка и жизненный цикл файлов задач — общие для бэкенда и ML-сервиса.
+
+Файлы задачи раскладываются по подкаталогам-шардам по хэшу ключа (task_id или id загрузки):
+results/3f/<task_id>.json. Путь вычисляется без листинга каталога, а в одном каталоге
+остаётся около 1/256 файлов. Старая плоская раскладка читается как запасной вариант и
+переносится в шарды уборщиком. Шарды одинаковы на обеих сторонах, поэтому общие каталоги
+(staging, local_recipes, куда пишет и воркер) не расходятся.
+
+Уборщик (Janitor) проходит категории и по политике хранения сжимает (gzip) или удаляет старые
+файлы, держит категорию в пределах max_bytes и публикует объём на диске в метриках. Метрики
+у сервисов свои (backend_storage_*, ml_storage_*) — сервис задаёт их в подклассе Janitor.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+from common.codec import is_compressed
+
+SHARD_CHARS = 2
+STORAGE_SWEEP_INTERVAL = float(os.getenv("STORAGE_SWEEP_INTERVAL", 3600))
+STORAGE_JANITOR = os.getenv("STORAGE_JANITOR", "1") == "1"
+# Недописанные временные файлы (*.tmp<pid>, *.part) старше этого считаются брошенными
+STALE_TMP_SECONDS = 3600
+_TMP_NAME = re.compile(r"\.(tmp\d*|part)$")
+DAY = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+def artifact_key(filename: str) -> str:
+    """Ключ файла задачи: task_id/id до первой точки или «_» (<id>.json, <id>_recipes.json, <id>.events.jsonl)"""
+    return re.split(r"[._]", Path(filename).name, maxsplit=1)[0]
+
+
+def shard_of(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:SHARD_CHARS]
+
+
+def sharded_path(root, filename: str) -> Path:
+    """Путь файла в шарде: root/<2 символа хэша ключа>/filename"""
+    filename = Path(filename).name
+    return Path(root) / shard_of(artifact_key(filename)) / filename
+
+
+def find_artifact(root, filename: str):
+    """Существующий файл: в шарде, сжатый в шарде или по старой плоской раскладке; None, если нет"""
+    path = sharded_path(root, filename)
+    for candidate in (path, path.with_name(path.name + ".gz"), Path(root) / Path(filename).name):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def open_artifact(path: Path, mode: str = "r"):
+    """Открывает файл, в том числе сжатый уборщиком (.gz), в текстовом режиме"""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Retention:
+    """
+    Политика хранения категории: compress_after/delete_after — возраст в днях (None — никогда),
+    max_bytes — предел объёма (сверх него удаляются самые старые). Значения переопределяются
+    через STORAGE_<NAME>_COMPRESS_DAYS, STORAGE_<NAME>_DELETE_DAYS и STORAGE_<NAME>_MAX_MB
+    """
+
+    def __init__(self, name: str, root, delete_after: float = None, compress_after: float = None,
+                 max_bytes: int = None, sharded: bool = True, exclude=()):
+        prefix = f"STORAGE_{name.upper()}_"
+        self.name = name
+        self.root = Path(root)
+        self.exclude = set(exclude)
+        self.delete_after = _env_float(prefix + "DELETE_DAYS", delete_after)
+        self.compress_after = _env_float(prefix + "COMPRESS_DAYS", compress_after)
+        max_mb = os.getenv(prefix + "MAX_MB")
+        self.max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else max_bytes
+        self.sharded = sharded
+
+
+def _env_float(name: str, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return float(value) if value.strip() else None
+
+
+class Janitor:
+    """Уборщик категорий; метрики (Gauge объёма и числа файлов, Counter действий) задаёт подкласс сервиса"""
+
+    bytes_gauge = None
+    files_gauge = None
+    actions_counter = None
+
+    def __init__(self, policies):
+        self.policies = list(policies)
+
+    def _files(self, policy: Retention):
+        """Файлы категории: в корне и в подкаталогах-шардах (служебные каталоги на «.» пропускаются)"""
+        try:
+            entries = list(os.scandir(policy.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.startswith(".") or entry.name in policy.exclude:
+                continue
+            if entry.is_file(follow_symlinks=False):
+                yield entry, False
+            elif entry.is_dir(follow_symlinks=False) and policy.sharded:
+                for sub in os.scandir(entry.path):
+                    if sub.is_file(follow_symlinks=False):
+                        yield sub, True
+
+    def sweep_policy(self, policy: Retention, now: float = None) -> dict:
+        now = now or time.time()
+        stats = {"deleted": 0, "compressed": 0, "migrated": 0, "bytes": 0, "files": 0}
+        kept = []
+        for entry, in_shard in self._files(policy):
+            path = Path(entry.path)
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            age = now - stat.st_mtime
+            if _TMP_NAME.search(path.name):
+                if age > STALE_TMP_SECONDS:
+                    self._delete(policy, path, stats)
+                continue
+            if policy.delete_after is not None and age > policy.delete_after * DAY:
+                self._delete(policy, path, stats)
+                continue
+            if policy.sharded and not in_shard:
+                path = self._migrate(policy, path, stats)
+            if (policy.compress_after is not None and age > policy.compress_after * DAY
+                    and not path.name.endswith(".gz") and not is_compressed(path)):
+                path = self._compress(policy, path, stat, stats)
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            kept.append((stat.st_mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        if policy.max_bytes is not None and total > policy.max_bytes:
+            kept.sort(key=lambda item: item[0])
+            oldest = 0
+            while oldest < len(kept) and total > policy.max_bytes:
+                _, size, path = kept[oldest]
+                self._delete(policy, path, stats)
+                total -= size
+                oldest += 1
+            kept = kept[oldest:]
+
+        stats["bytes"], stats["files"] = total, len(kept)
+        self._publish(policy, total, len(kept))
+        return stats
+
+    def usage(self) -> dict:
+        """Объём и число файлов по категориям, без уборки"""
+        result = {}
+        for policy in self.policies:
+            sizes = [entry.stat().st_size for entry, _ in self._files(policy)]
+            result[policy.name] = {"bytes": sum(sizes), "files": len(sizes)}
+            self._publish(policy, sum(sizes), len(sizes))
+        return result
+
+    def sweep(self, now: float = None) -> dict:
+        result = {}
+        for policy in self.policies:
+            try:
+                result[policy.name] = self.sweep_policy(policy, now)
+            except OSError as e:
+                logger.warning("Уборка категории %s прервана: %s", policy.name, e)
+        return result
+
+    def _publish(self, policy: Retention, total: int, files: int):
+        if self.bytes_gauge is not None:
+            self.bytes_gauge.labels(policy.name).set(total)
+        if self.files_gauge is not None:
+            self.files_gauge.labels(policy.name).set(files)
+
+    def _count(self, policy: Retention, action: str, stats: dict):
+        stats[action] += 1
+        if self.actions_counter is not None:
+            self.actions_counter.labels(policy.name, action).inc()
+
+    def _delete(self, policy: Retention, path: Path, stats: dict):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self._count(policy, "deleted", stats)
+
+    def _migrate(self, policy: Retention, path: Path, stats: dict) -> Path:
+        """Файл из плоской раскладки — в его шард (если в шарде уже есть более новый, старый удаляется)"""
+        target = sharded_path(policy.root, path.name)
+        if target.exists():
+            self._delete(policy, path, stats)
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target)
+        self._count(policy, "migrated", stats)
+        return target
+
+    def _compress(self, policy: Retention, path: Path, stat, stats: dict) -> Path:
+        """gzip рядом с исходником с тем же mtime (возраст для удаления не сбрасывается)"""
+        target = path.with_name(path.name + ".gz")
+        tmp_path = target.with_name(target.name + f".tmp{os.getpid()}")
+        with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+        os.replace(tmp_path, target)
+        path.unlink()
+        self._count(policy, "compressed", stats)
+        return target
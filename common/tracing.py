@@ -0,0 +1,218 @@
+"""
+Сквозная трассировка задачи: backend -> ML-сервер -> очередь -> воркер.
+
+Контекст передаётся заголовком W3C traceparent (в HTTP и в заголовках AMQP-сообщений), спаны
+всех сервисов пишутся в JSONL-файл задачи в шарде TRACE_DIR; build_timeline сводит их в одну
+шкалу времени.
+"""
+import contextvars
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from common.storage import find_artifact, open_artifact, sharded_path
+
+TRACE_DIR = os.getenv("TRACE_DIR", "./traces")
+TRACEPARENT_HEADER = "traceparent"
+
+# Текущий контекст трассировки запроса: (trace_id, span_id)
+_current = contextvars.ContextVar("trace_context", default=None)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(value: str):
+    """Разбирает заголовок W3C traceparent: 00-<trace_id>-<span_id>-<flags>"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def format_traceparent(trace_id: str, span_id: str) -> str:
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def inject_amqp_headers(headers: dict, trace_id: str, span_id: str) -> dict:
+    """Кладёт контекст трассы в заголовки AMQP-сообщения"""
+    headers = dict(headers or {})
+    headers[TRACEPARENT_HEADER] = format_traceparent(trace_id, span_id)
+    return headers
+
+
+def extract_amqp_headers(headers: dict):
+    """Достаёт (trace_id, span_id) из заголовков AMQP-сообщения"""
+    value = (headers or {}).get(TRACEPARENT_HEADER)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return parse_traceparent(value)
+
+
+class Tracer:
+    """
+    Минимальная трассировка этапов задачи: контекст передаётся заголовком traceparent,
+    спаны пишутся в JSONL-файл задачи ./traces/{task_id}.jsonl.
+    """
+
+    def __init__(self, service: str, trace_dir: str = TRACE_DIR, max_tasks: int = 10000):
+        self.service = service
+        self.trace_dir = Path(trace_dir)
+        self.max_tasks = max_tasks
+        self._task_traces = OrderedDict()
+
+    # --- Контекст запроса ---
+    def start_request(self, traceparent: str = None):
+        context = parse_traceparent(traceparent) or (new_trace_id(), None)
+        return _current.set(context)
+
+    def start_from_context(self, context):
+        """Продолжает трассу, полученную не из HTTP (например, из заголовков AMQP)"""
+        return _current.set(context or (new_trace_id(), None))
+
+    def end_request(self, token):
+        _current.reset(token)
+
+    def current_trace_id(self):
+        context = _current.get()
+        return context[0] if context else None
+
+    def current_context(self):
+        return _current.get()
+
+    def headers(self) -> dict:
+        """Заголовки для исходящего HTTP-запроса в рамках текущего спана"""
+        context = _current.get()
+        if not context:
+            return {}
+        return {TRACEPARENT_HEADER: format_traceparent(context[0], context[1] or new_span_id())}
+
+    # --- Привязка задачи к трассе ---
+    def bind_task(self, task_id: str, trace_id: str):
+        self._task_traces[task_id] = trace_id
+        self._task_traces.move_to_end(task_id)
+        while len(self._task_traces) > self.max_tasks:
+            self._task_traces.popitem(last=False)
+
+    def trace_for_task(self, task_id: str):
+        return self._task_traces.get(task_id)
+
+    # --- Спаны ---
+    @contextmanager
+    def span(self, name: str, task_id: str = None, **attrs):
+        """
+        Спан этапа. Если задача уже привязана к трассе, спан продолжает её
+        (опрос /get-result и генерация рецептов попадают в ту же трассу, что и загрузка).
+        """
+        parent = _current.get()
+        trace_id = parent[0] if parent else new_trace_id()
+        parent_id = parent[1] if parent else None
+
+        task_trace = self.trace_for_task(task_id) if task_id else None
+        if task_trace and task_trace != trace_id:
+            trace_id, parent_id = task_trace, None
+
+        record = {
+            "trace_id": trace_id,
+            "span_id": new_span_id(),
+            "parent_id": parent_id,
+            "name": name,
+            "service": self.service,
+            "task_id": task_id,
+            "attrs": dict(attrs),
+        }
+        token = _current.set((trace_id, record["span_id"]))
+        record["start"] = time.time()
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            _current.reset(token)
+            record["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            record["end"] = record["start"] + record["duration_ms"] / 1000
+            if record["task_id"]:
+                self.bind_task(record["task_id"], trace_id)
+                self.write(record)
+
+    def record_span(self, name: str, task_id: str, start: float, end: float,
+                    trace_id: str = None, parent_id: str = None, **attrs):
+        """Спан по уже известным отметкам времени (например, ожидание в очереди)"""
+        record = {
+            "trace_id": trace_id or self.trace_for_task(task_id) or self.current_trace_id() or new_trace_id(),
+            "span_id": new_span_id(),
+            "parent_id": parent_id,
+            "name": name,
+            "service": self.service,
+            "task_id": task_id,
+            "attrs": dict(attrs),
+            "start": start,
+            "end": end,
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+        self.write(record)
+        return record
+
+    # --- Хранилище ---
+    def _path(self, task_id: str) -> Path:
+        return sharded_path(self.trace_dir, f"{task_id}.jsonl")
+
+    def write(self, record: dict):
+        path = self._path(record["task_id"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def load(self, task_id: str) -> list:
+        path = find_artifact(self.trace_dir, f"{task_id}.jsonl")
+        if path is None:
+            return []
+        with open_artifact(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+
+def build_timeline(spans: list) -> dict:
+    """Сводит спаны всех сервисов в одну шкалу времени задачи"""
+    spans = sorted(spans, key=lambda s: s["start"])
+    if not spans:
+        return {"spans": [], "stages": [], "wall_clock_ms": 0}
+
+    origin = spans[0]["start"]
+    wall_clock_ms = round((max(s["end"] for s in spans) - origin) * 1000, 3)
+
+    stages = OrderedDict()
+    for span in spans:
+        span["offset_ms"] = round((span["start"] - origin) * 1000, 3)
+        stage = stages.setdefault(span["name"], {
+            "name": span["name"],
+            "service": span["service"],
+            "count": 0,
+            "total_ms": 0.0,
+            "first_offset_ms": span["offset_ms"],
+        })
+        stage["count"] += 1
+        stage["total_ms"] = round(stage["total_ms"] + span["duration_ms"], 3)
+
+    for stage in stages.values():
+        stage["share_of_wall_clock"] = round(stage["total_ms"] / wall_clock_ms, 4) if wall_clock_ms else 0.0
+
+    return {
+        "trace_ids": sorted({s["trace_id"] for s in spans}),
+        "wall_clock_ms": wall_clock_ms,
+        "stages": list(stages.values()),
+        "spans": spans,
+    }
@@ -0,0 +1,161 @@
+"""
+Приём фото без чтения целиком в память — общий для бэкенда и ML-сервера.
+
+UploadFile кусками по UPLOAD_CHUNK_SIZE переписывается в общий каталог staging (data/staging
+в корне репозитория — его видят обе стороны), размер проверяется по ходу чтения. Пиковая
+память загрузки измеряется через tracemalloc (UPLOAD_TRACE_MEMORY=1, точно при одной загрузке
+за раз) или, по умолчанию, как максимальный размер буфера обработчика.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+from common.storage import sharded_path
+
+ROOT = Path(__file__).resolve().parents[1]
+STAGING_DIR = Path(os.getenv("UPLOAD_STAGING_DIR", ROOT / "data" / "staging"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 64 * 1024))
+UPLOAD_TRACE_MEMORY = os.getenv("UPLOAD_TRACE_MEMORY", "0") == "1"
+# Запас на заголовки multipart и поля формы сверх размера самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Файл больше {limit // (1024 * 1024)} МБ")
+        self.limit = limit
+
+
+def staging_path(upload_id: str, filename: str = "", directory: Path = None) -> Path:
+    """Путь файла в шарде staging по id (имя пользователя в путь не попадает — только расширение)"""
+    suffix = Path(filename).suffix.lower()
+    return sharded_path(directory or STAGING_DIR, f"{Path(upload_id).name}{suffix if suffix in IMAGE_EXTENSIONS else ''}")
+
+
+class _MemoryProbe:
+    """Пик памяти за время загрузки: tracemalloc, если включён, иначе — крупнейший буфер"""
+
+    def __init__(self):
+        self.buffer_peak = 0
+        self._base = None
+        if UPLOAD_TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+
+    def buffer(self, size: int):
+        self.buffer_peak = max(self.buffer_peak, size)
+
+    def peak(self) -> int:
+        if self._base is None:
+            return self.buffer_peak
+        return max(0, tracemalloc.get_traced_memory()[1] - self._base)
+
+
+async def write_staged(file, path: Path, max_bytes: int = UPLOAD_MAX_BYTES,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE) -> dict:
+    """
+    Кусками переписывает UploadFile в path (через .part — недописанный файл не виден по имени).
+    UploadTooLarge — как только прочитано больше max_bytes; остаток удаляется.
+    Возвращает size, sha256, peak_memory и seconds
+    """
+    start = time.perf_counter()
+    probe = _MemoryProbe()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                probe.buffer(len(chunk))
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return {
+        "size": size,
+        "sha256": digest.hexdigest(),
+        "peak_memory": probe.peak(),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI-ограничение тела запроса для маршрутов загрузки: 413 сразу по Content-Length, а при
+    передаче без длины — как только прочитано больше лимита (до разбора multipart целиком)
+    """
+
+    def __init__(self, app, paths=(), limit: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = tuple(paths)
+        self.limit = limit
+        self.max_bytes = limit + MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope.get("headers") or []).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise UploadTooLarge(self.limit)
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                # FastAPI превращает ошибку чтения формы в 400 — вместо него отвечаем 413
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if response_started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send):
+        logger.warning("Загрузка отклонена: тело запроса больше %s байт", self.max_bytes)
+        body = json.dumps({"detail": str(UploadTooLarge(self.limit))}, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
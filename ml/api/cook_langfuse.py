@@ -1,39 +1,31 @@
 import os
 import time
 import json
+import asyncio
 from dotenv import load_dotenv
-from langfuse.langchain import CallbackHandler
-from langchain.schema.runnable import Runnable, RunnableSequence
-from transformers import AutoTokenizer
+from functools import lru_cache
+from langchain_core.runnables import Runnable, RunnableSequence
 
-# Загружаем токенайзер для Mistral
-tokenizer = AutoTokenizer.from_pretrained("mistralai/Mistral-7B-Instruct-v0.2")
+from ml.tracing.exporter import apply_langfuse_batch_defaults
+from ml.tracing.tokens import usage_and_cost as _usage_and_cost
 
 # Загружаем ключи из .env
 load_dotenv()
-os.environ["LANGFUSE_PUBLIC_KEY"] = os.getenv("LANGFUSE_PUBLIC_KEY")
-os.environ["LANGFUSE_SECRET_KEY"] = os.getenv("LANGFUSE_SECRET_KEY")
-os.environ["LANGFUSE_HOST"] = os.getenv("LANGFUSE_HOST")
 
-# Handler для LangChain
-langfuse_handler = CallbackHandler()
 
-# --- Подсчёт токенов и стоимости ---
-def count_tokens_and_cost(prompt: str, output: str, model: str = "mistral-medium"):
-    input_tokens = len(tokenizer.encode(prompt))
-    output_tokens = len(tokenizer.encode(output))
-    total_tokens = input_tokens + output_tokens
+@lru_cache(maxsize=1)
+def get_langfuse_handler():
+    """Handler для LangChain; создаётся при первом запуске цепочки, а не при импорте"""
+    apply_langfuse_batch_defaults()
+    from langfuse.langchain import CallbackHandler
+    return CallbackHandler()
 
+
+# --- Токены и стоимость вызова LLM ---
+def usage_and_cost(call: dict, model: str = "mistral-medium"):
     # тарифы для mistral-medium (пример: $0.25 за 1M токенов)
-    price_per_input = 0.25 / 1_000_000
-    price_per_output = 0.25 / 1_000_000
-    cost = input_tokens * price_per_input + output_tokens * price_per_output
+    return _usage_and_cost([call], price_per_input=0.25 / 1_000_000, price_per_output=0.25 / 1_000_000)[0]
 
-    return {
-        "input_tokens": input_tokens,
-        "output_tokens": output_tokens,
-        "total_tokens": total_tokens,
-    }, cost
 
 # --- Адаптер для VLM ---
 class VLMRunnable(Runnable):
@@ -60,6 +52,14 @@ class LLMRunnable(Runnable):
     def __init__(self, llm):
         self.llm = llm
 
+    async def _generate(self, **kwargs):
+        # Клиент httpx привязан к циклу событий, а asyncio.run каждый раз создаёт новый
+        await self.llm.init_client()
+        try:
+            return await self.llm.generate_recipe_with_usage(**kwargs)
+        finally:
+            await self.llm.close_client()
+
     def invoke(self, inputs, config=None):
         start = time.time()
 
@@ -70,14 +70,14 @@ class LLMRunnable(Runnable):
             "prompt": inputs["input"]["prompt"]
         }
 
-        response = self.llm.generate_recipe(
+        response, call = asyncio.run(self._generate(
             ingredients=llm_input["ingredients"],
             dietary=llm_input["dietary"],
             feedback=llm_input["feedback"]
-        )
+        ))
         recipe = response[0] if isinstance(response, list) and response else response
 
-        usage, cost = count_tokens_and_cost(llm_input["prompt"], str(recipe))
+        usage, cost = usage_and_cost(call)
         duration = round(time.time() - start, 2)
         
         return {
@@ -85,7 +85,8 @@ class LLMRunnable(Runnable):
             "output": {"recipe": recipe},
             "duration_sec": duration,
             "usage": usage,
-            "cost": cost
+            "cost": cost,
+            "llm_call": {"model": call["model"], "latency_sec": call["latency_sec"]}
         }
 
 
@@ -98,7 +99,7 @@ def cook_from_image(image_path, vlm, llm, dietary=None, feedback=None):
 
     result = chain.invoke(
         {"image_path": image_path, "dietary": dietary, "feedback": feedback},
-        config={"callbacks": [langfuse_handler]}
+        config={"callbacks": [get_langfuse_handler()]}
     )
 
     return result
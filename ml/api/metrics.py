@@ -0,0 +1,157 @@
+import os
+import time
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+
+from common.routes import route_label
+
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 9101))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# VLM на CPU отвечает десятки секунд — бакеты до 10 минут
+MODEL_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ml_http_request_duration_seconds",
+    "Время обработки HTTP-запроса ML-сервером",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "ml_queue_messages",
+    "Количество сообщений в очереди RabbitMQ",
+    ["queue"],
+)
+QUEUE_CONSUMERS = Gauge(
+    "ml_queue_consumers",
+    "Количество подписчиков очереди RabbitMQ",
+    ["queue"],
+)
+TASKS_PUBLISHED = Counter(
+    "ml_tasks_published_total",
+    "Задачи, отправленные в очередь",
+    ["queue", "outcome"],
+)
+VLM_CALL_SECONDS = Histogram(
+    "ml_vlm_call_duration_seconds",
+    "Время вызова VLM (Ollama), включая перевод ингредиентов",
+    ["outcome"],
+    buckets=MODEL_BUCKETS,
+)
+MISTRAL_CALL_SECONDS = Histogram(
+    "ml_mistral_call_duration_seconds",
+    "Время вызова Mistral API",
+    ["outcome"],
+    buckets=MODEL_BUCKETS,
+)
+MISTRAL_TOKENS = Counter(
+    "ml_mistral_tokens_total",
+    "Токены Mistral по данным usage из ответов API",
+    ["kind"],
+)
+SPECULATIVE_JOBS = Counter(
+    "ml_speculative_jobs_total",
+    "Задачи спекулятивной генерации рецептов по исходу",
+    ["outcome"],
+)
+SPECULATIVE_SPEND = Counter(
+    "ml_speculative_spend_usd_total",
+    "Стоимость спекулятивных вызовов Mistral, долл.",
+)
+# Размер фото и пик памяти при его приёме (лимит загрузки — 10 МБ по умолчанию)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 20 * 1024 ** 2)
+UPLOAD_BYTES = Histogram(
+    "ml_upload_size_bytes",
+    "Размер фото, принятого ML-сервером",
+    buckets=SIZE_BUCKETS,
+)
+UPLOAD_PEAK_MEMORY = Histogram(
+    "ml_upload_peak_memory_bytes",
+    "Пик памяти при приёме одного фото",
+    buckets=SIZE_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "ml_cache_lookups_total",
+    "Обращения к кэшам ML-сервиса и воркера",
+    ["cache", "result"],
+)
+STORAGE_BYTES = Gauge(
+    "ml_storage_bytes",
+    "Объём файлов категории хранилища на диске",
+    ["category"],
+)
+STORAGE_FILES = Gauge(
+    "ml_storage_files",
+    "Число файлов категории хранилища",
+    ["category"],
+)
+STORAGE_JANITOR_ACTIONS = Counter(
+    "ml_storage_janitor_actions_total",
+    "Действия уборщика хранилища: удаление, сжатие, перенос в шард",
+    ["category", "action"],
+)
+WORKER_TASKS_IN_PROGRESS = Gauge(
+    "ml_worker_tasks_in_progress",
+    "Задачи, которые воркер обрабатывает прямо сейчас",
+)
+WORKER_SCHEDULER_PENDING = Gauge(
+    "ml_worker_scheduler_pending",
+    "Задачи, полученные воркером и ожидающие слота, по полосам приоритета",
+    ["lane"],
+)
+WORKER_TASKS = Counter(
+    "ml_worker_tasks_total",
+    "Задачи, обработанные воркером",
+    ["outcome"],
+)
+WORKER_DEAD_LETTERED = Counter(
+    "ml_worker_dead_lettered_total",
+    "Задачи, отправленные воркером в dead-letter очередь",
+    ["reason"],
+)
+WORKER_TASK_SECONDS = Histogram(
+    "ml_worker_task_duration_seconds",
+    "Полное время обработки задачи воркером",
+    ["outcome"],
+    buckets=MODEL_BUCKETS,
+)
+SUPERVISOR_WORKERS = Gauge(
+    "ml_supervisor_workers",
+    "Живые процессы воркеров под управлением супервизора",
+)
+SUPERVISOR_RESTARTS = Counter(
+    "ml_supervisor_worker_restarts_total",
+    "Перезапуски упавших воркеров",
+)
+
+
+def outcome_of(result) -> str:
+    """success/error по результату baseline-моделей (ошибка возвращается как dict с ключом error)"""
+    return "error" if isinstance(result, dict) and "error" in result else "success"
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+async def metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        HTTP_REQUEST_SECONDS.labels(request.method, route_label(request), status).observe(
+            time.perf_counter() - start
+        )
+
+
+def render_metrics() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def start_worker_exporter(port: int = WORKER_METRICS_PORT):
+    """HTTP-экспортер метрик для процессов без своего FastAPI (воркер, супервизор)"""
+    start_http_server(port)
@@ -0,0 +1,79 @@
+"""
+События хода задачи в режиме конвейера (VLM и генерация рецептов одной задачей воркера).
+
+Воркер дописывает события в results/{task_id}.events.jsonl, ML-сервер отдаёт их клиенту
+потоком Server-Sent Events по мере появления. Последнее событие — done или error.
+"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+from ml.api.dead_letter import RESULTS_DIR
+from common.storage import sharded_path
+
+TERMINAL_STAGES = ("done", "error")
+# Как часто проверять файл событий и сколько ждать завершения задачи
+EVENTS_POLL_INTERVAL = float(os.getenv("PIPELINE_EVENTS_POLL", 0.2))
+EVENTS_TIMEOUT = float(os.getenv("PIPELINE_EVENTS_TIMEOUT", 900))
+KEEPALIVE_INTERVAL = 15.0
+
+
+def events_path(task_id: str) -> Path:
+    return sharded_path(RESULTS_DIR, f"{task_id}.events.jsonl")
+
+
+class ProgressLog:
+    """Запись событий одной задачи; строка дописывается целиком одним write"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.path = events_path(task_id)
+        self.started_at = time.time()
+
+    def emit(self, stage: str, **data) -> dict:
+        event = {"stage": stage, "time": time.time(), "elapsed_sec": round(time.time() - self.started_at, 3), **data}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        return event
+
+
+def read_events(task_id: str, offset: int = 0):
+    """Новые события с позиции offset: (события, новая позиция); недописанная строка ждёт следующего раза"""
+    path = events_path(task_id)
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+    except FileNotFoundError:
+        return [], offset
+    complete = chunk[:chunk.rfind(b"\n") + 1]
+    events = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+    return events, offset + len(complete)
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['stage']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def stream_events(task_id: str, timeout: float = EVENTS_TIMEOUT, poll_interval: float = EVENTS_POLL_INTERVAL):
+    """SSE-поток событий задачи до терминального события или timeout"""
+    offset = 0
+    deadline = time.monotonic() + timeout
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        events, offset = read_events(task_id, offset)
+        for event in events:
+            yield format_sse(event)
+            if event["stage"] in TERMINAL_STAGES:
+                return
+        if events:
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+            # Комментарий SSE держит соединение живым через прокси
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_interval)
+    yield format_sse({"stage": "error", "error": "timeout", "time": time.time()})
@@ -0,0 +1,138 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+
+# Полосы в порядке приоритета: интерактивные запросы пользователей идут раньше пакетных/eval
+LANES = ("interactive", "batch")
+DEFAULT_LANE = "batch"
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 1))
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", 64))
+PER_USER_CONCURRENCY = int(os.getenv("PER_USER_CONCURRENCY", 1))
+# Сколько интерактивных задач подряд можно выдать, пока ждёт пакетная (защита от голодания)
+MAX_INTERACTIVE_STREAK = int(os.getenv("MAX_INTERACTIVE_STREAK", 8))
+
+
+def normalize_lane(lane: str) -> str:
+    lane = (lane or "").strip().lower()
+    return lane if lane in LANES else DEFAULT_LANE
+
+
+class FairScheduler:
+    """
+    Планировщик задач воркера поверх одной FIFO-очереди RabbitMQ.
+
+    Сообщения забираются из очереди с prefetch и раскладываются по полосам и пользователям.
+    Внутри полосы пользователи обслуживаются по кругу (round-robin), у пользователя не может
+    выполняться больше per_user_limit задач одновременно. Пачка фото одного пользователя
+    больше не задерживает всех остальных.
+    """
+
+    def __init__(self, per_user_limit: int = PER_USER_CONCURRENCY,
+                 max_interactive_streak: int = MAX_INTERACTIVE_STREAK):
+        self.per_user_limit = max(1, per_user_limit)
+        self.max_interactive_streak = max(1, max_interactive_streak)
+        # lane -> OrderedDict(user_id -> deque задач); порядок ключей = очередь обхода
+        self._lanes = {lane: OrderedDict() for lane in LANES}
+        self._running = {}
+        self._interactive_streak = 0
+        self._closed = False
+        self._changed = asyncio.Condition()
+
+    # --- Состояние ---
+    def pending(self, lane: str = None) -> int:
+        lanes = [lane] if lane else LANES
+        return sum(len(items) for name in lanes for items in self._lanes[name].values())
+
+    def running(self, user_id: str = None) -> int:
+        if user_id is not None:
+            return self._running.get(user_id, 0)
+        return sum(self._running.values())
+
+    def stats(self) -> dict:
+        return {
+            "pending": {lane: self.pending(lane) for lane in LANES},
+            "running": dict(self._running),
+        }
+
+    # --- Постановка и выдача ---
+    async def put(self, item, user_id: str, lane: str = DEFAULT_LANE) -> bool:
+        """False — планировщик закрыт, задачу нужно вернуть в очередь"""
+        async with self._changed:
+            if self._closed:
+                return False
+            self._push(item, str(user_id), normalize_lane(lane))
+            self._changed.notify_all()
+            return True
+
+    async def get(self):
+        """Ждёт задачу, которую можно запустить. Возвращает (item, user_id, lane) или None после close()."""
+        async with self._changed:
+            while True:
+                if self._closed:
+                    return None
+                picked = self._pop()
+                if picked is not None:
+                    return picked
+                await self._changed.wait()
+
+    async def close(self) -> list:
+        """Останавливает выдачу задач и возвращает все ещё не начатые (для возврата в очередь)"""
+        async with self._changed:
+            self._closed = True
+            drained = [item for lane in LANES for items in self._lanes[lane].values() for item in items]
+            for lane in LANES:
+                self._lanes[lane].clear()
+            self._changed.notify_all()
+        return drained
+
+    async def done(self, user_id: str):
+        """Освобождает слот пользователя после завершения задачи"""
+        async with self._changed:
+            user_id = str(user_id)
+            left = self._running.get(user_id, 0) - 1
+            if left > 0:
+                self._running[user_id] = left
+            else:
+                self._running.pop(user_id, None)
+            self._changed.notify_all()
+
+    def _push(self, item, user_id: str, lane: str):
+        self._lanes[lane].setdefault(user_id, deque()).append(item)
+
+    def _pop(self):
+        interactive = self._pick_user("interactive")
+        batch = self._pick_user("batch")
+
+        lane = None
+        if interactive is not None and batch is not None:
+            lane = "batch" if self._interactive_streak >= self.max_interactive_streak else "interactive"
+        elif interactive is not None:
+            lane = "interactive"
+        elif batch is not None:
+            lane = "batch"
+        if lane is None:
+            return None
+
+        self._interactive_streak = self._interactive_streak + 1 if lane == "interactive" else 0
+        user_id = interactive if lane == "interactive" else batch
+        return self._take(lane, user_id), user_id, lane
+
+    def _pick_user(self, lane: str):
+        """Первый по кругу пользователь полосы, у которого есть свободный слот"""
+        for user_id in self._lanes[lane]:
+            if self._running.get(user_id, 0) < self.per_user_limit:
+                return user_id
+        return None
+
+    def _take(self, lane: str, user_id: str):
+        users = self._lanes[lane]
+        items = users[user_id]
+        item = items.popleft()
+        if items:
+            # Пользователь уходит в конец круга
+            users.move_to_end(user_id)
+        else:
+            del users[user_id]
+        self._running[user_id] = self._running.get(user_id, 0) + 1
+        return item
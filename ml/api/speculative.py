@@ -0,0 +1,138 @@
+"""
+Спекулятивная генерация рецептов: как только воркер распознал ингредиенты, ML-сервер
+генерирует рецепты с сохранёнными предпочтениями пользователя, не дожидаясь, пока тот
+просмотрит ингредиенты и нажмёт «Сгенерировать». Если параметры /cook-from-image совпали
+с теми, что пошли в спекулятивный запрос, ответ отдаётся из кэша сразу.
+
+Режим включается бэкендом (SPECULATIVE_RECIPES=1 передаёт параметры в /test-vlm) и
+ограничен дневным бюджетом на такие вызовы Mistral: SPECULATIVE_DAILY_BUDGET в долларах,
+0 — спекулятивные задачи не выполняются.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from common.codec import read_artifact, write_artifact
+from common.storage import sharded_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: бюджет без межпроцессной блокировки
+    fcntl = None
+
+SPECULATIVE_QUEUE = "recipe_speculative_queue"
+SPECULATIVE_DIR = Path(os.getenv("SPECULATIVE_DIR", "./recipes/.speculative"))
+SPECULATIVE_DAILY_BUDGET = float(os.getenv("SPECULATIVE_DAILY_BUDGET", 0.5))
+# Резерв из бюджета на один вызов до ответа (уточняется по usage после)
+SPECULATIVE_RESERVE = float(os.getenv("SPECULATIVE_RESERVE_USD", 0.001))
+SPECULATIVE_CONCURRENCY = int(os.getenv("SPECULATIVE_CONCURRENCY", 2))
+
+# Поля формы /cook-from-image, от которых зависит результат генерации
+GENERATION_FIELDS = (
+    "dietary", "user_feedback", "preferred_calorie_level", "preferred_cooking_time",
+    "preferred_difficulty", "existing_recipes",
+)
+
+
+def normalize_params(params: dict) -> dict:
+    """Параметры генерации без различий регистра и пробелов; отсутствующие — «нет», как в форме"""
+    params = params or {}
+    return {field: " ".join(str(params.get(field) or "нет").split()).lower() for field in GENERATION_FIELDS}
+
+
+def generation_key(ingredients, params: dict) -> str:
+    """Ключ кэша: ингредиенты (без порядка) и нормализованные параметры генерации"""
+    if isinstance(ingredients, dict):
+        # Результат воркера — весь ответ VLM, список лежит в нём под тем же ключом
+        ingredients = ingredients.get("ingredients", [])
+    names = sorted(
+        str(item.get("name", "") if isinstance(item, dict) else item).strip().lower()
+        for item in ingredients or []
+    )
+    payload = json.dumps({"ingredients": names, "params": normalize_params(params)}, ensure_ascii=False,
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SpendBudget:
+    """
+    Дневной бюджет в файле (общий для процессов): reserve перед вызовом, settle — по фактической
+    стоимости. Счётчик обнуляется с началом нового дня (UTC)
+    """
+
+    def __init__(self, path: Path = SPECULATIVE_DIR / "budget.json", daily_limit: float = SPECULATIVE_DAILY_BUDGET):
+        self.path = Path(path)
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_suffix(".lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+                try:
+                    state = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    state = {}
+                if state.get("date") != today:
+                    state = {"date": today, "spent": 0.0, "calls": 0, "rejected": 0}
+                yield state
+                tmp_path = self.path.with_suffix(f".tmp{os.getpid()}")
+                tmp_path.write_text(json.dumps(state), encoding="utf-8")
+                os.replace(tmp_path, self.path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reserve(self, amount: float = SPECULATIVE_RESERVE) -> bool:
+        """False, если вызов не помещается в остаток бюджета на сегодня"""
+        if self.daily_limit <= 0:
+            return False
+        with self._state() as state:
+            if state["spent"] + amount > self.daily_limit:
+                state["rejected"] += 1
+                return False
+            state["spent"] += amount
+            state["calls"] += 1
+            return True
+
+    def settle(self, reserved: float, actual: float):
+        with self._state() as state:
+            state["spent"] = max(0.0, state["spent"] - reserved + actual)
+
+    def stats(self) -> dict:
+        with self._state() as state:
+            return {**state, "limit": self.daily_limit}
+
+
+class SpeculativeCache:
+    """Результат спекулятивной генерации по задаче вместе с ключом её входных данных"""
+
+    def __init__(self, directory: Path = SPECULATIVE_DIR):
+        self.directory = Path(directory)
+
+    def _path(self, task_id: str) -> Path:
+        return sharded_path(self.directory, f"{task_id}.json")
+
+    def get(self, task_id: str, key: str):
+        """(recipes, call) или None, если результата нет или входные данные изменились"""
+        try:
+            entry = read_artifact(self._path(task_id))
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key:
+            return None
+        return entry["recipes"], entry["call"]
+
+    def has(self, task_id: str, key: str) -> bool:
+        return self.get(task_id, key) is not None
+
+    def put(self, task_id: str, key: str, recipes, call: dict):
+        write_artifact(self._path(task_id), {"key": key, "recipes": recipes, "call": call})
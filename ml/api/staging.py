@@ -0,0 +1,41 @@
+"""
+Приём фото ML-сервером без чтения целиком в память (common/uploads.py): UploadFile кусками
+переписывается в общий с бэкендом каталог staging. В сообщении очереди — путь к файлу в staging.
+
+В режиме UPLOAD_TRANSPORT=shared бэкенд сам кладёт файл в staging под именем по содержимому
+и передаёт только имя — ML-сервер ставит задачу на этот файл без копирования.
+"""
+import re
+from pathlib import Path
+
+from common.storage import find_artifact
+from common.uploads import (STAGING_DIR, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES, UploadTooLarge, staging_path,
+                            write_staged)
+
+# Имя по содержимому: sha256 и расширение — другие имена (и пути) из запроса не принимаются
+STAGED_NAME = re.compile(r"^[0-9a-f]{64}\.(jpg|jpeg|png)$")
+
+
+async def stage_upload(file, upload_id: str, max_bytes: int = UPLOAD_MAX_BYTES, directory: Path = None,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE) -> dict:
+    """
+    Кусками переписывает UploadFile в staging под именем upload_id (у ML-сервера — task_id).
+    UploadTooLarge — как только прочитано больше max_bytes. Возвращает path, size, sha256, peak_memory
+    """
+    path = staging_path(upload_id, file.filename, directory)
+    return {"path": path, **await write_staged(file, path, max_bytes, chunk_size)}
+
+
+def resolve_staged(name: str, directory: Path = None, max_bytes: int = UPLOAD_MAX_BYTES) -> Path:
+    """
+    Путь файла, который бэкенд положил в общий staging. ValueError — недопустимое имя,
+    FileNotFoundError — файла нет (другой хост или staging не общий), UploadTooLarge — больше лимита
+    """
+    if not STAGED_NAME.match(name or ""):
+        raise ValueError(f"Недопустимое имя файла в staging: {name!r}")
+    path = find_artifact(directory or STAGING_DIR, name)
+    if path is None or not path.is_file():
+        raise FileNotFoundError(f"Файл {name} не найден в staging")
+    if path.stat().st_size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    return path
@@ -0,0 +1,61 @@
+"""
+Жизненный цикл файлов ML-сервиса: результаты задач, рецепты, фото в staging, трассы.
+
+Раскладка по шардам и уборщик — общие с бэкендом (common/storage.py). Здесь — политики
+хранения ML-сервиса и его метрики; сервер запускает уборщика раз в STORAGE_SWEEP_INTERVAL секунд.
+
+    python -m ml.api.storage sweep      # один проход уборщика
+    python -m ml.api.storage usage      # объём и число файлов по категориям
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from common.storage import STORAGE_JANITOR, STORAGE_SWEEP_INTERVAL, Retention
+from common.storage import Janitor as BaseJanitor
+from ml.api.metrics import STORAGE_BYTES, STORAGE_FILES, STORAGE_JANITOR_ACTIONS
+
+RECIPES_DIR = Path("./recipes")
+
+
+class Janitor(BaseJanitor):
+    """Уборщик с метриками ml_storage_*"""
+
+    bytes_gauge = STORAGE_BYTES
+    files_gauge = STORAGE_FILES
+    actions_counter = STORAGE_JANITOR_ACTIONS
+
+
+def default_policies() -> list:
+    # Импорт здесь: модули с путями сами импортируют storage
+    from common.tracing import TRACE_DIR
+    from ml.api.dead_letter import RESULTS_DIR
+    from ml.api.speculative import SPECULATIVE_DIR
+    from ml.api.staging import STAGING_DIR
+
+    return [
+        # Результаты VLM и события конвейера: нужны, пока пользователь работает с задачей
+        Retention("results", RESULTS_DIR, delete_after=14),
+        Retention("recipes", RECIPES_DIR, compress_after=3, delete_after=60),
+        Retention("staging", STAGING_DIR, delete_after=3, max_bytes=5 * 1024 ** 3),
+        Retention("speculative", SPECULATIVE_DIR, delete_after=2, exclude=("budget.json", "budget.lock")),
+        Retention("traces", TRACE_DIR, delete_after=7),
+        # Старая раскладка фото до staging — только дочищается
+        Retention("processed_images", "./data/processed_images", delete_after=7, sharded=False),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Уборка и объём хранилища ML-сервиса")
+    parser.add_argument("command", choices=("sweep", "usage"))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    janitor = Janitor(default_policies())
+    stats = janitor.sweep() if args.command == "sweep" else janitor.usage()
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
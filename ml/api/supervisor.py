@@ -0,0 +1,263 @@
+"""
+Супервизор пула воркеров VLM — запускается отдельно от API:
+
+    python -m ml.api.supervisor --min-workers 1 --max-workers 4
+
+Держит от min до max процессов ml.api.worker, перезапускает упавшие (с нарастающей паузой),
+подбирает их число по объёму работы и при SIGTERM/SIGINT останавливает воркеры мягко:
+каждый дорабатывает начатые задачи и возвращает в очередь остальные.
+
+Объём работы — готовые сообщения ingredient_queue плюс взятые воркерами и ещё не подтверждённые
+(ждут слота в планировщике или в работе; по метрикам воркеров). Пассивный declare видит только
+готовые, а воркер с prefetch WORKER_PREFETCH забирает почти всю очередь себе — ограничивать
+prefetch нельзя: планировщику воркера (справедливая очередь по пользователям и полосам) нужно,
+из чего выбирать.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import signal
+import sys
+import time
+import urllib.request
+
+import aio_pika
+from prometheus_client.parser import text_string_to_metric_families
+
+from ml.api.dead_letter import QUEUE_NAME, RABBITMQ_URL
+from ml.api.metrics import SUPERVISOR_RESTARTS, SUPERVISOR_WORKERS, WORKER_METRICS_PORT, start_worker_exporter
+
+SUPERVISOR_METRICS_PORT = int(os.getenv("SUPERVISOR_METRICS_PORT", 9100))
+
+MIN_WORKERS = int(os.getenv("SUPERVISOR_MIN_WORKERS", 1))
+MAX_WORKERS = int(os.getenv("SUPERVISOR_MAX_WORKERS", os.cpu_count() or 1))
+# Сколько сообщений в очереди допустимо на одного воркера, прежде чем добавить ещё
+TASKS_PER_WORKER = int(os.getenv("SUPERVISOR_TASKS_PER_WORKER", 4))
+# Метрики воркера, в которых видны взятые им, но не подтверждённые сообщения
+HELD_METRICS = ("ml_worker_scheduler_pending", "ml_worker_tasks_in_progress")
+METRICS_TIMEOUT = 2
+CHECK_INTERVAL = float(os.getenv("SUPERVISOR_CHECK_INTERVAL", 5))
+# Уменьшаем пул не чаще, чем раз в SCALE_DOWN_COOLDOWN секунд — чтобы не дёргать воркеры на всплесках
+SCALE_DOWN_COOLDOWN = float(os.getenv("SUPERVISOR_SCALE_DOWN_COOLDOWN", 120))
+# Воркер ждёт начатые задачи WORKER_DRAIN_TIMEOUT; супервизор даёт ему чуть больше
+STOP_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", 300)) + 30
+MAX_RESTART_DELAY = 60
+# Воркер, проживший столько секунд, считается здоровым: пауза перед перезапуском сбрасывается
+HEALTHY_UPTIME = 60
+
+
+def desired_workers(queue_depth: int, min_workers: int, max_workers: int,
+                    tasks_per_worker: int = TASKS_PER_WORKER) -> int:
+    """Число воркеров под объём работы: готовые сообщения плюс взятые воркерами"""
+    needed = math.ceil(queue_depth / max(1, tasks_per_worker))
+    return max(min_workers, min(max_workers, needed))
+
+
+def held_by_worker(metrics_text: str) -> int:
+    """Сообщения, которые воркер взял из очереди и ещё не подтвердил — по его экспортеру метрик"""
+    held = 0.0
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name in HELD_METRICS:
+            held += sum(sample.value for sample in family.samples)
+    return int(held)
+
+
+class WorkerSlot:
+    """Слот пула: номер (от него зависит порт метрик), процесс и история падений"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: asyncio.subprocess.Process | None = None
+        self.crashes = 0
+        self.restart_at = 0.0
+        self.started_at = 0.0
+        self.stopping = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def metrics_port(self) -> int:
+        return WORKER_METRICS_PORT + self.index
+
+    async def start(self):
+        env = dict(os.environ)
+        # У каждого воркера свой порт экспортера метрик
+        env["WORKER_METRICS_PORT"] = str(self.metrics_port)
+        self.process = await asyncio.create_subprocess_exec(sys.executable, "-m", "ml.api.worker", env=env)
+        self.started_at = time.monotonic()
+        self.stopping = False
+        logging.info(f"Воркер #{self.index} запущен (pid {self.process.pid})")
+
+    async def stop(self, timeout: float = STOP_TIMEOUT):
+        """SIGTERM -> воркер дорабатывает начатые задачи; по таймауту — SIGKILL"""
+        if not self.alive:
+            return
+        self.stopping = True
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Воркер #{self.index} не остановился за {timeout} с — SIGKILL")
+            self.process.kill()
+            await self.process.wait()
+        logging.info(f"Воркер #{self.index} остановлен (код {self.process.returncode})")
+
+
+class Supervisor:
+    def __init__(self, min_workers: int = MIN_WORKERS, max_workers: int = MAX_WORKERS,
+                 tasks_per_worker: int = TASKS_PER_WORKER, autoscale: bool = True):
+        self.min_workers = max(0, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.tasks_per_worker = tasks_per_worker
+        self.autoscale = autoscale
+        self.slots: list[WorkerSlot] = []
+        # Слоты, снятые при уменьшении пула и ещё дорабатывающие задачи
+        self.draining: dict[int, asyncio.Task] = {}
+        self.target = self.min_workers
+        self.last_scale_down = 0.0
+        self._stop = asyncio.Event()
+        self._connection = None
+
+    async def queue_depth(self):
+        """Глубина очереди пассивным declare; None, если RabbitMQ недоступен"""
+        try:
+            if self._connection is None or self._connection.is_closed:
+                self._connection = await aio_pika.connect_robust(RABBITMQ_URL)
+            channel = await self._connection.channel()
+            try:
+                queue = await channel.declare_queue(QUEUE_NAME, durable=True, passive=True)
+                return queue.declaration_result.message_count
+            finally:
+                await channel.close()
+        except Exception as e:
+            logging.warning(f"Не удалось получить глубину очереди: {e}")
+            return None
+
+    async def held_messages(self) -> int:
+        """Сообщения, взятые живыми воркерами без подтверждения; воркер без ответа метрик не учитывается"""
+        def scrape(port: int) -> int:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=METRICS_TIMEOUT) as response:
+                    return held_by_worker(response.read().decode("utf-8"))
+            except (OSError, ValueError):
+                return 0
+
+        ports = [slot.metrics_port for slot in self.slots if slot.alive]
+        return sum(await asyncio.gather(*(asyncio.to_thread(scrape, port) for port in ports)))
+
+    async def rescale(self):
+        if not self.autoscale:
+            return
+        ready = await self.queue_depth()
+        if ready is None:
+            return
+        depth = ready + await self.held_messages()
+
+        target = desired_workers(depth, self.min_workers, self.max_workers, self.tasks_per_worker)
+        now = time.monotonic()
+        if target < self.target and now - self.last_scale_down < SCALE_DOWN_COOLDOWN:
+            return
+        if target != self.target:
+            logging.info(f"Очередь {depth} сообщений: воркеров {self.target} -> {target}")
+            if target < self.target:
+                self.last_scale_down = now
+            self.target = target
+
+    async def reconcile(self):
+        """Приводит пул к self.target и перезапускает упавшие воркеры"""
+        now = time.monotonic()
+
+        while len(self.slots) < self.target:
+            slot = WorkerSlot(self._free_index())
+            self.slots.append(slot)
+            await slot.start()
+
+        # Лишние слоты останавливаем с конца — в фоне, чтобы не ждать их задач
+        while len(self.slots) > self.target:
+            slot = self.slots.pop()
+            task = asyncio.create_task(slot.stop())
+            self.draining[slot.index] = task
+            task.add_done_callback(lambda _, index=slot.index: self.draining.pop(index, None))
+
+        for slot in self.slots:
+            if slot.alive or slot.stopping:
+                continue
+            if slot.restart_at == 0.0:
+                # Только что обнаружили падение: пауза растёт 1, 2, 4... до MAX_RESTART_DELAY
+                slot.crashes += 1
+                delay = min(MAX_RESTART_DELAY, 2 ** (slot.crashes - 1))
+                slot.restart_at = now + delay
+                SUPERVISOR_RESTARTS.inc()
+                logging.warning(
+                    f"Воркер #{slot.index} завершился с кодом {slot.process.returncode}, "
+                    f"перезапуск через {delay} с"
+                )
+            elif now >= slot.restart_at:
+                slot.restart_at = 0.0
+                await slot.start()
+
+        SUPERVISOR_WORKERS.set(sum(1 for slot in self.slots if slot.alive))
+
+    def _free_index(self) -> int:
+        """Наименьший номер, не занятый ни рабочим, ни останавливающимся воркером (порт метрик)"""
+        used = {slot.index for slot in self.slots} | set(self.draining)
+        index = 0
+        while index in used:
+            index += 1
+        return index
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except NotImplementedError:  # Windows
+                pass
+
+        logging.info(
+            f"Супервизор запущен: воркеров {self.min_workers}..{self.max_workers}, "
+            f"{self.tasks_per_worker} сообщений на воркер"
+        )
+        while not self._stop.is_set():
+            await self.rescale()
+            await self.reconcile()
+            for slot in self.slots:
+                if slot.alive and time.monotonic() - slot.started_at > HEALTHY_UPTIME:
+                    slot.crashes = 0
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        await self.shutdown()
+
+    async def shutdown(self):
+        logging.info("Остановка пула: воркеры дорабатывают начатые задачи...")
+        await asyncio.gather(*(slot.stop() for slot in self.slots), *self.draining.values())
+        if self._connection is not None:
+            await self._connection.close()
+        SUPERVISOR_WORKERS.set(0)
+        logging.info("Пул остановлен")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Супервизор пула воркеров VLM")
+    parser.add_argument("--min-workers", type=int, default=MIN_WORKERS)
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--tasks-per-worker", type=int, default=TASKS_PER_WORKER)
+    parser.add_argument("--no-autoscale", action="store_true", help="Держать ровно --min-workers воркеров")
+    args = parser.parse_args()
+
+    start_worker_exporter(SUPERVISOR_METRICS_PORT)
+
+    supervisor = Supervisor(args.min_workers, args.max_workers, args.tasks_per_worker, not args.no_autoscale)
+    asyncio.run(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,7 @@ import json
 import os
 import time
 from ml.models.baseline import LLaVAVision
-
-def compute_precision_recall_f1(predicted, reference):
-    predicted_set = set([p.lower() for p in predicted])
-    reference_set = set([r.lower() for r in reference])
-
-    tp = len(predicted_set & reference_set)
-    fp = len(predicted_set - reference_set)
-    fn = len(reference_set - predicted_set)
-
-    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
-    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
-    f1 = (2 * precision * recall / (precision + recall)) if (precision + recall) > 0 else 0.0
-
-    return f1
-
-def compute_excess(predicted, reference):
-    reference_set = set([r.lower() for r in reference])
-    predicted_set = set([p.lower() for p in predicted])
-    excess = predicted_set - reference_set
-    excess_ratio = len(excess) / len(predicted_set) if predicted_set else 0.0
-    return excess_ratio
+from ml.metrics.vlm_metrics import compute_excess, compute_f1, score_cases, summarize_scores
 
 def evaluate_vlm(eval_file="ml/evaluation/vlm_eval_cases.json", report_file="report.txt"):
     with open(eval_file, "r", encoding="utf-8") as f:
@@ -31,7 +11,6 @@ def evaluate_vlm(eval_file="ml/evaluation/vlm_eval_cases.json", report_file="rep
     vlm = LLaVAVision()
 
     results = []
-    f1_scores, excess_scores = [], []
 
     for idx, case in enumerate(eval_cases, start=1):
         image_path = case["image_path"]
@@ -50,14 +29,11 @@ def evaluate_vlm(eval_file="ml/evaluation/vlm_eval_cases.json", report_file="rep
 
         print(f"   Распознанные ингредиенты: {predicted}")
 
-        f1 = compute_precision_recall_f1(predicted, reference)
+        f1 = compute_f1(predicted, reference)
         excess = compute_excess(predicted, reference)
 
         print(f"   F1: {f1:.3f}, Excess: {excess:.3f}, Latency: {latency:.2f} сек")
 
-        f1_scores.append(f1)
-        excess_scores.append(excess)
-
         results.append({
             "id": idx,
             "image": os.path.basename(image_path),
@@ -67,8 +43,10 @@ def evaluate_vlm(eval_file="ml/evaluation/vlm_eval_cases.json", report_file="rep
             "Excess": round(excess, 3)
         })
 
-    avg_f1 = round(sum(f1_scores) / len(f1_scores), 3)
-    avg_excess = round(sum(excess_scores) / len(excess_scores), 3)
+    # Сводка по всему прогону одним проходом, с бутстрэп-интервалами
+    summary = summarize_scores(score_cases([r["predicted"] for r in results], [r["reference"] for r in results]))
+    avg_f1 = round(summary["f1"]["mean"], 3)
+    avg_excess = round(summary["excess"]["mean"], 3)
 
     # Формируем текстовый отчёт
     lines = []
@@ -85,8 +63,10 @@ def evaluate_vlm(eval_file="ml/evaluation/vlm_eval_cases.json", report_file="rep
         lines.append("")
 
     lines.append("📊 Сводка по всем тестам")
-    lines.append(f"  Средний F1: {avg_f1}")
-    lines.append(f"  Средний Excess: {avg_excess}")
+    lines.append(f"  Средний F1: {avg_f1} (95% ДИ {summary['f1']['ci_low']:.3f}–{summary['f1']['ci_high']:.3f})")
+    lines.append(f"  Средний Excess: {avg_excess} "
+                 f"(95% ДИ {summary['excess']['ci_low']:.3f}–{summary['excess']['ci_high']:.3f})")
+    lines.append(f"  Precision / Recall: {summary['precision']['mean']:.3f} / {summary['recall']['mean']:.3f}")
 
     # Сохраняем в файл
     with open(report_file, "w", encoding="utf-8") as f:
@@ -95,7 +75,8 @@ def evaluate_vlm(eval_file="ml/evaluation/vlm_eval_cases.json", report_file="rep
     return {
         "results": results,
         "avg_f1": avg_f1,
-        "avg_excess": avg_excess
+        "avg_excess": avg_excess,
+        "summary": summary
     }
 
 if __name__ == "__main__":
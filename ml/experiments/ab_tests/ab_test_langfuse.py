@@ -6,67 +6,50 @@ import re
 import asyncio
 import requests
 from dotenv import load_dotenv
-from langfuse.langchain import CallbackHandler
+from functools import lru_cache
 from langchain_core.runnables import Runnable, RunnableSequence
-from transformers import AutoTokenizer
-from langfuse import Langfuse
 
-# --- Загрузка окружения и инициализация Langfuse + токенайзера ---
+from ml.experiments.assignment import assign_variant
+from ml.metrics.vlm_metrics import compute_excess, compute_f1
+from ml.tracing.exporter import LangfuseEventExporter, apply_langfuse_batch_defaults
+from ml.tracing.tokens import usage_and_cost as _usage_and_cost
+
+# --- Загрузка окружения; клиенты Langfuse и токенайзер создаются при первом обращении ---
 load_dotenv()
-lf = Langfuse(
-    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-    host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-)
-langfuse_handler = CallbackHandler()
-tokenizer = AutoTokenizer.from_pretrained("mistralai/Mistral-7B-Instruct-v0.2")
+
+
+@lru_cache(maxsize=1)
+def get_langfuse():
+    apply_langfuse_batch_defaults()
+    from langfuse import Langfuse
+    return Langfuse(
+        public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+        secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+        host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
+    )
+
+
+@lru_cache(maxsize=1)
+def get_langfuse_handler():
+    apply_langfuse_batch_defaults()
+    from langfuse.langchain import CallbackHandler
+    return CallbackHandler()
+
+
+@lru_cache(maxsize=1)
+def get_exporter():
+    # События уходят в Langfuse пачками из фонового потока; не отправленные — в lf_log_debug.jsonl
+    return LangfuseEventExporter(get_langfuse, debug_path="lf_log_debug.jsonl")
 
 # --- Константы для Mistral проверки LLM ---
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 MISTRAL_URL = "https://api.mistral.ai/v1/chat/completions"
 MISTRAL_MODEL = "mistral-small"
 
-# --- Утилита нормализации текста ингредиентов ---
-def normalize(text):
-    return re.sub(r"\s+", " ", str(text).strip().lower())
-
-# --- Подсчёт токенов и стоимости ---
-def count_tokens_and_cost(prompt: str, output: str, model: str = "mistral-small"):
-    input_tokens = len(tokenizer.encode(prompt))
-    output_tokens = len(tokenizer.encode(output))
-    total_tokens = input_tokens + output_tokens
-
+# --- Токены и стоимость вызова LLM ---
+def usage_and_cost(call: dict, model: str = "mistral-small"):
     # Примерные цены-фикстуры (замени на реальные при необходимости)
-    price_per_input = 0.25 / 1_000_000
-    price_per_output = 0.25 / 1_000_000
-    cost = input_tokens * price_per_input + output_tokens * price_per_output
-
-    return {
-        "input_tokens": input_tokens,
-        "output_tokens": output_tokens,
-        "total_tokens": total_tokens,
-    }, cost
-
-# --- Метрики VLM ---
-def compute_f1(predicted, reference):
-    predicted_set = set(normalize(p) for p in predicted if p)
-    reference_set = set(normalize(r) for r in reference if r)
-
-    tp = len(predicted_set & reference_set)
-    fp = len(predicted_set - reference_set)
-    fn = len(reference_set - predicted_set)
-
-    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
-    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
-    f1 = (2 * precision * recall / (precision + recall)) if (precision + recall) > 0 else 0.0
-    return f1
-
-def compute_excess(predicted, reference):
-    predicted_set = set(normalize(p) for p in predicted if p)
-    reference_set = set(normalize(r) for r in reference if r)
-    excess = predicted_set - reference_set
-    excess_ratio = len(excess) / len(predicted_set) if predicted_set else 0.0
-    return excess_ratio
+    return _usage_and_cost([call], price_per_input=0.25 / 1_000_000, price_per_output=0.25 / 1_000_000)[0]
 
 # --- Утилиты очистки вывода Mistral + ретраи ---
 def clean_mistral_output(output: str) -> str:
@@ -174,11 +157,12 @@ def check_with_mistral(recipes, dietary, preferred_difficulty, preferred_time, p
     }
 
 # --- Варианты A/B ---
-def pick_vlm_variant():
-    return random.choice(["vlm_prompt_a", "vlm_prompt_b"])
+# Вариант закреплён за пользователем (или изображением, если пользователя нет): sha256 от id, без хранения
+def pick_vlm_variant(unit_id=None):
+    return assign_variant("vlm_prompt", unit_id, ["vlm_prompt_a", "vlm_prompt_b"])
 
-def pick_llm_variant():
-    return random.choice(["llm_prompt_a", "llm_prompt_b"])
+def pick_llm_variant(unit_id=None):
+    return assign_variant("llm_prompt", unit_id, ["llm_prompt_a", "llm_prompt_b"])
 
 # --- Адаптер для VLM ---
 class VLMRunnable(Runnable):
@@ -189,7 +173,7 @@ class VLMRunnable(Runnable):
         start = time.time()
         image_path = inputs["image_path"]
 
-        variant = pick_vlm_variant()
+        variant = pick_vlm_variant(inputs.get("user_id") or image_path)
         try:
             prompt_text = self.vlm.build_prompt(image_path)
         except Exception:
@@ -214,26 +198,17 @@ class VLMRunnable(Runnable):
             "excess_ratio": float(excess_ratio)
         }
 
-        try:
-            lf.log_event(
-                name="vlm_infer",
-                input={"image_path": image_path, "prompt": prompt_text},
-                output={"ingredients": result.get("ingredients", [])},
-                metadata={"variant": variant},
-                metrics=metrics_payload
-            )
-        except Exception as e:
-            print("DEBUG: vlm lf.log_event failed:", repr(e))
-            with open("lf_vlm_log_debug.jsonl", "a", encoding="utf-8") as fh:
-                fh.write(json.dumps({
-                    "time": time.time(),
-                    "variant": variant,
-                    "metrics": metrics_payload,
-                    "error": repr(e)
-                }, ensure_ascii=False) + "\n")
+        get_exporter().log_event(
+            name="vlm_infer",
+            input={"image_path": image_path, "prompt": prompt_text},
+            output={"ingredients": result.get("ingredients", [])},
+            metadata={"variant": variant},
+            metrics=metrics_payload
+        )
 
         return {
             "vlm_variant": variant,
+            "user_id": inputs.get("user_id"),
             "input": {
                 "image_path": image_path,
                 "prompt": prompt_text
@@ -252,16 +227,18 @@ class VLMRunnable(Runnable):
             }
         }
 
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        # infer синхронный (requests) — уводим в поток, чтобы не блокировать цикл событий
+        return await asyncio.to_thread(self.invoke, inputs, config)
+
 # --- Адаптер для LLM ---
 class LLMRunnable(Runnable):
     def __init__(self, llm):
         self.llm = llm
 
-    def invoke(self, inputs, config=None):
-        start = time.time()
-
+    def _prepare(self, inputs):
         # Выбираем вариант промпта (A/B)
-        llm_variant = pick_llm_variant()
+        llm_variant = pick_llm_variant(inputs.get("user_id") or inputs["input"]["image_path"])
         prompt_variant = inputs.get("vlm_variant")
 
         # Метрики VLM
@@ -289,18 +266,38 @@ class LLMRunnable(Runnable):
         except Exception:
             prompt_text = "Составь рецепт на основе ингредиентов."
 
-        # Генерация рецепта
+        return llm_variant, llm_input, prompt_text
+
+    def invoke(self, inputs, config=None):
+        start = time.time()
+        llm_variant, llm_input, prompt_text = self._prepare(inputs)
+
+        # Генерация рецепта; клиент httpx привязан к циклу событий, а asyncio.run каждый раз создаёт новый
         async def _call_mistral():
             await self.llm.init_client()
             try:
-                return await self.llm.generate_recipe(prompt=prompt_text, ingredients=llm_input["ingredients"])
+                return await self.llm.generate_recipe_with_usage(prompt=prompt_text, ingredients=llm_input["ingredients"])
             finally:
                 await self.llm.close_client()
 
-        response = asyncio.run(_call_mistral())
+        response, call = asyncio.run(_call_mistral())
+        return self._finish(inputs, start, llm_variant, llm_input, response, call)
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        start = time.time()
+        llm_variant, llm_input, prompt_text = self._prepare(inputs)
+
+        # Общий долгоживущий клиент llm: создаётся при первом вызове, закрывает его вызывающий (acook_from_images)
+        response, call = await self.llm.generate_recipe_with_usage(prompt=prompt_text, ingredients=llm_input["ingredients"])
+        # Проверка предпочтений (check_with_mistral) синхронная
+        return await asyncio.to_thread(self._finish, inputs, start, llm_variant, llm_input, response, call)
+
+    def _finish(self, inputs, start, llm_variant, llm_input, response, call):
         recipe = response[0] if isinstance(response, list) and response else response
+        f1 = llm_input["vlm_f1"]
+        excess_ratio = llm_input["vlm_excess_ratio"]
 
-        usage, cost = count_tokens_and_cost(prompt_text, str(recipe))
+        usage, cost = usage_and_cost(call)
         duration = round(time.time() - start, 2)
 
         # Проверка предпочтений
@@ -335,27 +332,24 @@ class LLMRunnable(Runnable):
                 calories_ok = check_result.get("calories_ok", False)
                 check_error = None
 
-        # Логируем событие в Langfuse
-        try:
-            lf.log_event(
-                name="llm_generate_recipe",
-                input=llm_input,
-                output={"recipe": recipe},
-                metadata={"variant": llm_variant},
-                metrics={
-                    "duration_sec": float(duration),
-                    "tokens": float(usage["total_tokens"]),
-                    "cost": float(cost),
-                    "dietary_ok": bool(dietary_ok),
-                    "difficulty_ok": bool(difficulty_ok),
-                    "time_ok": bool(time_ok),
-                    "calories_ok": bool(calories_ok),
-                    "vlm_f1": float(f1) if isinstance(f1, (int, float)) else None,
-                    "vlm_excess_ratio": float(excess_ratio) if isinstance(excess_ratio, (int, float)) else None
-                }
-            )
-        except Exception as e:
-            print("DEBUG: llm lf.log_event failed:", repr(e))
+        # Логируем событие в Langfuse (в фоне, без ожидания)
+        get_exporter().log_event(
+            name="llm_generate_recipe",
+            input=llm_input,
+            output={"recipe": recipe},
+            metadata={"variant": llm_variant},
+            metrics={
+                "duration_sec": float(duration),
+                "tokens": float(usage["total_tokens"]),
+                "cost": float(cost),
+                "dietary_ok": bool(dietary_ok),
+                "difficulty_ok": bool(difficulty_ok),
+                "time_ok": bool(time_ok),
+                "calories_ok": bool(calories_ok),
+                "vlm_f1": float(f1) if isinstance(f1, (int, float)) else None,
+                "vlm_excess_ratio": float(excess_ratio) if isinstance(excess_ratio, (int, float)) else None
+            }
+        )
 
         return {
             "llm_variant": llm_variant,
@@ -365,6 +359,7 @@ class LLMRunnable(Runnable):
             "vlm_duration_sec": inputs.get("vlm_duration_sec"),  # ← добавлено
             "usage": usage,
             "cost": cost,
+            "llm_call": {"model": call["model"], "latency_sec": call["latency_sec"]},
             "llm_checks": {
                 "dietary_ok": dietary_ok,
                 "difficulty_ok": difficulty_ok,
@@ -376,6 +371,36 @@ class LLMRunnable(Runnable):
 
 
 # --- Основная функция ---
+def build_chain(vlm, llm):
+    vlm_runnable = VLMRunnable(vlm).with_config(run_name="vlm_infer")
+    llm_runnable = LLMRunnable(llm).with_config(run_name="llm_generate_recipe")
+    return RunnableSequence(first=vlm_runnable, last=llm_runnable).with_config(run_name="cook_from_image")
+
+
+def build_inputs(
+    image_path,
+    dietary=None,
+    feedback=None,
+    preferred_calorie_level=None,
+    preferred_cooking_time=None,
+    preferred_difficulty=None,
+    existing_recipes=None,
+    reference_ingredients=None,
+    user_id=None
+):
+    return {
+        "image_path": image_path,
+        "user_id": user_id,
+        "dietary": dietary,
+        "feedback": feedback,
+        "preferred_calorie_level": preferred_calorie_level,
+        "preferred_cooking_time": preferred_cooking_time,
+        "preferred_difficulty": preferred_difficulty,
+        "existing_recipes": existing_recipes,
+        "reference_ingredients": reference_ingredients or []
+    }
+
+
 def cook_from_image(
     image_path,
     vlm,
@@ -386,25 +411,52 @@ def cook_from_image(
     preferred_cooking_time=None,
     preferred_difficulty=None,
     existing_recipes=None,
-    reference_ingredients=None  # для VLM метрик
+    reference_ingredients=None,  # для VLM метрик
+    user_id=None  # закрепляет варианты A/B; без него — по изображению
 ):
-    vlm_runnable = VLMRunnable(vlm).with_config(run_name="vlm_infer")
-    llm_runnable = LLMRunnable(llm).with_config(run_name="llm_generate_recipe")
-
-    chain = RunnableSequence(first=vlm_runnable, last=llm_runnable).with_config(run_name="cook_from_image")
+    chain = build_chain(vlm, llm)
 
     result = chain.invoke(
-        {
-            "image_path": image_path,
-            "dietary": dietary,
-            "feedback": feedback,
-            "preferred_calorie_level": preferred_calorie_level,
-            "preferred_cooking_time": preferred_cooking_time,
-            "preferred_difficulty": preferred_difficulty,
-            "existing_recipes": existing_recipes,
-            "reference_ingredients": reference_ingredients or []
-        },
-        config={"callbacks": [langfuse_handler]}
+        build_inputs(
+            image_path,
+            dietary=dietary,
+            feedback=feedback,
+            preferred_calorie_level=preferred_calorie_level,
+            preferred_cooking_time=preferred_cooking_time,
+            preferred_difficulty=preferred_difficulty,
+            existing_recipes=existing_recipes,
+            reference_ingredients=reference_ingredients,
+            user_id=user_id
+        ),
+        config={"callbacks": [get_langfuse_handler()]}
     )
 
     return result
+
+
+async def acook_from_images(inputs_list, vlm, llm, max_concurrency: int = 4, return_exceptions: bool = False):
+    """
+    Асинхронный прогон цепочки по многим изображениям: inputs_list — словари из build_inputs.
+    Каждое изображение проходит VLM -> LLM независимо (без ожидания всей пачки на каждом шаге),
+    одновременно — не больше max_concurrency. Все вызовы Mistral идут через один клиент llm,
+    который закрывается в конце.
+    """
+    chain = build_chain(vlm, llm)
+    config = {"callbacks": [get_langfuse_handler()]}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(inputs):
+        async with semaphore:
+            return await chain.ainvoke(inputs, config=config)
+
+    await llm.init_client()
+    try:
+        return await asyncio.gather(*(run_one(inputs) for inputs in inputs_list),
+                                    return_exceptions=return_exceptions)
+    finally:
+        await llm.close_client()
+
+
+async def acook_from_image(image_path, vlm, llm, **kwargs):
+    results = await acook_from_images([build_inputs(image_path, **kwargs)], vlm, llm)
+    return results[0]
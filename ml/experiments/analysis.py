@@ -1,92 +1,67 @@
+import argparse
 import json
 
-# Загружаем файл
-with open("ab_test_results_calories_fixed.txt", "r", encoding="utf-8") as f:
-    rows = [json.loads(line) for line in f if line.strip()]
+from ml.experiments.sequential import DEFAULT_ALPHA, ABAggregator, aggregate_file
 
-# --- VLM ---
-vlm_a = [r for r in rows if r["prompt_variant"] == "vlm_prompt_a"]
-vlm_b = [r for r in rows if r["prompt_variant"] == "vlm_prompt_b"]
-
-avg_f1_a = sum(r["vlm_f1"] for r in vlm_a) / len(vlm_a)
-avg_f1_b = sum(r["vlm_f1"] for r in vlm_b) / len(vlm_b)
-
-avg_excess_a = sum(r["vlm_excess_ratio"] for r in vlm_a) / len(vlm_a)
-avg_excess_b = sum(r["vlm_excess_ratio"] for r in vlm_b) / len(vlm_b)
-
-avg_delay_a = sum(r["vlm_duration_sec"] for r in vlm_a) / len(vlm_a)
-avg_delay_b = sum(r["vlm_duration_sec"] for r in vlm_b) / len(vlm_b)
-
-# --- LLM ---
-llm_a = [r for r in rows if r["llm_variant"] == "llm_prompt_a"]
-llm_b = [r for r in rows if r["llm_variant"] == "llm_prompt_b"]
-
-# фильтруем короткие ответы и минимальную цену
-llm_a_filtered = [r for r in llm_a if r["tokens"] != 80 and r["cost"] != 0.00002]
-llm_b_filtered = [r for r in llm_b if r["tokens"] != 80 and r["cost"] != 0.00002]
+# Поле сводки -> (метрика агрегатора, множитель)
+VLM_FIELDS = {
+    "avg_f1": ("vlm_f1", 1),
+    "avg_excess_ratio": ("vlm_excess_ratio", 1),
+    "avg_delay_sec": ("vlm_duration_sec", 1),
+}
+LLM_FIELDS = {
+    "avg_tokens": ("tokens", 1),
+    "avg_cost": ("cost", 1),
+    "avg_duration_sec": ("duration_sec", 1),
+    # проценты true для каждого флага
+    "perc_dietary_ok": ("dietary_ok", 100),
+    "perc_difficulty_ok": ("difficulty_ok", 100),
+    "perc_time_ok": ("time_ok", 100),
+    "perc_calories_ok": ("calories_ok", 100),
+}
 
-avg_tokens_a = sum(r["tokens"] for r in llm_a_filtered) / len(llm_a_filtered)
-avg_tokens_b = sum(r["tokens"] for r in llm_b_filtered) / len(llm_b_filtered)
 
-avg_cost_a = sum(r["cost"] for r in llm_a_filtered) / len(llm_a_filtered)
-avg_cost_b = sum(r["cost"] for r in llm_b_filtered) / len(llm_b_filtered)
+def build_results(summary: dict) -> dict:
+    results = {}
+    for fields, variants in ((VLM_FIELDS, ("vlm_prompt_a", "vlm_prompt_b")),
+                             (LLM_FIELDS, ("llm_prompt_a", "llm_prompt_b"))):
+        for variant in variants:
+            section = {}
+            for field, (metric, scale) in fields.items():
+                mean = summary[metric]["variants"].get(variant, {}).get("mean")
+                section[field] = mean * scale if mean is not None else None
+            results[variant] = section
+
+    # Последовательный тест: p-value корректен при любом числе промежуточных проверок
+    results["sequential"] = {
+        metric: {k: entry.get(k) for k in ("diff", "p_value", "significant", "winner", "stopped_at_rows")}
+        for metric, entry in summary.items()
+        if "p_value" in entry
+    }
+    return results
 
-avg_duration_a = sum(r["duration_sec"] for r in llm_a_filtered) / len(llm_a_filtered)
-avg_duration_b = sum(r["duration_sec"] for r in llm_b_filtered) / len(llm_b_filtered)
 
-# проценты true для каждого флага
-def percent_true(group, key):
-    return sum(1 for r in group if r[key]) / len(group) * 100
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Анализ результатов A/B (потоково, постоянная память)")
+    parser.add_argument("path", nargs="?", default="ab_test_results_calories_fixed.txt")
+    parser.add_argument("--output", default="analysis_results.txt")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    args = parser.parse_args(argv)
 
-perc_dietary_a = percent_true(llm_a, "dietary_ok")
-perc_difficulty_a = percent_true(llm_a, "difficulty_ok")
-perc_time_a = percent_true(llm_a, "time_ok")
-perc_calories_a = percent_true(llm_a, "calories_ok")
+    aggregator = aggregate_file(args.path, ABAggregator(alpha=args.alpha, check_every=100))
+    results = build_results(aggregator.summary())
 
-perc_dietary_b = percent_true(llm_b, "dietary_ok")
-perc_difficulty_b = percent_true(llm_b, "difficulty_ok")
-perc_time_b = percent_true(llm_b, "time_ok")
-perc_calories_b = percent_true(llm_b, "calories_ok")
+    # Печать в консоль
+    print(json.dumps(results, indent=2, ensure_ascii=False))
 
-# --- Итог ---
-results = {
-    "vlm_prompt_a": {
-        "avg_f1": avg_f1_a,
-        "avg_excess_ratio": avg_excess_a,
-        "avg_delay_sec": avg_delay_a
-    },
-    "vlm_prompt_b": {
-        "avg_f1": avg_f1_b,
-        "avg_excess_ratio": avg_excess_b,
-        "avg_delay_sec": avg_delay_b
-    },
-    "llm_prompt_a": {
-        "avg_tokens": avg_tokens_a,
-        "avg_cost": avg_cost_a,
-        "avg_duration_sec": avg_duration_a,
-        "perc_dietary_ok": perc_dietary_a,
-        "perc_difficulty_ok": perc_difficulty_a,
-        "perc_time_ok": perc_time_a,
-        "perc_calories_ok": perc_calories_a
-    },
-    "llm_prompt_b": {
-        "avg_tokens": avg_tokens_b,
-        "avg_cost": avg_cost_b,
-        "avg_duration_sec": avg_duration_b,
-        "perc_dietary_ok": perc_dietary_b,
-        "perc_difficulty_ok": perc_difficulty_b,
-        "perc_time_ok": perc_time_b,
-        "perc_calories_ok": perc_calories_b
-    }
-}
+    # Запись в TXT в более читаемом виде
+    with open(args.output, "w", encoding="utf-8") as out:
+        for section, metrics in results.items():
+            out.write(f"[{section}]\n")
+            for key, value in metrics.items():
+                out.write(f"{key}: {value}\n")
+            out.write("\n")
 
-# Печать в консоль
-print(json.dumps(results, indent=2, ensure_ascii=False))
 
-# Запись в TXT в более читаемом виде
-with open("analysis_results.txt", "w", encoding="utf-8") as out:
-    for section, metrics in results.items():
-        out.write(f"[{section}]\n")
-        for key, value in metrics.items():
-            out.write(f"{key}: {value}\n")
-        out.write("\n")
+if __name__ == "__main__":
+    main()
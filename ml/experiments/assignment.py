@@ -0,0 +1,31 @@
+"""
+Детерминированное распределение по вариантам A/B: один и тот же пользователь (или изображение)
+всегда попадает в один вариант эксперимента, без хранения назначений. Разные эксперименты
+хешируются со своей солью, поэтому назначения в них независимы.
+"""
+import hashlib
+import random
+
+
+def bucket(experiment: str, unit_id) -> float:
+    """Равномерное число в [0, 1) по паре (эксперимент, единица)"""
+    digest = hashlib.sha256(f"{experiment}:{unit_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def assign_variant(experiment: str, unit_id, variants, weights=None) -> str:
+    """
+    Вариант для unit_id (id пользователя, путь к изображению и т.п.); weights — доли вариантов.
+    Без unit_id назначение случайное, как раньше.
+    """
+    variants = list(variants)
+    if unit_id is None or unit_id == "":
+        return random.choices(variants, weights=weights)[0]
+
+    weights = list(weights) if weights else [1.0] * len(variants)
+    point = bucket(experiment, unit_id) * sum(weights)
+    for variant, weight in zip(variants, weights):
+        point -= weight
+        if point < 0:
+            return variant
+    return variants[-1]
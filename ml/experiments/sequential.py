@@ -0,0 +1,225 @@
+"""
+Потоковая агрегация результатов A/B и последовательная проверка значимости.
+
+По каждому варианту хранятся только достаточные статистики (n, среднее, M2 по Уэлфорду, min, max),
+поэтому память не зависит от числа строк. Значимость — mSPRT (смешанный последовательный тест
+отношения правдоподобия) для разности средних: p-value остаётся корректным при проверке после
+каждой строки, так что эксперимент можно остановить, как только решение принято, не дожидаясь
+заранее заданного объёма выборки.
+"""
+import json
+import math
+
+DEFAULT_ALPHA = 0.05
+# Минимум наблюдений в каждом варианте до первой проверки (нормальное приближение)
+DEFAULT_MIN_SAMPLES = 30
+# Масштаб ожидаемого эффекта для смеси mSPRT, в долях стандартного отклонения метрики
+DEFAULT_TAU = 0.25
+
+
+class RunningStats:
+    """Среднее и дисперсия за один проход (алгоритм Уэлфорда)"""
+
+    __slots__ = ("n", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "RunningStats"):
+        """Объединение статистик (например, посчитанных по частям файла)"""
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.n,
+            "mean": self.mean if self.n else None,
+            "std": math.sqrt(self.variance) if self.n > 1 else None,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+        }
+
+
+class Metric:
+    """
+    Метрика эксперимента: поле строки результата, поле с вариантом, направление (higher_is_better)
+    и необязательный фильтр строк
+    """
+
+    def __init__(self, name: str, variant_key: str, higher_is_better: bool = True, field: str = None,
+                 where=None):
+        self.name = name
+        self.field = field or name
+        self.variant_key = variant_key
+        self.higher_is_better = higher_is_better
+        self.where = where
+
+    def value(self, row: dict):
+        if self.where and not self.where(row):
+            return None
+        value = row.get(self.field)
+        if isinstance(value, bool):
+            return float(value)
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            return float(value)
+        return None
+
+
+def _llm_priced(row: dict) -> bool:
+    # Короткие ответы-заглушки (80 токенов по минимальной цене) искажают средние по токенам и стоимости
+    return row.get("tokens") != 80 and row.get("cost") != 0.00002
+
+
+# Метрики прогонов ml/experiments/test_langfuse.py
+AB_METRICS = [
+    Metric("vlm_f1", "prompt_variant", higher_is_better=True),
+    Metric("vlm_excess_ratio", "prompt_variant", higher_is_better=False),
+    Metric("vlm_duration_sec", "prompt_variant", higher_is_better=False),
+    Metric("tokens", "llm_variant", higher_is_better=False, where=_llm_priced),
+    Metric("cost", "llm_variant", higher_is_better=False, where=_llm_priced),
+    Metric("duration_sec", "llm_variant", higher_is_better=False, where=_llm_priced),
+    Metric("dietary_ok", "llm_variant", higher_is_better=True),
+    Metric("difficulty_ok", "llm_variant", higher_is_better=True),
+    Metric("time_ok", "llm_variant", higher_is_better=True),
+    Metric("calories_ok", "llm_variant", higher_is_better=True),
+]
+
+
+def msprt_likelihood_ratio(a: RunningStats, b: RunningStats, tau: float = DEFAULT_TAU) -> float:
+    """
+    Отношение правдоподобия mSPRT для H0: mean_a == mean_b при нормальной смеси N(0, tau^2 * sigma^2)
+    по разности средних (Johari et al., «Always valid inference»)
+    """
+    v = a.variance / a.n + b.variance / b.n
+    if v <= 0:
+        return 1.0
+    pooled = (a.variance + b.variance) / 2
+    tau2 = (tau ** 2) * pooled if pooled > 0 else tau ** 2
+    delta = b.mean - a.mean
+    log_ratio = 0.5 * math.log(v / (v + tau2)) + tau2 * delta * delta / (2 * v * (v + tau2))
+    return math.exp(min(log_ratio, 700.0))
+
+
+class SequentialTest:
+    """Всегда корректный p-value для одной метрики и пары вариантов"""
+
+    def __init__(self, alpha: float = DEFAULT_ALPHA, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 tau: float = DEFAULT_TAU):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.tau = tau
+        self.p_value = 1.0
+        self.looks = 0
+        self.stopped_at = None
+
+    def check(self, a: RunningStats, b: RunningStats) -> bool:
+        """Очередная проверка; True, если H0 отвергнута (p-value монотонно не растёт)"""
+        if a.n < self.min_samples or b.n < self.min_samples:
+            return False
+        self.looks += 1
+        self.p_value = min(self.p_value, 1.0 / msprt_likelihood_ratio(a, b, self.tau))
+        if self.p_value <= self.alpha and self.stopped_at is None:
+            self.stopped_at = a.n + b.n
+        return self.p_value <= self.alpha
+
+
+class ABAggregator:
+    """
+    Потоковая агрегация строк результатов: update(row) на каждую строку, summary() — в любой момент.
+    Последовательный тест проверяется каждые check_every строк.
+    """
+
+    def __init__(self, metrics=None, alpha: float = DEFAULT_ALPHA, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 tau: float = DEFAULT_TAU, check_every: int = 1):
+        self.metrics = list(metrics or AB_METRICS)
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.tau = tau
+        self.check_every = max(1, check_every)
+        self.rows = 0
+        self.stats = {m.name: {} for m in self.metrics}
+        self.tests = {m.name: SequentialTest(alpha, min_samples, tau) for m in self.metrics}
+
+    def update(self, row: dict):
+        self.rows += 1
+        for metric in self.metrics:
+            variant = row.get(metric.variant_key)
+            value = metric.value(row)
+            if variant is None or value is None:
+                continue
+            per_variant = self.stats[metric.name]
+            if variant not in per_variant:
+                per_variant[variant] = RunningStats()
+            per_variant[variant].update(value)
+        if self.rows % self.check_every == 0:
+            self.check()
+
+    def check(self):
+        for metric in self.metrics:
+            pair = self._pair(metric.name)
+            if pair:
+                self.tests[metric.name].check(*pair)
+
+    def decided(self, metric_name: str) -> bool:
+        return self.tests[metric_name].p_value <= self.alpha
+
+    def _pair(self, metric_name: str):
+        per_variant = self.stats[metric_name]
+        if len(per_variant) != 2:
+            return None
+        return tuple(per_variant[v] for v in sorted(per_variant))
+
+    def summary(self) -> dict:
+        result = {}
+        for metric in self.metrics:
+            per_variant = self.stats[metric.name]
+            entry = {"variants": {v: s.to_dict() for v, s in sorted(per_variant.items())}}
+            pair = self._pair(metric.name)
+            if pair:
+                (name_a, name_b), (a, b) = sorted(per_variant), pair
+                test = self.tests[metric.name]
+                entry.update({
+                    "diff": b.mean - a.mean,
+                    "p_value": test.p_value,
+                    "significant": test.p_value <= self.alpha,
+                    "stopped_at_rows": test.stopped_at,
+                })
+                if entry["significant"]:
+                    b_better = (b.mean > a.mean) == metric.higher_is_better
+                    entry["winner"] = name_b if b_better else name_a
+            result[metric.name] = entry
+        return result
+
+
+def aggregate_file(path: str, aggregator: ABAggregator = None) -> ABAggregator:
+    """Агрегация jsonl-файла построчно, без загрузки в память"""
+    aggregator = aggregator or ABAggregator(check_every=100)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                aggregator.update(json.loads(line))
+    aggregator.check()
+    return aggregator
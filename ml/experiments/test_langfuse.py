@@ -2,8 +2,10 @@ import time
 import json
 import csv
 import os
+import asyncio
 
-from ml.experiments.ab_test_langfuse import cook_from_image
+from ml.experiments.ab_test_langfuse import acook_from_images, build_inputs, cook_from_image, get_exporter
+from ml.experiments.sequential import ABAggregator
 from ml.service.baseline import LLaVAVision, MistralText
 
 # Инициализация моделей
@@ -19,8 +21,15 @@ def safe_float(value):
 def run_experiments(
     n_runs: int = 1,
     image_dir: str = "C:\\Users\\Наталья\\Desktop\\lab4-AiEngineer-infrastructure\\data\\processed_images",
-    reference_file: str = "C:\\Users\\Наталья\\Desktop\\lab4-AiEngineer-infrastructure\\ml\\experiments\\reference_ingredients.json"
+    reference_file: str = "C:\\Users\\Наталья\\Desktop\\lab4-AiEngineer-infrastructure\\ml\\experiments\\reference_ingredients.json",
+    max_concurrency: int = 1,
+    early_stop_metric: str = None
 ):
+    """
+    max_concurrency > 1 — прогоны идут параллельно через асинхронную цепочку с общим клиентом Mistral.
+    early_stop_metric (например, "vlm_f1") — последовательные прогоны прекращаются, как только
+    последовательный тест по этой метрике значим: оставшиеся платные вызовы не нужны.
+    """
     # Загружаем эталонные ингредиенты
     with open(reference_file, "r", encoding="utf-8") as f:
         reference_map = {
@@ -29,6 +38,7 @@ def run_experiments(
         }
 
     results = []
+    aggregator = ABAggregator()
 
     # Собираем список изображений
     image_files = [
@@ -41,58 +51,86 @@ def run_experiments(
         print("⚠️ В папке нет изображений")
         return
 
-    run_counter = 1
-    for i in range(n_runs):  # внешний цикл по числу прогонов
-        for image_path in image_files:  # внутренний цикл по картинкам
-            image_name = os.path.basename(image_path)
-            reference_ingredients = reference_map.get(image_name, [])
+    # внешний цикл по числу прогонов, внутренний — по картинкам
+    jobs = [
+        build_inputs(
+            image_path,
+            dietary="нет",
+            feedback="нет",
+            preferred_calorie_level="низкокалорийное",
+            preferred_cooking_time="быстро",
+            preferred_difficulty="легко",
+            existing_recipes="нет",
+            reference_ingredients=reference_map.get(os.path.basename(image_path), [])
+        )
+        for _ in range(n_runs)
+        for image_path in image_files
+    ]
+
+    if max_concurrency > 1:
+        print(f"\n=== {len(jobs)} запусков, параллельно до {max_concurrency} ===")
+        outcomes = asyncio.run(acook_from_images(jobs, vlm, llm, max_concurrency=max_concurrency,
+                                                 return_exceptions=True))
+    else:
+        outcomes = None
+
+    for run_counter, inputs in enumerate(jobs, start=1):
+        image_name = os.path.basename(inputs["image_path"])
 
+        if outcomes is None:
             print(f"\n=== Запуск {run_counter} для {image_name} ===")
-            result = cook_from_image(
-                image_path=image_path,
-                vlm=vlm,
-                llm=llm,
-                dietary="нет",
-                feedback="нет",
-                preferred_calorie_level="низкокалорийное",
-                preferred_cooking_time="быстро",
-                preferred_difficulty="легко",
-                existing_recipes="нет",
-                reference_ingredients=reference_ingredients
-            )
-            run_counter += 1
-
-            if not result:
-                print("WARN: cook_from_image вернул пустой результат")
+            result = cook_from_image(vlm=vlm, llm=llm, **inputs)
+        else:
+            result = outcomes[run_counter - 1]
+            if isinstance(result, Exception):
+                print(f"WARN: запуск {run_counter} для {image_name} упал: {result!r}")
                 continue
 
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-
-            usage = result.get("usage", {}) or {}
-            llm_checks = result.get("llm_checks", {}) or {}
-            llm_input = result.get("input", {}) or {}
-
-            vlm_f1 = safe_float(llm_input.get("vlm_f1"))
-            vlm_excess_ratio = safe_float(llm_input.get("vlm_excess_ratio"))
-
-            results.append({
-                "image": image_name,
-                "llm_variant": result.get("llm_variant"),
-                "prompt_variant": llm_input.get("prompt_variant"),
-                "vlm_duration_sec": result.get("vlm_duration_sec"),
-                "duration_sec": result.get("duration_sec"),
-                "tokens": usage.get("total_tokens"),
-                "cost": result.get("cost"),
-                "vlm_f1": vlm_f1,
-                "vlm_excess_ratio": vlm_excess_ratio,
-                "dietary_ok": llm_checks.get("dietary_ok"),
-                "difficulty_ok": llm_checks.get("difficulty_ok"),
-                "time_ok": llm_checks.get("time_ok"),
-                "calories_ok": llm_checks.get("calories_ok")
-            })
+        if not result:
+            print("WARN: cook_from_image вернул пустой результат")
+            continue
+
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+        usage = result.get("usage", {}) or {}
+        llm_checks = result.get("llm_checks", {}) or {}
+        llm_input = result.get("input", {}) or {}
+
+        vlm_f1 = safe_float(llm_input.get("vlm_f1"))
+        vlm_excess_ratio = safe_float(llm_input.get("vlm_excess_ratio"))
+
+        results.append({
+            "image": image_name,
+            "llm_variant": result.get("llm_variant"),
+            "prompt_variant": llm_input.get("prompt_variant"),
+            "vlm_duration_sec": result.get("vlm_duration_sec"),
+            "duration_sec": result.get("duration_sec"),
+            "tokens": usage.get("total_tokens"),
+            "cost": result.get("cost"),
+            "vlm_f1": vlm_f1,
+            "vlm_excess_ratio": vlm_excess_ratio,
+            "dietary_ok": llm_checks.get("dietary_ok"),
+            "difficulty_ok": llm_checks.get("difficulty_ok"),
+            "time_ok": llm_checks.get("time_ok"),
+            "calories_ok": llm_checks.get("calories_ok")
+        })
+
+        aggregator.update(results[-1])
+        if early_stop_metric and outcomes is None and aggregator.decided(early_stop_metric):
+            print(f"\n=== Остановка после {run_counter} запусков из {len(jobs)}: "
+                  f"{early_stop_metric} значимо различается ===")
+            break
+
+    # События Langfuse отправляются в фоне — дожидаемся хвоста и сообщаем о потерях
+    exporter = get_exporter()
+    exporter.flush()
+    export_stats = exporter.stats()
+    if export_stats["dropped"]:
+        print(f"WARN: в Langfuse не отправлено событий: {export_stats['dropped']} из {export_stats['submitted']}")
 
     if results:
         results.sort(key=lambda r: r["image"])
+        print(json.dumps(aggregator.summary(), ensure_ascii=False, indent=2))
 
         with open("ab_test_results.txt", "w", encoding="utf-8") as f:
             for row in results:
@@ -0,0 +1,167 @@
+import glob
+import json
+import math
+import os
+import random
+import zlib
+from pathlib import Path
+
+# Записанные результаты пайплайна: ингредиенты от VLM и рецепты от Mistral
+RECORDED_RESULTS_GLOB = os.getenv("FAKE_RECORDED_RESULTS", "backend/local_recipes/*_recipes.json")
+
+
+class LatencyModel:
+    """
+    Распределение задержки, секунды. Задаётся строкой:
+        "2.5" | "fixed:2.5" | "uniform:low=1,high=3" | "normal:mean=2,std=0.5"
+        "lognormal:median=40,sigma=0.3" | "exponential:mean=2"
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+    def __init__(self, kind: str = "fixed", **params):
+        if kind not in self.KINDS:
+            raise ValueError(f"Неизвестное распределение задержки: {kind}")
+        self.kind = kind
+        self.params = {k: float(v) for k, v in params.items()}
+
+    @classmethod
+    def parse(cls, spec: str):
+        spec = (spec or "0").strip()
+        if ":" not in spec:
+            return cls("fixed", value=float(spec))
+        kind, raw = spec.split(":", 1)
+        params = {}
+        for item in raw.split(","):
+            if "=" in item:
+                key, value = item.split("=", 1)
+                params[key.strip()] = value.strip()
+            elif item.strip():
+                params["value"] = item.strip()
+        return cls(kind.strip(), **params)
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p.get("value", 0.0)
+        elif self.kind == "uniform":
+            value = rng.uniform(p.get("low", 0.0), p.get("high", 1.0))
+        elif self.kind == "normal":
+            value = rng.gauss(p.get("mean", 1.0), p.get("std", 0.0))
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(p.get("median", 1.0)), p.get("sigma", 0.0))
+        else:
+            value = rng.expovariate(1.0 / p["mean"]) if p.get("mean") else 0.0
+        return max(0.0, value)
+
+    def describe(self) -> str:
+        return f"{self.kind}:" + ",".join(f"{k}={v:g}" for k, v in self.params.items())
+
+
+class FakeBehavior:
+    """
+    Общие настройки фейкового сервера: задержка, скорость токенов и инъекция ошибок.
+    Читаются из переменных окружения с префиксом (FAKE_OLLAMA_*, FAKE_MISTRAL_*)
+    и меняются на лету через POST /_config.
+    """
+
+    def __init__(self, prefix: str, latency: str = "1", tokens_per_sec: float = 50.0):
+        env = lambda name, default: os.getenv(f"{prefix}_{name}", default)
+        self.latency = LatencyModel.parse(env("LATENCY", latency))
+        self.tokens_per_sec = float(env("TOKENS_PER_SEC", tokens_per_sec))
+        self.error_rate = float(env("ERROR_RATE", 0.0))
+        self.rate_limit_rate = float(env("RATE_LIMIT_RATE", 0.0))
+        # Сверх этого числа одновременных запросов сервер отвечает 429/503 (0 — без лимита)
+        self.max_concurrency = int(env("MAX_CONCURRENCY", 0))
+        self.retry_after = float(env("RETRY_AFTER", 1.0))
+        self.rng = random.Random(int(os.getenv("FAKE_SEED", 42)))
+        self.stats = {"requests": 0, "in_flight": 0, "errors": 0, "rate_limited": 0}
+
+    def update(self, config: dict):
+        if "latency" in config:
+            self.latency = LatencyModel.parse(str(config["latency"]))
+        for key in ("tokens_per_sec", "error_rate", "rate_limit_rate", "retry_after"):
+            if key in config:
+                setattr(self, key, float(config[key]))
+        if "max_concurrency" in config:
+            self.max_concurrency = int(config["max_concurrency"])
+        if "seed" in config:
+            self.rng.seed(int(config["seed"]))
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": self.latency.describe(),
+            "tokens_per_sec": self.tokens_per_sec,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "max_concurrency": self.max_concurrency,
+            "retry_after": self.retry_after,
+            "stats": self.stats,
+        }
+
+    def fault(self):
+        """'rate_limit' | 'error' | None — что вернуть на текущий запрос"""
+        self.stats["requests"] += 1
+        if self.max_concurrency and self.stats["in_flight"] >= self.max_concurrency:
+            self.stats["rate_limited"] += 1
+            return "rate_limit"
+        if self.rng.random() < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return "rate_limit"
+        if self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return "error"
+        return None
+
+    def first_token_delay(self) -> float:
+        return self.latency.sample(self.rng)
+
+    def token_delay(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+
+def approx_tokens(text: str) -> int:
+    """Грубая оценка числа токенов: ~4 символа на токен"""
+    return max(1, math.ceil(len(text or "") / 4))
+
+
+def split_tokens(text: str, size: int = 4):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def _ingredient_names(ingredients: list) -> list:
+    """В части записей имя вложено ещё раз: {"name": {"name": "..."}}"""
+    names = []
+    for item in ingredients:
+        while isinstance(item, dict):
+            item = item.get("name")
+        if item:
+            names.append({"name": str(item)})
+    return names
+
+
+def load_recorded_results(pattern: str = RECORDED_RESULTS_GLOB) -> list:
+    """Пары (ингредиенты, рецепты) из сохранённых результатов, в стабильном порядке"""
+    results = []
+    for path in sorted(glob.glob(pattern)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        ingredients = data.get("ingredients")
+        if isinstance(ingredients, dict):
+            ingredients = ingredients.get("ingredients")
+        ingredients = _ingredient_names(ingredients or [])
+        recipes = data.get("recipes")
+        if ingredients and isinstance(recipes, list) and recipes:
+            results.append({"source": Path(path).name, "ingredients": ingredients, "recipes": recipes})
+    return results
+
+
+def pick_canned(outputs: list, key: str):
+    """Детерминированный выбор записанного ответа по ключу запроса (одинаковый вход — одинаковый выход)"""
+    if not outputs:
+        return None
+    return outputs[zlib.crc32(key.encode("utf-8")) % len(outputs)]
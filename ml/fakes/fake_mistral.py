@@ -0,0 +1,95 @@
+"""
+Фейковый Mistral (/v1/chat/completions) для нагрузочных тестов без ключа и сети:
+
+    FAKE_MISTRAL_LATENCY="normal:mean=6,std=1.5" FAKE_MISTRAL_RATE_LIMIT_RATE=0.05 \
+        uvicorn ml.fakes.fake_mistral:app --port 8090
+    MISTRAL_URL=http://127.0.0.1:8090/v1/chat/completions uvicorn ml.api.server:app --port 8001
+
+Ответ повторяет форму Mistral (choices[].message.content, usage), содержимое — рецепты
+из записанных результатов, выбранные по тексту запроса. Время ответа = задержка
+распределения + completion_tokens / TOKENS_PER_SEC. Настройки (FAKE_MISTRAL_*): LATENCY,
+TOKENS_PER_SEC, ERROR_RATE, RATE_LIMIT_RATE, MAX_CONCURRENCY, RETRY_AFTER; FAKE_SEED.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from ml.fakes.common import FakeBehavior, approx_tokens, load_recorded_results, pick_canned
+
+DEFAULT_RECIPES = [{
+    "name": "Омлет с помидорами",
+    "ingredients": [{"name": "яйцо", "amount": "3 шт."}, {"name": "помидор", "amount": "1 шт."}],
+    "steps": [{"order": 1, "instruction": "Взбить яйца, добавить помидор и жарить 5 минут."}],
+}]
+
+app = FastAPI(title="Fake Mistral")
+behavior = FakeBehavior("FAKE_MISTRAL", latency="3", tokens_per_sec=80.0)
+canned = [r["recipes"] for r in load_recorded_results()]
+
+
+@app.get("/_config")
+async def get_config():
+    return {**behavior.to_dict(), "canned_outputs": len(canned)}
+
+
+@app.post("/_config")
+async def set_config(config: dict):
+    behavior.update(config)
+    return behavior.to_dict()
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: dict):
+    fault = behavior.fault()
+    if fault == "rate_limit":
+        return JSONResponse(
+            {"object": "error", "message": "Requests rate limit exceeded", "type": "rate_limited", "code": "1300"},
+            status_code=429,
+            headers={"Retry-After": f"{behavior.retry_after:g}"},
+        )
+    if fault == "error":
+        return JSONResponse(
+            {"object": "error", "message": "fake mistral: injected failure", "type": "internal_error"},
+            status_code=500,
+        )
+
+    messages = payload.get("messages") or []
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    recipes = pick_canned(canned, prompt) or DEFAULT_RECIPES
+    content = json.dumps({"recipes": recipes}, ensure_ascii=False, indent=2)
+
+    prompt_tokens = approx_tokens(prompt)
+    completion_tokens = approx_tokens(content)
+
+    behavior.stats["in_flight"] += 1
+    try:
+        await asyncio.sleep(behavior.first_token_delay() + completion_tokens * behavior.token_delay())
+    finally:
+        behavior.stats["in_flight"] -= 1
+
+    return {
+        "id": uuid.uuid4().hex,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "mistral-small"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "tool_calls": None},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_MISTRAL_PORT", 8090)))
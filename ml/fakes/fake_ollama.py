@@ -0,0 +1,94 @@
+"""
+Фейковый Ollama для нагрузочных тестов без модели:
+
+    FAKE_OLLAMA_LATENCY="lognormal:median=40,sigma=0.3" FAKE_OLLAMA_TOKENS_PER_SEC=20 \
+        uvicorn ml.fakes.fake_ollama:app --port 11434
+
+Реализует /api/tags и потоковый /api/generate (NDJSON, как настоящий Ollama). Ответы —
+ингредиенты из записанных результатов; выбор зависит от изображения, поэтому детерминирован.
+Настройки (FAKE_OLLAMA_*): LATENCY, TOKENS_PER_SEC, ERROR_RATE, RATE_LIMIT_RATE,
+MAX_CONCURRENCY, RETRY_AFTER; FAKE_SEED. Меняются на лету через POST /_config.
+"""
+import asyncio
+import json
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ml.fakes.common import FakeBehavior, load_recorded_results, pick_canned, split_tokens
+
+FAKE_MODEL = os.getenv("FAKE_OLLAMA_MODEL", os.getenv("VLM_MODEL", "qwen2.5vl:3b"))
+
+DEFAULT_OUTPUT = {"ingredients": [{"name": "помидор"}, {"name": "лук"}, {"name": "яйцо"}]}
+
+app = FastAPI(title="Fake Ollama")
+behavior = FakeBehavior("FAKE_OLLAMA", latency="1", tokens_per_sec=30.0)
+canned = [{"ingredients": r["ingredients"]} for r in load_recorded_results()]
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": FAKE_MODEL}]}
+
+
+@app.get("/_config")
+async def get_config():
+    return {**behavior.to_dict(), "canned_outputs": len(canned)}
+
+
+@app.post("/_config")
+async def set_config(config: dict):
+    behavior.update(config)
+    return behavior.to_dict()
+
+
+@app.post("/api/generate")
+async def generate(payload: dict):
+    fault = behavior.fault()
+    if fault == "rate_limit":
+        # Ollama при переполнении очереди отвечает 503 "server busy"
+        return JSONResponse(
+            {"error": "server busy, please try again"},
+            status_code=503,
+            headers={"Retry-After": f"{behavior.retry_after:g}"},
+        )
+    if fault == "error":
+        return JSONResponse({"error": "fake ollama: injected failure"}, status_code=500)
+
+    model = payload.get("model", FAKE_MODEL)
+    images = payload.get("images") or [""]
+    output = pick_canned(canned, images[0][:4096]) or DEFAULT_OUTPUT
+    text = json.dumps(output, ensure_ascii=False)
+    first_token_delay = behavior.first_token_delay()
+
+    async def stream():
+        behavior.stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.sleep(first_token_delay)
+            tokens = 0
+            for chunk in split_tokens(text):
+                tokens += 1
+                yield json.dumps({"model": model, "response": chunk, "done": False}, ensure_ascii=False) + "\n"
+                await asyncio.sleep(behavior.token_delay())
+            yield json.dumps({
+                "model": model,
+                "response": "",
+                "done": True,
+                "total_duration": int((time.perf_counter() - started) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": len(payload.get("prompt", "")) // 4,
+                "eval_count": tokens,
+                "eval_duration": int((time.perf_counter() - started - first_token_delay) * 1e9),
+            }) + "\n"
+        finally:
+            behavior.stats["in_flight"] -= 1
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_OLLAMA_PORT", 11434)))
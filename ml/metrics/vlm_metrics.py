@@ -0,0 +1,223 @@
+"""
+Метрики распознавания ингредиентов (precision, recall, F1, excess) — единая нормализация для
+eval_framework и A/B-экспериментов. Имена сравниваются по ключу каталога ингредиентов
+(common/ingredients.py): «яйцо» и «яйца», «куриное филе» и «курица» совпадают.
+VLM_METRICS_CANONICAL=0 (или --exact) — прежнее точное сравнение строк.
+
+Для целых прогонов ингредиенты кодируются в целочисленные id общего словаря, а пары
+(кейс, ингредиент) — в один int64-ключ: пересечение предсказаний с эталоном по всем кейсам
+считается одним np.intersect1d, счётчики — np.bincount. Доверительные интервалы — бутстрэп
+средних по кейсам, пачками матричных операций.
+
+    python -m ml.metrics.vlm_metrics cases.jsonl --group-key variant
+
+(строки jsonl с полями predicted, reference и полем варианта)
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from common.ingredients import get_catalogue
+
+DEFAULT_BOOTSTRAP = 1000
+MATCH_CANONICAL = os.getenv("VLM_METRICS_CANONICAL", "1") != "0"
+# Ограничение на размер одной пачки бутстрэпа (элементов матрицы индексов)
+BOOTSTRAP_CHUNK = 5_000_000
+
+
+def normalize_ingredient(item) -> str:
+    """Имя ингредиента в нижнем регистре без лишних пробелов; принимает и {"name": ...}"""
+    if isinstance(item, dict):
+        item = item.get("name", "")
+    return re.sub(r"\s+", " ", str(item or "").strip().lower())
+
+
+def match_key(item) -> str:
+    """Ключ сравнения ингредиентов: канонический ключ каталога или (без каталога) нормализованное имя"""
+    return get_catalogue().key(item) if MATCH_CANONICAL else normalize_ingredient(item)
+
+
+def _name_set(items) -> set:
+    names = (match_key(i) for i in items or [])
+    return {n for n in names if n}
+
+
+# --- Один кейс ---
+def compute_f1(predicted, reference) -> float:
+    predicted_set, reference_set = _name_set(predicted), _name_set(reference)
+    total = len(predicted_set) + len(reference_set)
+    return 2 * len(predicted_set & reference_set) / total if total else 0.0
+
+
+def compute_excess(predicted, reference) -> float:
+    """Доля предсказанных ингредиентов, которых нет в эталоне"""
+    predicted_set = _name_set(predicted)
+    if not predicted_set:
+        return 0.0
+    return len(predicted_set - _name_set(reference)) / len(predicted_set)
+
+
+# --- Весь прогон ---
+class Vocabulary:
+    """Ключ ингредиента (match_key) -> целочисленный id"""
+
+    def __init__(self, key=match_key):
+        self.key = key
+        self.ids = {}
+        # Сырые строки уже встречались — нормализация (регулярка) идёт один раз на строку, а не на вхождение
+        self._raw = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self, item) -> int:
+        """id ингредиента или -1 для пустого имени"""
+        key = item if isinstance(item, str) else None
+        if key is not None and key in self._raw:
+            return self._raw[key]
+        name = self.key(item)
+        item_id = self.ids.setdefault(name, len(self.ids)) if name else -1
+        if key is not None:
+            self._raw[key] = item_id
+        return item_id
+
+    def encode_cases(self, cases):
+        """(номера кейсов, id ингредиентов) для списка списков ингредиентов; повторы внутри кейса убираются"""
+        case_idx, item_ids = [], []
+        encode = self.encode
+        for i, items in enumerate(cases):
+            ids = {encode(item) for item in items or []}
+            ids.discard(-1)
+            case_idx.extend([i] * len(ids))
+            item_ids.extend(ids)
+        return np.asarray(case_idx, dtype=np.int64), np.asarray(item_ids, dtype=np.int64)
+
+
+def _safe_div(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+def score_cases(predicted_cases, reference_cases, vocab: Vocabulary = None) -> dict:
+    """
+    Метрики по каждому кейсу: массивы tp, n_pred, n_ref, precision, recall, f1, excess.
+    Значения совпадают с compute_f1/compute_excess для отдельных кейсов.
+    """
+    if len(predicted_cases) != len(reference_cases):
+        raise ValueError("predicted_cases и reference_cases разной длины")
+    n = len(predicted_cases)
+    vocab = Vocabulary() if vocab is None else vocab
+    pred_case, pred_ids = vocab.encode_cases(predicted_cases)
+    ref_case, ref_ids = vocab.encode_cases(reference_cases)
+
+    width = max(len(vocab), 1)
+    common = np.intersect1d(pred_case * width + pred_ids, ref_case * width + ref_ids, assume_unique=True)
+
+    tp = np.bincount(common // width, minlength=n)
+    n_pred = np.bincount(pred_case, minlength=n)
+    n_ref = np.bincount(ref_case, minlength=n)
+    return {
+        "tp": tp,
+        "n_pred": n_pred,
+        "n_ref": n_ref,
+        "precision": _safe_div(tp, n_pred),
+        "recall": _safe_div(tp, n_ref),
+        "f1": _safe_div(2 * tp, n_pred + n_ref),
+        "excess": _safe_div(n_pred - tp, n_pred),
+    }
+
+
+def bootstrap_means(values, n_boot: int = DEFAULT_BOOTSTRAP, seed: int = 0):
+    """
+    Бутстрэп-средние для нескольких метрик сразу: values формы (k, n) -> (n_boot, k).
+    Каждая выборка — вектор кратностей кейсов (bincount), средние всех метрик — одно матричное
+    умножение на пачку выборок
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    n = values.shape[1]
+    rng = np.random.default_rng(seed)
+    chunk = max(1, BOOTSTRAP_CHUNK // n)
+    means = []
+    for start in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - start)
+        draws = rng.integers(0, n, size=(size, n)) + np.arange(size)[:, None] * n
+        counts = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n)
+        means.append(counts @ values.T / n)
+    return np.concatenate(means)
+
+
+def bootstrap_ci(values, n_boot: int = DEFAULT_BOOTSTRAP, alpha: float = 0.05, seed: int = 0):
+    """Перцентильный бутстрэп-интервал для среднего; (low, high)"""
+    if len(values) == 0:
+        return None, None
+    low, high = np.quantile(bootstrap_means(values, n_boot, seed)[:, 0], [alpha / 2, 1 - alpha / 2])
+    return float(low), float(high)
+
+
+def summarize_scores(scores: dict, n_boot: int = DEFAULT_BOOTSTRAP, alpha: float = 0.05, seed: int = 0) -> dict:
+    """Средние по кейсам (macro) с бутстрэп-интервалами и micro-метрики по суммарным счётчикам"""
+    metrics = ("precision", "recall", "f1", "excess")
+    cases = len(scores["f1"])
+    summary = {"cases": int(cases)}
+    bounds = None
+    if n_boot and cases:
+        means = bootstrap_means([scores[m] for m in metrics], n_boot, seed)
+        bounds = np.quantile(means, [alpha / 2, 1 - alpha / 2], axis=0)
+    for i, metric in enumerate(metrics):
+        summary[metric] = {
+            "mean": float(scores[metric].mean()) if cases else None,
+            "ci_low": float(bounds[0, i]) if bounds is not None else None,
+            "ci_high": float(bounds[1, i]) if bounds is not None else None,
+        }
+
+    tp, n_pred, n_ref = (int(scores[k].sum()) for k in ("tp", "n_pred", "n_ref"))
+    summary["micro"] = {
+        "precision": tp / n_pred if n_pred else 0.0,
+        "recall": tp / n_ref if n_ref else 0.0,
+        "f1": 2 * tp / (n_pred + n_ref) if n_pred + n_ref else 0.0,
+        "excess": (n_pred - tp) / n_pred if n_pred else 0.0,
+    }
+    return summary
+
+
+def score_by_group(groups, predicted_cases, reference_cases, n_boot: int = DEFAULT_BOOTSTRAP,
+                   alpha: float = 0.05, seed: int = 0, vocab: Vocabulary = None) -> dict:
+    """Сводка по каждому варианту промпта (groups — вариант для каждого кейса); кодирование общее"""
+    scores = score_cases(predicted_cases, reference_cases, vocab)
+    labels, inverse = np.unique(np.asarray(groups, dtype=str), return_inverse=True)
+    return {
+        str(label): summarize_scores({k: v[inverse == i] for k, v in scores.items()}, n_boot, alpha, seed)
+        for i, label in enumerate(labels)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Метрики VLM по jsonl с предсказаниями и эталонами")
+    parser.add_argument("path")
+    parser.add_argument("--group-key", default="variant")
+    parser.add_argument("--predicted-key", default="predicted")
+    parser.add_argument("--reference-key", default="reference")
+    parser.add_argument("--bootstrap", type=int, default=DEFAULT_BOOTSTRAP)
+    parser.add_argument("--exact", action="store_true", help="сравнивать имена без каталога ингредиентов")
+    args = parser.parse_args(argv)
+
+    groups, predicted, reference = [], [], []
+    with open(args.path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                groups.append(row.get(args.group_key, "all"))
+                predicted.append(row.get(args.predicted_key) or [])
+                reference.append(row.get(args.reference_key) or [])
+
+    vocab = Vocabulary(normalize_ingredient) if args.exact else None
+    summary = score_by_group(groups, predicted, reference, n_boot=args.bootstrap, vocab=vocab)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,7 @@ import httpx
 load_dotenv()
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-MISTRAL_URL = "https://api.mistral.ai/v1/chat/completions"
+MISTRAL_URL = os.getenv("MISTRAL_URL", "https://api.mistral.ai/v1/chat/completions")
 MISTRAL_MODEL = "mistral-small"
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
@@ -164,6 +164,24 @@ class MistralText:
     async def generate_recipe(self, ingredients, dietary: str = None, existing=None, feedback: str = None,
                               preferred_calorie_level: str = None, preferred_cooking_time: str = None,
                               preferred_difficulty: str = None) -> dict:
+        recipes, _ = await self.generate_recipe_with_usage(
+            ingredients,
+            dietary=dietary,
+            existing=existing,
+            feedback=feedback,
+            preferred_calorie_level=preferred_calorie_level,
+            preferred_cooking_time=preferred_cooking_time,
+            preferred_difficulty=preferred_difficulty
+        )
+        return recipes
+
+    async def generate_recipe_with_usage(self, ingredients, dietary: str = None, existing=None, feedback: str = None,
+                                         preferred_calorie_level: str = None, preferred_cooking_time: str = None,
+                                         preferred_difficulty: str = None):
+        """
+        То же, что generate_recipe, плюс сведения о вызове: модель, задержка и usage из ответа API
+        (None, если API его не вернул), а также текст запроса и ответа для запасного подсчёта токенов
+        """
         if self.client is None:
             await self.init_client()
 
@@ -191,18 +209,30 @@ class MistralText:
             ],
             "temperature": 0.4
         }
+        call = {
+            "model": MISTRAL_MODEL,
+            "latency_sec": None,
+            "usage": None,
+            "prompt": "\n".join(m["content"] for m in payload["messages"]),
+            "output": None,
+        }
+        start_time = time.perf_counter()
 
         try:
             response = await self.client.post(MISTRAL_URL, headers=headers, json=payload)
+            call["latency_sec"] = round(time.perf_counter() - start_time, 3)
             if response.status_code != 200:
-                return {"error": f"Mistral API error: {response.status_code}", "details": response.text}
+                return {"error": f"Mistral API error: {response.status_code}", "details": response.text}, call
 
             resp_json = response.json()
+            call["model"] = resp_json.get("model") or MISTRAL_MODEL
+            call["usage"] = resp_json.get("usage")
             choices = resp_json.get("choices") or []
             if not choices or "message" not in choices[0] or "content" not in choices[0]["message"]:
-                return {"error": "Invalid response structure from Mistral", "raw": resp_json}
+                return {"error": "Invalid response structure from Mistral", "raw": resp_json}, call
 
             output = choices[0]["message"]["content"].strip()
+            call["output"] = output
             clean = re.sub(r"^```(?:json)?", "", output.strip(), flags=re.IGNORECASE | re.MULTILINE)
             clean = re.sub(r"```$", "", clean.strip(), flags=re.MULTILINE)
 
@@ -213,13 +243,17 @@ class MistralText:
 
             try:
                 parsed = json.loads(clean)
-                return parsed.get("recipes", parsed)
+                return parsed.get("recipes", parsed), call
             except Exception as e:
-                return {"error": f"Invalid JSON from Mistral: {e}", "raw_output": output}
+                return {"error": f"Invalid JSON from Mistral: {e}", "raw_output": output}, call
 
         except httpx.TimeoutException:
-            return {"error": "Mistral API timeout"}
+            return {"error": "Mistral API timeout"}, call
         except httpx.RequestError as e:
-            return {"error": f"Network error: {str(e)}"}
+            return {"error": f"Network error: {str(e)}"}, call
         except Exception as e:
-            return {"error": f"Unexpected error: {str(e)}"}
+            return {"error": f"Unexpected error: {str(e)}"}, call
+        finally:
+            # Таймауты и сетевые ошибки тоже получают задержку
+            if call["latency_sec"] is None:
+                call["latency_sec"] = round(time.perf_counter() - start_time, 3)
@@ -8,19 +8,26 @@ from dotenv import load_dotenv
 from ml.service.prompts_v2 import UC_VLM_PROMPT, UC_LLM_PROMPT
 from deep_translator import GoogleTranslator
 import httpx
+from ml.service.vlm_router import OllamaPool, StreamError, default_pool, read_generate_stream
+from common.ingredients import get_catalogue
 
 # Загружаем переменные окружения
 load_dotenv()
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-MISTRAL_URL = "https://api.mistral.ai/v1/chat/completions"
+MISTRAL_URL = os.getenv("MISTRAL_URL", "https://api.mistral.ai/v1/chat/completions")
 MISTRAL_MODEL = "mistral-small"
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 VLM_MODEL = os.getenv("VLM_MODEL", "qwen2.5vl:3b")
+# Перевод ингредиентов идёт через сеть; для офлайн-бенчмарков с фейковым Ollama его можно выключить
+VLM_TRANSLATE = os.getenv("VLM_TRANSLATE", "1") != "0"
 
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # секунды
+# Кусок файла при кодировании в base64; кратен 3, чтобы куски base64 склеивались без «=» внутри
+IMAGE_CHUNK_SIZE = 48 * 1024
+_IMAGE_PLACEHOLDER = "__image__"
 
 
 def _sanitize_json_string(s: str) -> str:
@@ -28,7 +35,24 @@ def _sanitize_json_string(s: str) -> str:
     return re.sub(r'[\x00-\x1f\x7f]', ' ', s)
 
 
+def _image_request_body(payload: dict, image_path: str, chunk_size: int = IMAGE_CHUNK_SIZE):
+    """
+    Тело запроса к Ollama потоком: картинка кодируется в base64 по кускам прямо при отправке,
+    так что в памяти нет ни файла целиком, ни его base64, ни сериализованного JSON
+    """
+    prefix, suffix = json.dumps({**payload, "images": [_IMAGE_PLACEHOLDER]}).split(f'"{_IMAGE_PLACEHOLDER}"')
+    yield (prefix + '"').encode("utf-8")
+    with open(image_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield base64.b64encode(chunk)
+    yield ('"' + suffix).encode("utf-8")
+
+
 class LLaVAVision:
+    def __init__(self, pool: OllamaPool = None):
+        # Пул общий на процесс: нагрузка по инстансам учитывается между задачами
+        self.pool = pool or default_pool()
+
     def build_prompt(self, image_path: str) -> str:
         """Возвращает текст промпта, который реально отправляется в VLM"""
         prompt_text = UC_VLM_PROMPT.format_messages(
@@ -42,9 +66,6 @@ class LLaVAVision:
         if not os.path.exists(image_path):
             return {"error": f"File not found: {image_path}"}
 
-        with open(image_path, "rb") as f:
-            image_b64 = base64.b64encode(f.read()).decode("utf-8")
-
         prompt_text = "\n".join([m.content for m in UC_VLM_PROMPT.format_messages(
             input="Определи продукты на фото"
         )])
@@ -52,7 +73,6 @@ class LLaVAVision:
         payload = {
             "model": VLM_MODEL,
             "prompt": prompt_text,
-            "images": [image_b64],
             "options": {
                 "temperature": 0.3,
                 "top_p": 0.9,
@@ -61,17 +81,24 @@ class LLaVAVision:
             }
         }
 
+        tried = []
         for attempt in range(1, MAX_RETRIES + 1):
             try:
-                resp = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=300)
-                text = ""
-                for line in resp.iter_lines():
-                    if line:
-                        data = json.loads(line.decode("utf-8"))
-                        if "response" in data:
-                            text += data["response"]
-                        if "error" in data:
-                            return {"error": data["error"]}
+                model_start = time.perf_counter()
+                # Повтор идёт на другой инстанс пула, если он есть
+                with self.pool.acquire(exclude=tried) as backend:
+                    tried.append(backend)
+                    resp = requests.post(
+                        backend.generate_url,
+                        data=_image_request_body({**payload, "model": backend.model}, image_path),
+                        headers={"Content-Type": "application/json"},
+                        stream=True,
+                        timeout=300
+                    )
+                    # 5xx/429 — ошибка инстанса: засчитываем её пулу и повторяем
+                    resp.raise_for_status()
+                    # Ошибка посреди потока засчитывается инстансу так же, как 5xx
+                    text = read_generate_stream(resp.iter_lines())
 
                 json_start = text.find('{')
                 json_end = text.rfind('}') + 1
@@ -85,26 +112,43 @@ class LLaVAVision:
                     except json.JSONDecodeError as e:
                         return {"error": f"Invalid JSON: {e}", "raw_output": clean}
 
+                    model_sec = time.perf_counter() - model_start
+
                     # Переводим ингредиенты на русский
+                    translate_start = time.perf_counter()
+                    catalogue = get_catalogue()
                     ingredients = parsed.get("ingredients", [])
                     ingredients_ru = []
+                    seen = set()
                     for item in ingredients:
                         name_en = item.get("name", "") if isinstance(item, dict) else str(item)
                         if name_en:
                             try:
-                                name_ru = GoogleTranslator(source="en", target="ru").translate(name_en)
+                                name_ru = GoogleTranslator(source="en", target="ru").translate(name_en) if VLM_TRANSLATE else name_en
                             except Exception:
                                 name_ru = name_en
-                            ingredients_ru.append({"name": name_ru})
+                            # Каноническое имя из каталога («яйцо» -> «яйца», «chicken» -> «курица»); повторы убираем
+                            name_ru = catalogue.lookup(name_ru) or catalogue.lookup(name_en) or name_ru
+                            if name_ru not in seen:
+                                seen.add(name_ru)
+                                ingredients_ru.append({"name": name_ru})
 
                     parsed["ingredients"] = ingredients_ru
                     parsed["queued_at"] = queued_at
                     parsed["completed_at"] = time.time()
                     parsed["duration_sec"] = round(time.perf_counter() - start_time, 3)
+                    # Время этапов — для таймлайна задачи
+                    parsed["model_sec"] = round(model_sec, 3)
+                    parsed["translate_sec"] = round(time.perf_counter() - translate_start, 3)
+                    parsed["vlm_backend"] = backend.base_url
                     return parsed
 
                 return {"error": "No JSON object found in model output", "raw_output": text}
 
+            except StreamError as e:
+                if attempt == MAX_RETRIES:
+                    return {"error": str(e), "duration_sec": round(time.perf_counter() - start_time, 3)}
+                time.sleep(RETRY_DELAY)
             except requests.Timeout:
                 if attempt == MAX_RETRIES:
                     return {"error": "Timeout from VLM", "duration_sec": round(time.perf_counter() - start_time, 3)}
@@ -159,13 +203,33 @@ class MistralText:
 
     async def generate_recipe(self, ingredients, dietary: str = None, existing=None, feedback: str = None,
                               preferred_calorie_level: str = None, preferred_cooking_time: str = None,
-                              preferred_difficulty: str = None) -> dict:
+                              preferred_difficulty: str = None, prompt: str = None) -> dict:
+        recipes, _ = await self.generate_recipe_with_usage(
+            ingredients,
+            dietary=dietary,
+            existing=existing,
+            feedback=feedback,
+            preferred_calorie_level=preferred_calorie_level,
+            preferred_cooking_time=preferred_cooking_time,
+            preferred_difficulty=preferred_difficulty,
+            prompt=prompt
+        )
+        return recipes
+
+    async def generate_recipe_with_usage(self, ingredients, dietary: str = None, existing=None, feedback: str = None,
+                                         preferred_calorie_level: str = None, preferred_cooking_time: str = None,
+                                         preferred_difficulty: str = None, prompt: str = None):
+        """
+        То же, что generate_recipe, плюс сведения о вызове: модель, задержка и usage из ответа API
+        (None, если API его не вернул), а также текст запроса и ответа для запасного подсчёта токенов.
+        prompt — готовый текст запроса (варианты A/B) вместо собранного из шаблона.
+        """
         start_time = time.perf_counter()
         if self.client is None:
             await self.init_client()
 
         filtered_ingredients = self._filter_ingredients(ingredients, dietary)
-        prompt_text = self.build_prompt(
+        prompt_text = prompt or self.build_prompt(
             filtered_ingredients,
             dietary=dietary,
             existing=existing,
@@ -188,18 +252,30 @@ class MistralText:
             ],
             "temperature": 0.4
         }
+        call = {
+            "model": MISTRAL_MODEL,
+            "latency_sec": None,
+            "usage": None,
+            "prompt": "\n".join(m["content"] for m in payload["messages"]),
+            "output": None,
+        }
+        request_start = time.perf_counter()
 
         try:
             response = await self.client.post(MISTRAL_URL, headers=headers, json=payload)
+            call["latency_sec"] = round(time.perf_counter() - request_start, 3)
             if response.status_code != 200:
-                return {"error": f"Mistral API error: {response.status_code}", "details": response.text}
+                return {"error": f"Mistral API error: {response.status_code}", "details": response.text}, call
 
             resp_json = response.json()
+            call["model"] = resp_json.get("model") or MISTRAL_MODEL
+            call["usage"] = resp_json.get("usage")
             choices = resp_json.get("choices") or []
             if not choices or "message" not in choices[0] or "content" not in choices[0]["message"]:
-                return {"error": "Invalid response structure from Mistral", "raw": resp_json}
+                return {"error": "Invalid response structure from Mistral", "raw": resp_json}, call
 
             output = choices[0]["message"]["content"].strip()
+            call["output"] = output
             clean = re.sub(r"^```(?:json)?", "", output.strip(), flags=re.IGNORECASE | re.MULTILINE)
             clean = re.sub(r"```$", "", clean.strip(), flags=re.MULTILINE)
 
@@ -212,17 +288,21 @@ class MistralText:
                 parsed = json.loads(clean)
                 parsed["completed_at"] = time.time()
                 parsed["duration_sec"] = round(time.perf_counter() - start_time, 3)
-                return parsed.get("recipes", parsed)
+                return parsed.get("recipes", parsed), call
             except Exception as e:
                 return {
                     "error": f"Invalid JSON from Mistral: {e}",
                     "raw_output": output,
                     "duration_sec": round(time.perf_counter() - start_time, 3)
-                }
+                }, call
 
         except httpx.TimeoutException:
-            return {"error": "Mistral API timeout", "duration_sec": round(time.perf_counter() - start_time, 3)}
+            return {"error": "Mistral API timeout", "duration_sec": round(time.perf_counter() - start_time, 3)}, call
         except httpx.RequestError as e:
-            return {"error": f"Network error: {str(e)}", "duration_sec": round(time.perf_counter() - start_time, 3)}
+            return {"error": f"Network error: {str(e)}", "duration_sec": round(time.perf_counter() - start_time, 3)}, call
         except Exception as e:
-            return {"error": f"Unexpected error: {str(e)}", "duration_sec": round(time.perf_counter() - start_time, 3)}
+            return {"error": f"Unexpected error: {str(e)}", "duration_sec": round(time.perf_counter() - start_time, 3)}, call
+        finally:
+            # Таймауты и сетевые ошибки тоже получают задержку
+            if call["latency_sec"] is None:
+                call["latency_sec"] = round(time.perf_counter() - request_start, 3)
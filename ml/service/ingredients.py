@@ -0,0 +1,138 @@
+"""
+Сборка каталога ингредиентов (common/ingredients.py) из таблицы Product, эталонов eval,
+SEED_ALIASES и SEED_CATEGORIES:
+
+    python -m ml.service.ingredients --db bd/my_database.db --output bd/ingredient_catalogue.json
+"""
+import argparse
+import json
+import sqlite3
+
+from common.ingredients import CATALOGUE_PATH, ROOT, IngredientCatalogue, normalize
+
+# Синонимы, написания и формы одного продукта, которые не сводятся друг к другу ни основой, ни
+# триграммами. Разные продукты (петрушка и укроп, сосиски и сардельки) — разные записи, даже если
+# их объединяет общее название: оно задаётся в SEED_CATEGORIES
+SEED_ALIASES = {
+    "яйца": ["яйцо", "куриное яйцо", "яйца куриные", "egg", "eggs"],
+    "курица": ["куриное филе", "куриная грудка", "курятина", "куриные бедра", "chicken", "chicken breast"],
+    "говядина": ["говяжий фарш", "beef", "ground beef"],
+    "свинина": ["pork"],
+    "фарш": ["мясной фарш", "minced meat"],
+    "лосось": ["семга", "salmon"],
+    "рыба": ["fish"],
+    "колбаса": ["колбаска", "sausage"],
+    "салями": ["salami"],
+    "сосиски": ["hot dogs", "frankfurters"],
+    "сардельки": [],
+    "молоко": ["milk"],
+    "сливочное масло": ["масло сливочное", "butter"],
+    "растительное масло": ["подсолнечное масло", "vegetable oil", "sunflower oil"],
+    "оливковое масло": ["olive oil"],
+    "сыр": ["cheese"],
+    "творог": ["cottage cheese"],
+    "сметана": ["sour cream"],
+    "йогурт": ["yogurt", "yoghurt"],
+    "сливки": ["cream"],
+    "огурцы": ["огурец", "cucumber"],
+    "помидоры": ["помидор", "томаты", "томат", "tomato", "cherry tomatoes"],
+    "морковь": ["морковка", "carrot"],
+    "картофель": ["картошка", "potato"],
+    "лук": ["репчатый лук", "onion"],
+    "зеленый лук": ["green onion", "scallion"],
+    "чеснок": ["garlic"],
+    "перец": ["перцы", "pepper"],
+    "болгарский перец": ["сладкий перец", "bell pepper"],
+    "черный перец": ["молотый черный перец", "black pepper"],
+    "капуста": ["белокочанная капуста", "cabbage"],
+    "цветная капуста": ["cauliflower"],
+    "брокколи": ["broccoli"],
+    "кабачок": ["кабачки", "цукини", "zucchini"],
+    "баклажан": ["баклажаны", "eggplant"],
+    "латук": ["салат латук", "листья салата", "lettuce"],
+    "шпинат": ["spinach"],
+    "зелень": ["herbs"],
+    "петрушка": ["parsley"],
+    "укроп": ["dill"],
+    "грибы": ["шампиньоны", "mushroom", "mushrooms", "champignons"],
+    "авокадо": ["avocado"],
+    "яблоки": ["яблоко", "apple"],
+    "апельсины": ["апельсин", "orange"],
+    "лимон": ["lemon"],
+    "бананы": ["банан", "banana"],
+    "киви": ["kiwi"],
+    "орехи": ["nuts"],
+    "грецкие орехи": ["грецкий орех", "walnut", "walnuts"],
+    "рис": ["rice"],
+    "макароны": ["спагетти", "pasta", "spaghetti"],
+    "мука": ["flour"],
+    "хлеб": ["bread"],
+    "сахар": ["sugar"],
+    "соль": ["salt"],
+    "вода": ["water"],
+}
+
+# Общие названия группы продуктов: рецепт с «зеленью» подходит к укропу из холодильника. Категория
+# не синоним — запрет на продукт категории не распространяется на остальные её продукты
+SEED_CATEGORIES = {
+    "зелень": ["петрушка", "укроп", "кинза", "базилик", "зеленый лук"],
+}
+
+
+def _product_titles(db_path: str) -> list:
+    con = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in con.execute("SELECT title FROM Product") if row[0]]
+    finally:
+        con.close()
+
+
+def _reference_names(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    return [name for case in cases for name in case.get("reference_ingredients", [])]
+
+
+def build_catalogue(db_path: str = None, reference_paths=(), seed: dict = None,
+                    categories: dict = None) -> IngredientCatalogue:
+    """
+    Каталог из SEED_ALIASES, SEED_CATEGORIES, названий Product и эталонных ингредиентов: имя, которое
+    уже находится в каталоге (в том числе нечётко), становится вариантом найденного, остальные — новыми
+    """
+    catalogue = IngredientCatalogue()
+    for name, aliases in (SEED_ALIASES if seed is None else seed).items():
+        catalogue.add(name, aliases)
+    for category, members in (SEED_CATEGORIES if categories is None else categories).items():
+        for member in members:
+            catalogue.add(member, category=category)
+
+    names = _product_titles(db_path) if db_path else []
+    for path in reference_paths:
+        names.extend(_reference_names(path))
+    for name in names:
+        canonical = catalogue.lookup(name)
+        if canonical is None:
+            catalogue.add(name)
+        elif normalize(name) != canonical:
+            catalogue.add(canonical, [normalize(name)])
+    return catalogue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка каталога ингредиентов")
+    parser.add_argument("--db", default=str(ROOT / "bd" / "my_database.db"))
+    parser.add_argument("--references", nargs="*", default=[
+        str(ROOT / "ml" / "metrics" / "vlm_eval_cases.json"),
+        str(ROOT / "ml" / "experiments" / "reference_ingredients.json"),
+    ])
+    parser.add_argument("--output", default=CATALOGUE_PATH)
+    args = parser.parse_args(argv)
+
+    catalogue = build_catalogue(args.db, args.references)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(catalogue.to_entries(), f, ensure_ascii=False, indent=2)
+    print(f"{len(catalogue)} ингредиентов -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
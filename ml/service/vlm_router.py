@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+# Пул Ollama: "http://host1:11434|2,http://host2:11434|1|llava:7b" — адрес, вес (ёмкость), модель.
+# Если не задан, используется один OLLAMA_URL, как раньше.
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+VLM_MODEL = os.getenv("VLM_MODEL", "qwen2.5vl:3b")
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", 10))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", 3))
+# После скольких ошибок подряд инстанс временно исключается и на сколько (пауза удваивается)
+EJECT_AFTER_FAILURES = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", 2))
+EJECT_BASE_SEC = float(os.getenv("OLLAMA_EJECT_SEC", 15))
+EJECT_MAX_SEC = float(os.getenv("OLLAMA_EJECT_MAX_SEC", 300))
+
+
+class NoHealthyBackend(Exception):
+    pass
+
+
+class StreamError(Exception):
+    """Ollama ответил 200, но прислал {"error": ...} в потоке — это тоже ошибка инстанса"""
+
+
+class OllamaBackend:
+    """Один инстанс Ollama: вес, число запросов в работе и состояние исключения"""
+
+    def __init__(self, base_url: str, weight: float = 1.0, model: str = VLM_MODEL):
+        self.base_url = base_url.rstrip("/")
+        self.weight = max(0.01, float(weight))
+        self.model = model
+        self.outstanding = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.healthy = True
+        self.requests = 0
+
+    @property
+    def generate_url(self) -> str:
+        return f"{self.base_url}/api/generate"
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def load(self) -> float:
+        """Ожидаемая загрузка, если отдать инстансу ещё один запрос"""
+        return (self.outstanding + 1) / self.weight
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "url": self.base_url,
+            "model": self.model,
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "healthy": self.healthy,
+            "ejected_for_sec": round(max(0.0, self.ejected_until - now), 1),
+        }
+
+
+def _base_url(url: str) -> str:
+    """http://host:11434/api/generate -> http://host:11434"""
+    parts = urlsplit(url.strip())
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def model_tag(name: str) -> str:
+    """Имя модели с тегом, как в /api/tags: Ollama отдаёт «llava:latest» для модели «llava»"""
+    name = (name or "").strip()
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+def read_generate_stream(lines) -> str:
+    """Текст ответа из NDJSON-потока /api/generate; StreamError, если в потоке пришла ошибка"""
+    text = ""
+    for line in lines:
+        if not line:
+            continue
+        data = json.loads(line.decode("utf-8") if isinstance(line, bytes) else line)
+        if "error" in data:
+            raise StreamError(data["error"])
+        text += data.get("response", "")
+    return text
+
+
+def parse_backends(spec: str, default_model: str = VLM_MODEL) -> list:
+    backends = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        fields = item.split("|")
+        weight = float(fields[1]) if len(fields) > 1 and fields[1] else 1.0
+        model = fields[2] if len(fields) > 2 and fields[2] else default_model
+        backends.append(OllamaBackend(_base_url(fields[0]), weight, model))
+    return backends
+
+
+class OllamaPool:
+    """
+    Маршрутизация запросов VLM по нескольким Ollama: least outstanding requests с учётом веса,
+    фоновая проверка здоровья (/api/tags) и временное исключение инстансов после ошибок подряд.
+    Потокобезопасен: infer вызывается из потоков воркера.
+    """
+
+    def __init__(self, backends: list, health_interval: float = HEALTH_CHECK_INTERVAL):
+        if not backends:
+            raise ValueError("Пул Ollama пуст")
+        self.backends = backends
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    # --- Выбор инстанса ---
+    def _pick(self, exclude=()):
+        now = time.time()
+        candidates = [b for b in self.backends if b.available(now) and b not in exclude]
+        if not candidates:
+            # Все исключены — лучше попробовать того, кого вернут раньше всех, чем упасть
+            candidates = [b for b in self.backends if b not in exclude] or self.backends
+            return min(candidates, key=lambda b: (b.ejected_until, b.load()))
+        return min(candidates, key=lambda b: b.load())
+
+    @contextmanager
+    def acquire(self, exclude=()):
+        """Выдаёт инстанс на время запроса; ошибка внутри блока засчитывается инстансу"""
+        self.start_health_checks()
+        with self._lock:
+            backend = self._pick(exclude)
+            backend.outstanding += 1
+            backend.requests += 1
+        try:
+            yield backend
+        except Exception:
+            self.record_failure(backend)
+            raise
+        else:
+            self.record_success(backend)
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def record_success(self, backend: OllamaBackend):
+        with self._lock:
+            backend.failures = 0
+            backend.ejections = 0
+
+    def record_failure(self, backend: OllamaBackend):
+        with self._lock:
+            backend.failures += 1
+            if backend.failures >= EJECT_AFTER_FAILURES:
+                self._eject(backend)
+
+    def _eject(self, backend: OllamaBackend):
+        backend.ejections += 1
+        backend.failures = 0
+        pause = min(EJECT_MAX_SEC, EJECT_BASE_SEC * 2 ** (backend.ejections - 1))
+        backend.ejected_until = time.time() + pause
+
+    # --- Проверка здоровья ---
+    def check_health(self):
+        for backend in self.backends:
+            try:
+                resp = requests.get(f"{backend.base_url}/api/tags", timeout=HEALTH_CHECK_TIMEOUT)
+                healthy = resp.status_code == 200
+                if healthy:
+                    models = {model_tag(m.get("name")) for m in resp.json().get("models", [])}
+                    # Модель должна быть загружена на инстанс; пустой список не считаем ошибкой
+                    healthy = not models or model_tag(backend.model) in models
+            except (requests.RequestException, ValueError):
+                healthy = False
+            with self._lock:
+                backend.healthy = healthy
+
+    def start_health_checks(self):
+        if self._health_thread is not None or self.health_interval <= 0 or len(self.backends) < 2:
+            return
+        self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+        self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> list:
+        now = time.time()
+        with self._lock:
+            return [b.to_dict(now) for b in self.backends]
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool() -> OllamaPool:
+    """Общий пул процесса: LLaVAVision создаётся на каждую задачу, а счётчики должны быть общими"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            backends = parse_backends(OLLAMA_BACKENDS) or parse_backends(OLLAMA_URL)
+            _default_pool = OllamaPool(backends)
+        return _default_pool
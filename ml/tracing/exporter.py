@@ -0,0 +1,211 @@
+"""
+Фоновая отправка трассировки: события и оценки копятся в ограниченной очереди и уходят
+пачками из отдельного потока, не задерживая прогон цепочки. Если очередь полна или
+коллектор недоступен, записи отбрасываются с подсчётом (stats()), а не блокируют работу.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+EXPORT_QUEUE_SIZE = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", 10_000))
+EXPORT_BATCH_SIZE = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", 100))
+EXPORT_FLUSH_INTERVAL = float(os.getenv("TRACE_EXPORT_FLUSH_INTERVAL", 2.0))
+# После стольких неудачных пачек подряд коллектор считается недоступным на EXPORT_BACKOFF секунд
+EXPORT_MAX_FAILURES = int(os.getenv("TRACE_EXPORT_MAX_FAILURES", 3))
+EXPORT_BACKOFF = float(os.getenv("TRACE_EXPORT_BACKOFF", 30.0))
+
+# Собственная пакетная отправка SDK Langfuse (CallbackHandler, клиент); явные настройки не перекрываются
+LANGFUSE_BATCH_DEFAULTS = {"LANGFUSE_FLUSH_AT": "100", "LANGFUSE_FLUSH_INTERVAL": "5"}
+
+logger = logging.getLogger(__name__)
+_NOTHING = object()
+
+
+def apply_langfuse_batch_defaults():
+    for key, value in LANGFUSE_BATCH_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+
+
+class BackgroundBatcher:
+    """Ограниченная очередь + поток, который передаёт записи в handler(batch) пачками"""
+
+    def __init__(self, handler, name: str = "trace-export", max_queue: int = EXPORT_QUEUE_SIZE,
+                 batch_size: int = EXPORT_BATCH_SIZE, flush_interval: float = EXPORT_FLUSH_INTERVAL):
+        self.handler = handler
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "exported": 0, "dropped": 0, "failed_batches": 0}
+        self._failures = 0
+        self._backoff_until = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, item) -> bool:
+        """Не блокирует: при полной очереди запись отбрасывается"""
+        if self._closed:
+            return self._count("dropped")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            return self._count("dropped")
+        self._count("submitted")
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Ждёт, пока очередь опустеет; False, если не успели за timeout"""
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": self._queue.qsize()}
+
+    def _count(self, key: str, n: int = 1) -> bool:
+        with self._lock:
+            self._stats[key] += n
+        return False
+
+    def _run(self):
+        batch, markers = [], []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = _NOTHING
+            if isinstance(item, threading.Event):
+                markers.append(item)
+            elif item is not None and item is not _NOTHING:
+                batch.append(item)
+
+            if item is None or markers or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._export(batch)
+                batch = []
+                for marker in markers:
+                    marker.set()
+                markers = []
+                deadline = time.monotonic() + self.flush_interval
+            if item is None:
+                return
+
+    def _export(self, batch: list):
+        if time.monotonic() < self._backoff_until:
+            self._count("dropped", len(batch))
+            return
+        try:
+            self.handler(batch)
+        except Exception as e:
+            self._count("failed_batches")
+            self._count("dropped", len(batch))
+            self._failures += 1
+            if self._failures >= EXPORT_MAX_FAILURES:
+                self._backoff_until = time.monotonic() + EXPORT_BACKOFF
+                logger.warning("%s: коллектор недоступен (%r), записи отбрасываются %.0f с",
+                               self.name, e, EXPORT_BACKOFF)
+            return
+        self._failures = 0
+        self._count("exported", len(batch))
+
+
+class BufferedJsonlWriter:
+    """Отладочный jsonl: файл открывается один раз, строки пишутся пачками из фонового потока"""
+
+    def __init__(self, path: str, **batcher_kwargs):
+        self.path = path
+        self._file = None
+        self._batcher = BackgroundBatcher(self._write_batch, name=f"jsonl:{os.path.basename(path)}",
+                                          **batcher_kwargs)
+
+    def write(self, record: dict) -> bool:
+        return self._batcher.submit(record)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        return self._batcher.flush(timeout)
+
+    def close(self):
+        self._batcher.close()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return self._batcher.stats()
+
+    def _write_batch(self, batch: list):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch))
+        self._file.flush()
+
+
+class LangfuseEventExporter:
+    """
+    События и метрики прогонов для Langfuse. client_factory вызывается в фоновом потоке при
+    первой пачке — создание клиента тоже уходит с критического пути. Не отправленные события
+    (ошибка клиента) пишутся в debug_path.
+    """
+
+    def __init__(self, client_factory, debug_path: str = None, **batcher_kwargs):
+        self.client_factory = client_factory
+        self.debug = BufferedJsonlWriter(debug_path) if debug_path else None
+        self._batcher = BackgroundBatcher(self._send, name="langfuse-export", **batcher_kwargs)
+
+    def log_event(self, name: str, **fields) -> bool:
+        return self._batcher.submit({"name": name, "time": time.time(), **fields})
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        done = self._batcher.flush(timeout)
+        if self.debug:
+            self.debug.flush(timeout)
+        return done
+
+    def stats(self) -> dict:
+        return self._batcher.stats()
+
+    def _send(self, batch: list):
+        try:
+            client = self.client_factory()
+        except Exception as e:
+            for event in batch:
+                self._debug(event, e)
+            raise
+        errors = 0
+        for event in batch:
+            fields = {k: v for k, v in event.items() if k != "time"}
+            try:
+                client.log_event(**fields)
+            except Exception as e:
+                errors += 1
+                self._debug(event, e)
+        flush = getattr(client, "flush", None)
+        if flush:
+            flush()
+        if errors == len(batch):
+            raise RuntimeError(f"Langfuse: не отправлено ни одного события из {len(batch)}")
+
+    def _debug(self, event: dict, error: Exception):
+        if self.debug:
+            self.debug.write({"time": event["time"], "name": event["name"], "metadata": event.get("metadata"),
+                              "metrics": event.get("metrics"), "error": repr(error)})
@@ -0,0 +1,110 @@
+"""
+Подсчёт токенов для трассировки и оценки стоимости.
+
+Токенайзер Mistral загружается лениво, при первом подсчёте, и кешируется на процесс:
+импорт модулей трассировки не тянет transformers и не ходит в сеть.
+
+Режим задаётся TOKENIZER_MODE:
+    auto   — токенайзер из локального кеша HF, без сети; если его нет — приближённый подсчёт (по умолчанию)
+    hf     — токенайзер HF обязательно, при необходимости скачивается; ошибка загрузки пробрасывается
+    approx — только приближённый подсчёт, transformers не импортируется
+Имя токенайзера — TOKENIZER_NAME.
+"""
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+
+TOKENIZER_MODE = os.getenv("TOKENIZER_MODE", "auto").lower()
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "mistralai/Mistral-7B-Instruct-v0.2")
+
+# Тарифы по умолчанию, $ за токен (пример: $0.25 за 1M токенов)
+DEFAULT_PRICE_PER_INPUT = 0.25 / 1_000_000
+DEFAULT_PRICE_PER_OUTPUT = 0.25 / 1_000_000
+
+# Слова, отдельные цифры (SentencePiece Mistral режет числа поцифренно) и прочие символы
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_")
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """Токенайзер HF или None, если работаем на приближённом подсчёте"""
+    if TOKENIZER_MODE == "approx":
+        return None
+    try:
+        from transformers import AutoTokenizer
+        # В режиме auto — только локальный кеш: без сети загрузка либо мгновенная, либо сразу неудачная
+        return AutoTokenizer.from_pretrained(TOKENIZER_NAME, local_files_only=TOKENIZER_MODE != "hf")
+    except Exception as e:
+        if TOKENIZER_MODE == "hf":
+            raise
+        logger.warning("Токенайзер %s недоступен (%r), используется приближённый подсчёт", TOKENIZER_NAME, e)
+        return None
+
+
+def tokenizer_kind() -> str:
+    return "approx" if get_tokenizer() is None else "hf"
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Оценка без словаря: латиница ~4 символа на токен, кириллица и прочее ~2.5,
+    цифра и знак препинания — по токену, плюс BOS, как у tokenizer.encode
+    """
+    count = 1
+    for piece in _PIECE_RE.findall(text or ""):
+        if piece[0].isalpha():
+            count += math.ceil(len(piece) / (4 if piece.isascii() else 2.5))
+        else:
+            count += 1
+    return count
+
+
+def count_tokens_batch(texts: list) -> list:
+    """Число токенов для списка строк; токенайзер HF кодирует их одним вызовом"""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [approx_token_count(text) for text in texts]
+    return [len(ids) for ids in tokenizer([text or "" for text in texts])["input_ids"]]
+
+
+def count_tokens(text: str) -> int:
+    return count_tokens_batch([text])[0]
+
+
+def usage_and_cost(calls: list,
+                   price_per_input: float = DEFAULT_PRICE_PER_INPUT,
+                   price_per_output: float = DEFAULT_PRICE_PER_OUTPUT) -> list:
+    """
+    (usage, cost) для каждого вызова LLM (см. MistralText.generate_recipe_with_usage).
+    Берётся usage из ответа API; токенайзер запускается одним пакетом только для вызовов без него
+    """
+    missing = [call for call in calls if not (call.get("usage") or {}).get("prompt_tokens")]
+    texts = [text for call in missing for text in (call.get("prompt") or "", call.get("output") or "")]
+    counted = iter(count_tokens_batch(texts) if texts else [])
+    kind = tokenizer_kind() if missing else None
+
+    results = []
+    for call in calls:
+        api_usage = call.get("usage") or {}
+        if api_usage.get("prompt_tokens"):
+            input_tokens = api_usage["prompt_tokens"]
+            output_tokens = api_usage.get("completion_tokens") or 0
+            source = "api"
+        else:
+            input_tokens, output_tokens = next(counted), next(counted)
+            # Ответа не было — нечего и считать
+            if not call.get("output"):
+                output_tokens = 0
+            source = kind
+        cost = input_tokens * price_per_input + output_tokens * price_per_output
+        results.append(({
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "tokenizer": source,
+        }, cost))
+    return results
@@ -0,0 +1,44 @@
+"""
+Форматы файлов задач (common/codec.py): время кодирования и декодирования одного файла и
+размер на диске по корпусу настоящих рецептов из backend/local_recipes (и results/recipes,
+если есть). Форматы без установленных пакетов (msgpack, zstandard) пропускаются.
+"""
+import itertools
+from pathlib import Path
+
+from common.codec import available_formats, dumps, loads
+from tests.bench.harness import run_sync
+
+ROOT = Path(__file__).resolve().parents[2]
+CORPUS_DIRS = (ROOT / "backend" / "local_recipes", ROOT / "recipes", ROOT / "results")
+
+
+def load_corpus() -> list:
+    payloads = []
+    for directory in CORPUS_DIRS:
+        for path in sorted(directory.rglob("*.json")) if directory.is_dir() else ():
+            try:
+                payloads.append(loads(path.read_bytes()))
+            except ValueError:
+                continue
+    return payloads
+
+
+def run_codec(iterations: int = 500) -> dict:
+    corpus = load_corpus()
+    if not corpus:
+        return {}
+    plain_bytes = sum(len(dumps(payload, "plain")) for payload in corpus)
+
+    results = {}
+    for spec in available_formats():
+        encoded = [dumps(payload, spec) for payload in corpus]
+        size = sum(len(raw) for raw in encoded)
+        extra = {"format": spec, "corpus_files": len(corpus), "bytes": size,
+                 "size_ratio": round(size / plain_bytes, 3)}
+
+        payloads = itertools.cycle(corpus)
+        results[f"codec.{spec}.encode"] = run_sync(lambda: dumps(next(payloads), spec), iterations) | extra
+        raws = itertools.cycle(encoded)
+        results[f"codec.{spec}.decode"] = run_sync(lambda: loads(next(raws)), iterations) | extra
+    return results
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Метрики задержки, по которым ищем регрессии (больше — хуже) и пропускная способность (меньше — хуже)
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_METRIC = "throughput_rps"
+# Разница меньше этого порога считается шумом, даже если превышает процент
+NOISE_FLOOR_MS = 0.5
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Перцентиль с линейной интерполяцией; q в диапазоне 0..100"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q / 100
+    lower, upper = math.floor(k), math.ceil(k)
+    if lower == upper:
+        return sorted_values[int(k)]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(latencies_sec: list, wall_sec: float, errors: int = 0, **extra) -> dict:
+    values = sorted(v * 1000 for v in latencies_sec)
+    summary = {
+        "count": len(values),
+        "errors": errors,
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+        THROUGHPUT_METRIC: round(len(values) / wall_sec, 3) if wall_sec > 0 else 0.0,
+    }
+    summary.update(extra)
+    return summary
+
+
+def run_sync(fn, iterations: int, warmup: int = 5, concurrency: int = 1) -> dict:
+    """Вызывает fn() iterations раз (в concurrency потоках); исключение или False — ошибка"""
+    for _ in range(warmup):
+        fn()
+
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            ok = fn() is not False
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        samples = [timed(i) for i in range(iterations)]
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(timed, range(iterations)))
+    wall = time.perf_counter() - started
+
+    return summarize([s[0] for s in samples if s[1]], wall, errors=sum(1 for s in samples if not s[1]),
+                     concurrency=concurrency)
+
+
+async def run_async(coro_fn, iterations: int, concurrency: int = 1) -> dict:
+    """Асинхронный вариант: coro_fn(i) возвращает dict с этапами или False при ошибке"""
+    semaphore = asyncio.Semaphore(concurrency)
+    stages = {}
+
+    async def timed(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await coro_fn(i)
+            except Exception:
+                result = False
+            elapsed = time.perf_counter() - start
+            if isinstance(result, dict):
+                for stage, seconds in result.items():
+                    stages.setdefault(stage, []).append(seconds)
+            return elapsed, result is not False
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(timed(i) for i in range(iterations)))
+    wall = time.perf_counter() - started
+
+    summary = summarize([s[0] for s in samples if s[1]], wall, errors=sum(1 for s in samples if not s[1]),
+                        concurrency=concurrency)
+    if stages:
+        summary["stages"] = {name: summarize(values, wall) for name, values in stages.items()}
+    return summary
+
+
+# --- Результаты и базовая линия ---
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def build_report(suite: str, results: dict, settings: dict = None) -> dict:
+    return {
+        "meta": {
+            "suite": suite,
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": settings or {},
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Сравнение с базовой линией: список регрессий сверх threshold (доля, 0.2 = 20%)"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in LATENCY_METRICS:
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > NOISE_FLOOR_MS:
+                regressions.append({"benchmark": name, "metric": metric, "baseline": old, "current": new,
+                                    "change": round(new / old - 1, 3)})
+        old, new = base.get(THROUGHPUT_METRIC), current.get(THROUGHPUT_METRIC)
+        if old and new is not None and new < old * (1 - threshold):
+            regressions.append({"benchmark": name, "metric": THROUGHPUT_METRIC, "baseline": old, "current": new,
+                                "change": round(new / old - 1, 3)})
+    return regressions
+
+
+def load_json(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
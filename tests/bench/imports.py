@@ -0,0 +1,90 @@
+"""
+Время импорта модулей: каждый замер — в свежем интерпретаторе, чтобы не мешал кеш sys.modules.
+Меряется только сам import, без запуска Python; для разбора «кто тяжёлый» в отчёт
+попадают самые медленные зависимости из -X importtime (один дополнительный прогон).
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from tests.bench.harness import summarize
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Имя сценария -> (модуль, рабочий каталог)
+IMPORT_TARGETS = {
+    "import.ml_tokens": ("ml.tracing.tokens", ROOT),
+    "import.langfuse_config": ("ml.tracing.langfuse_config", ROOT),
+    "import.cook_langfuse": ("ml.api.cook_langfuse", ROOT),
+    "import.ab_test_langfuse": ("ml.experiments.ab_test_langfuse", ROOT),
+    "import.backend_main": ("main", ROOT / "backend"),
+}
+TOP_IMPORTS = 5
+
+_TIMED_IMPORT = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+_IMPORTTIME_RE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\| (.+)$")
+
+
+def _env(work_dir: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    # Импорт бэкенда не должен писать в рабочий лог
+    env.setdefault("LOG_FILE", os.path.join(work_dir, "app.log"))
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def measure_once(module: str, cwd: Path, env: dict):
+    """(секунды на import module, None) или (None, [ошибка]), если модуль не импортируется (нет зависимостей и т.п.)"""
+    proc = subprocess.run([sys.executable, "-c", _TIMED_IMPORT.format(module=module)],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1:] or ["exit code %d" % proc.returncode]
+    return float(proc.stdout.strip().splitlines()[-1]), None
+
+
+def slowest_imports(module: str, cwd: Path, env: dict, top: int = TOP_IMPORTS) -> list:
+    """Самые тяжёлые прямые зависимости module по накопленному времени из -X importtime"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    entries = [(int(m.group(1)), m.group(2)) for m in map(_IMPORTTIME_RE.match, proc.stderr.splitlines()) if m]
+    # Строка самого module идёт после всех его зависимостей; отступ в имени — глубина вложенности
+    end = next((i for i, (_, name) in enumerate(entries) if name == module), len(entries))
+    children = []
+    for us, name in reversed(entries[:end]):
+        if not name.startswith(" "):
+            break
+        if not name.startswith("   "):
+            children.append((us, name.strip()))
+    children.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 3)} for us, name in children[:top]]
+
+
+def run_imports(iterations: int = 10) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-imports-") as work_dir:
+        env = _env(work_dir)
+        for name, (module, cwd) in IMPORT_TARGETS.items():
+            # Первый прогон прогревает .pyc и файловый кеш, в замер не идёт
+            _, error = measure_once(module, cwd, env)
+            latencies, errors = [], 0
+            if error is None:
+                for _ in range(iterations):
+                    seconds, error = measure_once(module, cwd, env)
+                    if seconds is None:
+                        errors += 1
+                    else:
+                        latencies.append(seconds)
+            else:
+                errors = iterations
+
+            extra = {"module": module}
+            if error:
+                extra["error"] = error[0]
+            else:
+                extra["slowest_imports"] = slowest_imports(module, cwd, env)
+            results[name] = summarize(latencies, sum(latencies), errors=errors, **extra)
+    return results
@@ -0,0 +1,149 @@
+"""
+Микробенчмарки эндпоинтов бэкенда в процессе (TestClient): авторизация, история,
+предпочтения, запрещённые продукты и их фильтрация. Работают на копии bd/my_database.db,
+дополненной синтетическими данными, — рабочая база не меняется.
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from tests.bench.harness import run_sync
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT / "backend"
+SOURCE_DB = ROOT / "bd" / "my_database.db"
+LEGACY_DB_PATH = "../bd/my_database.db"
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+# Объём синтетических данных пользователя бенчмарка
+HISTORY_ROWS = int(os.getenv("BENCH_HISTORY_ROWS", 300))
+FORBIDDEN_PRODUCTS = int(os.getenv("BENCH_FORBIDDEN_PRODUCTS", 30))
+INGREDIENTS_PER_PHOTO = int(os.getenv("BENCH_INGREDIENTS_PER_PHOTO", 40))
+
+
+def _import_backend(work_dir: Path):
+    """main импортируется из backend/ (относительные пути к шаблонам и базе); логи — во временный файл"""
+    os.environ.setdefault("LOG_FILE", str(work_dir / "app.log"))
+    # Консольный вывод на INFO исказил бы замеры терминалом, а не кодом
+    os.environ.setdefault("LOG_LEVEL", os.getenv("BENCH_LOG_LEVEL", "WARNING"))
+    os.chdir(BACKEND_DIR)
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import main
+    return main
+
+
+def _seed(db_path: Path, password_hash: str, rng: random.Random) -> int:
+    con = sqlite3.connect(db_path)
+    cur = con.cursor()
+    cur.execute(
+        "INSERT INTO User (email, login, password, preferences_time, preferences_difficulty, preferences_calorie) "
+        "VALUES (?, ?, ?, 1, 1, 1)",
+        (BENCH_EMAIL, "bench", password_hash),
+    )
+    user_id = cur.lastrowid
+
+    for i in range(HISTORY_ROWS):
+        cur.execute(
+            "INSERT INTO Recipes (title, description, cooking_time, difficulty, calorie_level) VALUES (?, ?, ?, ?, ?)",
+            (f"Рецепт {i}", "Описание рецепта. " * 20, "30 минут", "средне", "средняя"),
+        )
+        recipe_id = cur.lastrowid
+        cur.execute(
+            "INSERT INTO History (id_user, id_recipes, favorite, done, prompt_version, date_added) "
+            "VALUES (?, ?, ?, 1, 'v1', '2025-01-01')",
+            (user_id, recipe_id, int(rng.random() < 0.2)),
+        )
+        if rng.random() < 0.1:
+            cur.execute("INSERT INTO Comment (id_user, id_recipe, comment) VALUES (?, ?, ?)",
+                        (user_id, recipe_id, "Вкусно"))
+
+    for i in range(FORBIDDEN_PRODUCTS):
+        cur.execute("INSERT INTO Product (title) VALUES (?)", (f"продукт{i}",))
+        cur.execute("INSERT INTO ProductsInProhibited (id_product, id_user) VALUES (?, ?)", (cur.lastrowid, user_id))
+
+    con.commit()
+    con.close()
+    return user_id
+
+
+class MicroBench:
+    def __init__(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix="bench-"))
+        self.cwd = os.getcwd()
+        self.main = _import_backend(self.work_dir)
+        self.db_path = self.work_dir / "my_database.db"
+        shutil.copy(SOURCE_DB, self.db_path)
+
+        self.rng = random.Random(42)
+        self.user_id = _seed(self.db_path, self.main.password_hasher.hash_sync(BENCH_PASSWORD), self.rng)
+
+        real_connect = sqlite3.connect
+        db_paths = {LEGACY_DB_PATH, self.main.DB_PATH}
+
+        def connect(database, *args, **kwargs):
+            if database in db_paths:
+                database = str(self.db_path)
+            return real_connect(database, *args, **kwargs)
+
+        self._patch = mock.patch.object(self.main.sqlite3, "connect", connect)
+        self._patch.start()
+
+        from fastapi.testclient import TestClient
+        self.client = TestClient(self.main.app)
+        self.client.cookies.set("session", self.main.serializer.dumps(self.user_id))
+
+    def close(self):
+        self._patch.stop()
+        self.client.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    # --- Сценарии ---
+    def auth(self):
+        response = self.client.post("/auth", data={"email": BENCH_EMAIL, "password": BENCH_PASSWORD},
+                                    follow_redirects=False)
+        return response.status_code in (302, 303)
+
+    def history(self):
+        return self.client.get("/history").status_code == 200
+
+    def preferences(self):
+        return self.client.get("/api/preferences").status_code == 200
+
+    def forbidden_products(self):
+        return self.client.get("/user/forbidden-products").status_code == 200
+
+    def forbidden_filtering(self):
+        forbidden = self.main.get_forbidden_products(self.user_id)
+        ingredients = [f"продукт{self.rng.randrange(FORBIDDEN_PRODUCTS * 2)}" for _ in range(INGREDIENTS_PER_PHOTO)]
+        self.main.filter_ingredients_by_forbidden(ingredients, forbidden)
+
+    def run(self, iterations: int, concurrency: int = 1) -> dict:
+        # scrypt намеренно медленный — авторизаций меньше, чтобы прогон оставался коротким
+        scenarios = {
+            "micro.auth": (self.auth, max(10, iterations // 4)),
+            "micro.history": (self.history, iterations),
+            "micro.preferences": (self.preferences, iterations),
+            "micro.forbidden_products": (self.forbidden_products, iterations),
+            "micro.forbidden_filtering": (self.forbidden_filtering, iterations),
+        }
+        return {
+            name: run_sync(fn, n, warmup=min(5, n), concurrency=concurrency)
+            for name, (fn, n) in scenarios.items()
+        }
+
+
+def run_micro(iterations: int = 200, concurrency: int = 1) -> dict:
+    bench = MicroBench()
+    try:
+        return bench.run(iterations, concurrency)
+    finally:
+        bench.close()
@@ -0,0 +1,135 @@
+"""
+Сценарии по HTTP против запущенного стека (бэкенд, ML-сервер, супервизор воркеров).
+Для воспроизводимых замеров модели подменяются фейками из ml/fakes:
+
+    uvicorn ml.fakes.fake_ollama:app --port 11434
+    uvicorn ml.fakes.fake_mistral:app --port 8090
+    MISTRAL_URL=http://127.0.0.1:8090/v1/chat/completions VLM_TRANSLATE=0 uvicorn ml.api.server:app --port 8001
+    VLM_TRANSLATE=0 python -m ml.api.supervisor --min-workers 2 --no-autoscale
+    cd backend && PYTHONPATH=.. uvicorn main:app --port 8000
+"""
+import asyncio
+import os
+import random
+import time
+from pathlib import Path
+
+import httpx
+
+from tests.bench.harness import run_async
+
+ROOT = Path(__file__).resolve().parents[2]
+IMAGE_DIR = Path(os.getenv("BENCH_IMAGE_DIR", ROOT / "data" / "images"))
+BACKEND_URL = os.getenv("BENCH_BACKEND_URL", "http://127.0.0.1:8000")
+ML_URL = os.getenv("BENCH_ML_URL", "http://127.0.0.1:8001")
+BENCH_EMAIL = os.getenv("BENCH_EMAIL", "bench@example.com")
+BENCH_PASSWORD = os.getenv("BENCH_PASSWORD", "bench-password")
+TASK_TIMEOUT = float(os.getenv("BENCH_TASK_TIMEOUT", 600))
+
+
+def list_images(image_dir: Path = IMAGE_DIR) -> list:
+    images = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    if not images:
+        raise RuntimeError(f"В {image_dir} нет изображений для бенчмарка")
+    return images
+
+
+async def poll(fetch, timeout: float = TASK_TIMEOUT):
+    """
+    Опрос результата с нарастающим интервалом (0.2 -> 5 с) вместо фиксированного sleep:
+    быстрые задачи не теряют до 10 с на опросе, медленные не засыпают сервер запросами.
+    """
+    delay = 0.2
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = await fetch()
+        if data.get("status") in ("done", "error"):
+            return data
+        await asyncio.sleep(delay)
+        delay = min(5.0, delay * 1.5)
+    return {"status": "timeout"}
+
+
+async def _login(client: httpx.AsyncClient):
+    """
+    Вход пользователем бенчмарка; на чистой базе он регистрируется через /reg (регистрация
+    сразу выставляет сессию). Если пользователь есть, но пароль другой — понятная ошибка
+    """
+    response = await client.post("/auth", data={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    if "session" in client.cookies:
+        return
+    if "не найден" not in response.text:
+        raise RuntimeError(
+            f"Не удалось войти как {BENCH_EMAIL}: пользователь есть, но пароль не подходит "
+            f"(задайте BENCH_EMAIL/BENCH_PASSWORD) — {response.status_code}"
+        )
+    response = await client.post("/reg", data={"name": "bench", "email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    if "session" not in client.cookies:
+        raise RuntimeError(f"Не удалось зарегистрировать {BENCH_EMAIL}: {response.status_code}")
+
+
+async def run_e2e(iterations: int = 10, concurrency: int = 2) -> dict:
+    """Полный путь пользователя: загрузка фото -> ожидание VLM -> генерация рецептов"""
+    images = list_images()
+    rng = random.Random(42)
+
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=120) as client:
+        await _login(client)
+
+        async def scenario(i):
+            image = images[rng.randrange(len(images))]
+            stages = {}
+
+            start = time.perf_counter()
+            with open(image, "rb") as f:
+                response = await client.post("/start-processing", files={"file": (image.name, f, "image/jpeg")})
+            stages["upload"] = time.perf_counter() - start
+            if response.status_code != 200:
+                return False
+            task_id = response.json()["task_id"]
+
+            start = time.perf_counter()
+            result = await poll(lambda: _json(client.get(f"/get-result/{task_id}")))
+            stages["vlm_wait"] = time.perf_counter() - start
+            if result.get("status") != "done":
+                return False
+
+            start = time.perf_counter()
+            response = await client.post(f"/generate-recipes/{task_id}", data={"dietary": "нет"})
+            stages["recipes"] = time.perf_counter() - start
+            return stages if response.status_code == 200 else False
+
+        return {"e2e.pipeline": await run_async(scenario, iterations, concurrency)}
+
+
+async def run_worker(tasks: int = 20, concurrency: int = 20) -> dict:
+    """Пропускная способность пула воркеров: пачка задач напрямую в ML-сервер (полоса batch)"""
+    images = list_images()
+
+    async with httpx.AsyncClient(base_url=ML_URL, timeout=120) as client:
+        async def scenario(i):
+            image = images[i % len(images)]
+            stages = {}
+
+            start = time.perf_counter()
+            with open(image, "rb") as f:
+                response = await client.post(
+                    "/test-vlm",
+                    files={"file": (image.name, f, "image/jpeg")},
+                    data={"user_id": f"bench-{i % 4}", "lane": "batch"},
+                )
+            stages["enqueue"] = time.perf_counter() - start
+            if response.status_code != 200:
+                return False
+            task_id = response.json()["task_id"]
+
+            result = await poll(lambda: _json(client.get(f"/task-result/{task_id}")))
+            stages["completion"] = time.perf_counter() - start
+            return stages if result.get("status") == "done" else False
+
+        return {"worker.throughput": await run_async(scenario, tasks, concurrency)}
+
+
+async def _json(request) -> dict:
+    response = await request
+    return response.json() if response.status_code == 200 else {"status": "http_" + str(response.status_code)}
@@ -0,0 +1,93 @@
+"""
+Бенчмарки с отслеживанием регрессий (запуск из корня репозитория):
+
+    python -m tests.bench.run --suite micro
+    python -m tests.bench.run --suite e2e --iterations 20 --concurrency 4
+    python -m tests.bench.run --suite worker --iterations 40
+    python -m tests.bench.run --suite imports
+    python -m tests.bench.run --suite codec
+    python -m tests.bench.run --suite micro --update-baseline
+
+Результат — JSON с p50/p95/p99 и пропускной способностью (по умолчанию bench_output.json).
+Сравнение идёт с tests/bench/baseline.json; при регрессии сверх --threshold код выхода 1.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from tests.bench.harness import build_report, compare, load_json, save_json
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+SUITES = ("micro", "e2e", "worker", "imports", "codec")
+
+
+def run_suite(suite: str, iterations: int, concurrency: int) -> dict:
+    if suite == "micro":
+        from tests.bench.micro import run_micro
+        return run_micro(iterations, concurrency)
+    if suite == "imports":
+        from tests.bench.imports import run_imports
+        return run_imports(iterations)
+    if suite == "codec":
+        from tests.bench.codec import run_codec
+        return run_codec(iterations)
+    if suite == "e2e":
+        from tests.bench.pipeline import run_e2e
+        return asyncio.run(run_e2e(iterations, concurrency))
+    from tests.bench.pipeline import run_worker
+    return asyncio.run(run_worker(iterations, concurrency))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки пайплайна AI Personal Chef")
+    parser.add_argument("--suite", choices=SUITES + ("all",), default="micro")
+    parser.add_argument("--iterations", type=int, default=None,
+                        help="Повторов на сценарий (micro: 200, e2e: 10, worker: 20, imports: 10, codec: 500)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Параллельных запросов (micro: 1, e2e: 2, worker: = iterations)")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--threshold", type=float, default=0.2, help="Допустимое ухудшение, доля (0.2 = 20%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Записать результаты в базовую линию")
+    args = parser.parse_args(argv)
+
+    defaults = {"micro": (200, 1), "e2e": (10, 2), "worker": (20, None), "imports": (10, 1), "codec": (500, 1)}
+    suites = SUITES if args.suite == "all" else (args.suite,)
+
+    results = {}
+    for suite in suites:
+        iterations = args.iterations or defaults[suite][0]
+        concurrency = args.concurrency or defaults[suite][1] or iterations
+        results.update(run_suite(suite, iterations, concurrency))
+
+    report = build_report(args.suite, results, {"iterations": args.iterations, "concurrency": args.concurrency,
+                                                "threshold": args.threshold})
+    baseline = load_json(args.baseline).get("results", {})
+    report["regressions"] = compare(results, baseline, args.threshold)
+    save_json(args.output, report)
+
+    for name, summary in results.items():
+        print(f"{name:32} p50 {summary['p50_ms']:>10.2f} ms  p95 {summary['p95_ms']:>10.2f} ms  "
+              f"p99 {summary['p99_ms']:>10.2f} ms  {summary['throughput_rps']:>9.2f} rps  errors {summary['errors']}")
+
+    if args.update_baseline:
+        # Обновляем только прогнанные сценарии, остальные остаются как были
+        stored = load_json(args.baseline)
+        stored.setdefault("results", {}).update(results)
+        stored["meta"] = report["meta"]
+        save_json(args.baseline, stored)
+        print(f"Базовая линия обновлена: {args.baseline}")
+        return 0
+
+    if report["regressions"]:
+        print("Регрессии относительно базовой линии:")
+        print(json.dumps(report["regressions"], ensure_ascii=False, indent=2))
+        return 1
+    print(f"Регрессий нет (порог {args.threshold:.0%}), отчёт: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
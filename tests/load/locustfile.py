@@ -8,8 +8,20 @@ from pathlib import Path
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
-IMAGE_DIR = r"C:\Users\Наталья\Desktop\lab4-AiEngineer-infrastructure\data\processed_images"
-MAX_ITERATIONS = 1
+ROOT = Path(__file__).resolve().parents[2]
+IMAGE_DIR = os.getenv("LOCUST_IMAGE_DIR", str(ROOT / "data" / "images"))
+# Сколько полных прогонов делает каждый пользователь (0 — без ограничения)
+MAX_ITERATIONS = int(os.getenv("LOCUST_MAX_ITERATIONS", 1))
+POLL_TIMEOUT = float(os.getenv("LOCUST_POLL_TIMEOUT", 6000))
+
+
+def poll_intervals(timeout: float = POLL_TIMEOUT):
+    """Интервалы опроса 0.2 -> 5 с с нарастанием: быстрый ответ не ждёт лишние 10 с"""
+    delay, waited = 0.2, 0.0
+    while waited < timeout:
+        yield delay
+        waited += delay
+        delay = min(5.0, delay * 1.5)
 
 os.makedirs("reports", exist_ok=True)
 os.makedirs("results", exist_ok=True)
@@ -19,22 +31,24 @@ class FullPipelineUser(HttpUser):
 
     def on_start(self):
         self.iterations = 0
+        self.user_id = f"locust-{id(self)}"
+        self.image_files = [f for f in os.listdir(IMAGE_DIR) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
 
     @task
     def full_pipeline(self):
-        if self.iterations >= MAX_ITERATIONS:
+        if MAX_ITERATIONS and self.iterations >= MAX_ITERATIONS:
             self.environment.runner.quit()
             return
 
         self.iterations += 1
-        image_files = [f for f in os.listdir(IMAGE_DIR) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
-        if not image_files:
+        if not self.image_files:
             return
 
-        image_path = os.path.join(IMAGE_DIR, random.choice(image_files))
+        image_path = os.path.join(IMAGE_DIR, random.choice(self.image_files))
         with open(image_path, "rb") as image_file:
             files = {"file": (os.path.basename(image_path), image_file, "image/jpeg")}
-            response = self.client.post("/test-vlm", files=files)
+            # Нагрузочный трафик идёт в пакетной полосе и не вытесняет интерактивные запросы
+            response = self.client.post("/test-vlm", files=files, data={"user_id": self.user_id, "lane": "batch"})
 
         if response.status_code != 200 or "task_id" not in response.json():
             return
@@ -44,8 +58,8 @@ class FullPipelineUser(HttpUser):
 
         # 🔹 Ожидание результата VLM
         result_data = None
-        for attempt in range(1000):  # до 100 минут
-            result = self.client.get(f"/task-result/{task_id}")
+        for delay in poll_intervals():
+            result = self.client.get(f"/task-result/{task_id}", name="/task-result/[task_id]")
             if result.status_code == 200:
                 result_json = result.json()
                 if result_json.get("status") == "done":
@@ -55,7 +69,7 @@ class FullPipelineUser(HttpUser):
                 elif result_json.get("status") == "error":
                     logging.error(f"[{task_id}] Ошибка VLM: {result_json.get('error')}")
                     return
-            time.sleep(10)
+            time.sleep(delay)
 
         if not result_data:
             logging.warning(f"[{task_id}] Распознавание не завершено — рецепт не запускается")
@@ -71,7 +85,7 @@ class FullPipelineUser(HttpUser):
             "existing_recipes": "нет"
         }
 
-        cook_response = self.client.post(f"/cook-from-image/{task_id}", data=form_data)
+        cook_response = self.client.post(f"/cook-from-image/{task_id}", data=form_data, name="/cook-from-image/[task_id]")
         if cook_response.status_code != 200:
             logging.error(f"[{task_id}] Ошибка генерации рецепта: {cook_response.text}")
             return
@@ -85,8 +99,8 @@ class FullPipelineUser(HttpUser):
         else:
             # 🔁 Ожидание готовности рецепта
             recipe_data = None
-            for attempt in range(1000):  # до 20 минут
-                result = self.client.get(f"/recipe-result/{task_id}")
+            for delay in poll_intervals():
+                result = self.client.get(f"/recipe-result/{task_id}", name="/recipe-result/[task_id]")
                 if result.status_code == 200:
                     result_json = result.json()
                     if result_json.get("status") == "done":
@@ -96,8 +110,8 @@ class FullPipelineUser(HttpUser):
                         logging.error(f"[{task_id}] Ошибка рецепта: {result_json.get('error')}")
                         return
                 elif result.status_code == 404:
-                    logging.warning(f"[{task_id}] Рецепт ещё не найден — повтор через 20 сек")
-                time.sleep(5)
+                    logging.warning(f"[{task_id}] Рецепт ещё не найден — повтор через {delay:.1f} сек")
+                time.sleep(delay)
 
             if recipe_data:
                 result_path = f"results/{task_id}_recipe.json"